@@ -0,0 +1,162 @@
+import os
+from Modules.dat_module import read_dat_dimensions, write_dat_dimensions
+from Modules.dds_module import read_dds_header
+from Modules.image_conv import convert_image_to_dat
+from Modules.image_gen import generate_alpha_mask
+from Modules.conversion_cache import open_cache
+from Modules.conversion_policy import ConversionPolicy
+from Modules.texture_context import TextureContext
+
+def texture_dat_path(info):
+    """Get the _texture.dat that holds the pixels of an indexed image"""
+    return os.path.join(os.path.dirname(info['dat_path']), f"{info['base_name']}_texture.dat")
+
+def inspect_decal(locator, image_path, bundle):
+    """Find the files of a decal bundle and what converting a new image into it involves
+    
+    Returns a dict with (image name, info) for the bundle's 'main', 'alpha' and 'icon' files
+    (None when missing), every bundle file with its role in 'files', and the new image's
+    'image_size' and 'has_alpha' next to the main metadata DAT's 'dat_size'. Images other
+    than DDS are decoded here once into a TextureContext ('context') that conversion and
+    alpha mask generation share.
+    """
+    decal = {'bundle': bundle, 'main': None, 'alpha': None, 'icon': None, 'files': [],
+             'image_size': None, 'has_alpha': False, 'dat_size': None, 'context': None}
+    
+    for img_name, info in locator.get_bundle_files(bundle):
+        probe = locator.probe(info['image_path'])
+        role = probe['role'] if probe else 'main'
+        decal['files'].append((img_name, role))
+        decal[role] = (img_name, info)
+    locator.save_probes()
+    
+    if decal['main']:
+        try:
+            decal['dat_size'] = read_dat_dimensions(decal['main'][1]['dat_path'])
+        except (OSError, ValueError):
+            pass
+    
+    try:
+        if image_path.lower().endswith('.dds'):
+            # The payload is copied as is, only the header is needed. BC1 is the opaque format
+            # here, the others carry an alpha channel
+            header = read_dds_header(image_path)
+            if header:
+                decal['image_size'] = (header['width'], header['height'])
+                decal['has_alpha'] = header['format_type'] != 'BC1_UNORM'
+        else:
+            decal['context'] = TextureContext.load(image_path)
+            decal['image_size'] = decal['context'].size
+            decal['has_alpha'] = decal['context'].has_alpha
+    except OSError:
+        pass
+    return decal
+
+class DecalConversionResult:
+    """Outcome of converting a new image into a decal bundle, truthy when the main texture was written"""
+    
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.main = None                # ConversionResult of the main texture
+        self.alpha = None               # ConversionResult of the alpha mask, None when it was left alone
+        self.alpha_regenerated = False
+        self.dimensions = None          # final (width, height) in the main metadata DAT
+        self.warnings = []
+        self.error = None
+    
+    def __bool__(self):
+        return bool(self.main) and self.error is None
+
+def convert_decal(decal, image_path, config, policy=None):
+    """Convert a new image into the decal described by inspect_decal, without prompting
+    
+    The ConversionPolicy decides whether the decal's dimensions follow the image, whether
+    the alpha mask is regenerated and converted, and how power-of-2 sizes are handled.
+    """
+    policy = policy or ConversionPolicy()
+    result = DecalConversionResult(decal['bundle'])
+    
+    if not decal['main']:
+        result.error = f"Could not find main texture in bundle '{decal['bundle']}'"
+        return result
+    if not decal['image_size']:
+        result.error = f"Could not read image {image_path}"
+        return result
+    
+    main_name, main_info = decal['main']
+    img_w, img_h = decal['image_size']
+    
+    if not decal['has_alpha']:
+        if not policy.allow_opaque:
+            result.error = "Image has no transparency"
+            return result
+        result.warnings.append("Image has no transparency - decal will be fully opaque")
+    
+    if decal['image_size'] != decal['dat_size']:
+        if policy.update_dat_dimensions:
+            print(f"\nUpdating decal dimensions to {img_w}x{img_h}")
+            if not write_dat_dimensions(main_info['dat_path'], img_w, img_h):
+                print("Warning: Failed to update dimensions")
+                result.warnings.append("Failed to update decal dimensions")
+        else:
+            dat_w, dat_h = decal['dat_size'] or (0, 0)
+            result.warnings.append(f"Dimension mismatch remains: Image {img_w}x{img_h} != Decal {dat_w}x{dat_h}")
+    
+    print("\n" + "="*60)
+    print("CONVERTING MAIN TEXTURE")
+    print("="*60)
+    
+    main_texture_dat = texture_dat_path(main_info)
+    print(f"\nConverting: {os.path.basename(image_path)}")
+    print(f"Target: {main_texture_dat}")
+    
+    cache = open_cache(config)
+    result.main = convert_image_to_dat(image_path, main_texture_dat, config['texconv_path'], config['encoder'],
+                                       config['bc7_preset'], config['scratch_dir'], cache, policy, decal['context'])
+    if not result.main:
+        result.error = f"Failed to convert main texture: {result.main.error}"
+        return result
+    
+    # FINAL dimensions from DAT (after any resizing)
+    result.dimensions = read_dat_dimensions(main_info['dat_path'])
+    
+    if not decal['alpha'] or not policy.regenerate_alpha:
+        return result
+    
+    alpha_mask_name, alpha_info = decal['alpha']
+    final_w, final_h = result.dimensions
+    print(f"\nRegenerating alpha mask...")
+    print(f"Using final main texture dimensions: {final_w}x{final_h}")
+    
+    output_path, _ = generate_alpha_mask(
+        image_path,
+        os.path.dirname(alpha_info['image_path']),
+        (final_w, final_h),
+        config['texconv_path'],
+        config['encoder'],
+        config['scratch_dir'],
+        decal['context']
+    )
+    
+    # Replace the old alpha mask
+    os.replace(output_path, alpha_info['image_path'])
+    print("Alpha mask replaced successfully")
+    
+    # Update alpha mask dimensions to match main texture
+    write_dat_dimensions(alpha_info['dat_path'], final_w, final_h)
+    print(f"Updated alpha mask metadata to {final_w}x{final_h}")
+    result.alpha_regenerated = True
+    
+    print("\n" + "="*60)
+    print("CONVERTING ALPHA MASK")
+    print("="*60)
+    
+    alpha_dat = texture_dat_path(alpha_info)
+    print(f"\nConverting: {alpha_mask_name}")
+    print(f"Target: {alpha_dat}")
+    
+    result.alpha = convert_image_to_dat(alpha_info['image_path'], alpha_dat, config['texconv_path'], config['encoder'],
+                                        config['bc7_preset'], config['scratch_dir'], cache, policy)
+    if not result.alpha:
+        result.warnings.append(f"Failed to convert alpha mask: {result.alpha.error}")
+    return result
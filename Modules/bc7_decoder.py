@@ -0,0 +1,136 @@
+import numpy as np
+from Modules.bc7_encoder import WEIGHTS, PARTITIONS_2, PARTITIONS_3, ANCHORS_2, ANCHORS_3
+
+# Per mode: subsets, partition bits, rotation bits, index selection bits, colour bits,
+# alpha bits, per-endpoint p-bits, shared p-bits, index bits, second index set bits
+MODES = (
+    (3, 4, 0, 0, 4, 0, 1, 0, 3, 0),
+    (2, 6, 0, 0, 6, 0, 0, 1, 3, 0),
+    (3, 6, 0, 0, 5, 0, 0, 0, 2, 0),
+    (2, 6, 0, 0, 7, 0, 1, 0, 2, 0),
+    (1, 0, 2, 1, 5, 6, 0, 0, 2, 3),
+    (1, 0, 2, 0, 7, 8, 0, 0, 2, 2),
+    (1, 0, 0, 0, 7, 7, 1, 0, 4, 0),
+    (2, 6, 0, 0, 5, 5, 1, 0, 2, 0),
+)
+
+class _BitReader:
+    """Reads fixed and per-pixel width fields LSB-first from unpacked (n, 128) block bits"""
+    
+    def __init__(self, bits, pos):
+        self.bits = bits
+        self.pos = pos
+    
+    def get(self, width):
+        if not width:
+            return np.zeros(len(self.bits), dtype=np.int32)
+        field = self.bits[:, self.pos:self.pos + width].astype(np.int32)
+        self.pos += width
+        return field @ (1 << np.arange(width, dtype=np.int32))
+    
+    def get_indices(self, widths):
+        """Read 16 indices per block whose widths (n, 16) add up to the same total in every block"""
+        starts = self.pos + np.cumsum(widths, axis=1) - widths
+        rows = np.arange(len(self.bits))[:, None]
+        values = np.zeros(widths.shape, dtype=np.int32)
+        for k in range(int(widths.max())):
+            bit = self.bits[rows, np.minimum(starts + k, 127)].astype(np.int32)
+            values |= np.where(k < widths, bit, 0) << k
+        self.pos += int(widths[0].sum())
+        return values
+
+def _expand(values, bits):
+    """Expand n-bit endpoint values to 8 bits by repeating the top bits"""
+    return (values << (8 - bits)) | (values >> (2 * bits - 8))
+
+def _decode_mode(bits, mode):
+    """Decode (n, 128) unpacked blocks that all use one mode to (n, 16, 4) RGBA"""
+    subsets, partition_bits, rotation_bits, selection_bits, color_bits, alpha_bits, \
+        endpoint_pbits, shared_pbits, index_bits, index_bits2 = MODES[mode]
+    n = len(bits)
+    reader = _BitReader(bits, mode + 1)
+    
+    partition = reader.get(partition_bits)
+    rotation = reader.get(rotation_bits)
+    selection = reader.get(selection_bits)
+    
+    endpoints = np.zeros((n, subsets * 2, 4), dtype=np.int16)
+    for ch in range(3):
+        for e in range(subsets * 2):
+            endpoints[:, e, ch] = reader.get(color_bits)
+    for e in range(subsets * 2 if alpha_bits else 0):
+        endpoints[:, e, 3] = reader.get(alpha_bits)
+    
+    if endpoint_pbits or shared_pbits:
+        for e in range(subsets * 2) if endpoint_pbits else range(subsets):
+            pbit = reader.get(1)[:, None]
+            ends = slice(e, e + 1) if endpoint_pbits else slice(2 * e, 2 * e + 2)
+            endpoints[:, ends] = (endpoints[:, ends] << 1) | pbit[:, None]
+        color_bits += 1
+        alpha_bits += 1 if alpha_bits else 0
+    
+    endpoints[..., :3] = _expand(endpoints[..., :3], color_bits)
+    endpoints[..., 3] = _expand(endpoints[..., 3], alpha_bits) if alpha_bits else 255
+    
+    # Subset of every pixel and the anchor pixels, whose index is one bit shorter
+    if subsets == 1:
+        subset = np.zeros((n, 16), dtype=np.int32)
+    elif subsets == 2:
+        subset = PARTITIONS_2[partition]
+    else:
+        subset = PARTITIONS_3[partition]
+    anchor = np.zeros((n, 16), dtype=bool)
+    anchor[:, 0] = True
+    rows = np.arange(n)
+    if subsets == 2:
+        anchor[rows, ANCHORS_2[partition]] = True
+    elif subsets == 3:
+        anchor[rows, ANCHORS_3[0, partition]] = True
+        anchor[rows, ANCHORS_3[1, partition]] = True
+    
+    weights = WEIGHTS[index_bits][reader.get_indices(index_bits - anchor)]
+    if index_bits2:
+        first_only = np.zeros((n, 16), dtype=np.int32)
+        first_only[:, 0] = 1
+        weights2 = WEIGHTS[index_bits2][reader.get_indices(index_bits2 - first_only)]
+        # The index selection bit swaps which index set drives colour and which alpha
+        swap = (selection == 1)[:, None]
+        color_weights = np.where(swap, weights2, weights)
+        alpha_weights = np.where(swap, weights, weights2)
+    else:
+        color_weights = alpha_weights = weights
+    
+    # Endpoint pair of every pixel's subset, gathered as whole RGBA rows
+    pairs = (rows * subsets * 2)[:, None] + 2 * subset
+    flat = endpoints.reshape(-1, 4)
+    e0, e1 = flat[pairs], flat[pairs + 1]
+    # 64 * 255 fits in int16, half the memory traffic of int32
+    w = np.empty((n, 16, 4), dtype=np.int16)
+    w[..., :3] = color_weights[..., None]
+    w[..., 3] = alpha_weights
+    pixels = ((64 - w) * e0 + w * e1 + 32) >> 6
+    
+    # Rotation swaps alpha back with R, G or B
+    for r in range(1, 4):
+        rotated = rotation == r
+        if rotated.any():
+            order = [0, 1, 2, 3]
+            order[r - 1], order[3] = 3, r - 1
+            pixels[rotated] = pixels[rotated][..., order]
+    return pixels.astype(np.uint8)
+
+def decode_blocks_bc7(blocks):
+    """Decode (n, 16) uint8 BC7 blocks to (n, 16, 4) RGBA pixels, reserved blocks come out transparent black"""
+    blocks = np.asarray(blocks, dtype=np.uint8).reshape(-1, 16)
+    bits = np.unpackbits(blocks, axis=1, bitorder='little')
+    
+    # The mode is the position of the lowest set bit
+    first = bits[:, :8]
+    modes = np.where(first.any(axis=1), first.argmax(axis=1), 8)
+    
+    out = np.zeros((len(blocks), 16, 4), dtype=np.uint8)
+    for mode in range(8):
+        selected = modes == mode
+        if selected.any():
+            out[selected] = _decode_mode(bits[selected], mode)
+    return out
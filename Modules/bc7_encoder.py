@@ -0,0 +1,395 @@
+import numpy as np
+from Modules.bc_encoder import least_squares_endpoints, principal_endpoints, POWER_ITERATIONS
+
+BC7_PRESETS = ('fast', 'quality')
+
+# Interpolation weights (out of 64) for 2, 3 and 4-bit indices
+WEIGHTS = {
+    2: np.array([0, 21, 43, 64], dtype=np.int32),
+    3: np.array([0, 9, 18, 27, 37, 46, 55, 64], dtype=np.int32),
+    4: np.array([0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64], dtype=np.int32),
+}
+
+# Least-squares refinement passes per preset
+FAST_ITERATIONS = 1
+QUALITY_ITERATIONS = 3
+
+# Best-scoring partitions per block that 'quality' fully encodes in each multi-subset mode
+QUALITY_PARTITIONS = 4
+
+# Multi-subset modes: subsets, partition bits, endpoint bits, p-bits ('endpoint', 'shared'
+# or None), index bits and whether alpha is stored (modes 0-3 are opaque)
+PARTITIONED_MODES = {
+    0: (3, 4, 4, 'endpoint', 3, False),
+    1: (2, 6, 6, 'shared', 3, False),
+    2: (3, 6, 5, None, 2, False),
+    3: (2, 6, 7, 'endpoint', 2, False),
+    7: (2, 6, 5, 'endpoint', 2, True),
+}
+
+# Subset of every pixel for the 64 two-subset partitions, bit i is pixel i
+PARTITIONS_2 = np.array([
+    0xCCCC, 0x8888, 0xEEEE, 0xECC8, 0xC880, 0xFEEC, 0xFEC8, 0xEC80,
+    0xC800, 0xFFEC, 0xFE80, 0xE800, 0xFFE8, 0xFF00, 0xFFF0, 0xF000,
+    0xF710, 0x008E, 0x7100, 0x08CE, 0x008C, 0x7310, 0x3100, 0x8CCE,
+    0x088C, 0x3110, 0x6666, 0x366C, 0x17E8, 0x0FF0, 0x718E, 0x399C,
+    0xAAAA, 0xF0F0, 0x5A5A, 0x33CC, 0x3C3C, 0x55AA, 0x9696, 0xA55A,
+    0x73CE, 0x13C8, 0x324C, 0x3BDC, 0x6996, 0xC33C, 0x9966, 0x0660,
+    0x0272, 0x04E4, 0x4E40, 0x2720, 0xC936, 0x936C, 0x39C6, 0x639C,
+    0x9336, 0x9CC6, 0x817E, 0xE718, 0xCCF0, 0x0FCC, 0x7744, 0xEE22,
+], dtype=np.int32)[:, None] >> np.arange(16) & 1
+
+# Subset of every pixel for the 64 three-subset partitions
+PARTITIONS_3 = np.array([
+    [0, 0, 1, 1, 0, 0, 1, 1, 0, 2, 2, 1, 2, 2, 2, 2], [0, 0, 0, 1, 0, 0, 1, 1, 2, 2, 1, 1, 2, 2, 2, 1],
+    [0, 0, 0, 0, 2, 0, 0, 1, 2, 2, 1, 1, 2, 2, 1, 1], [0, 2, 2, 2, 0, 0, 2, 2, 0, 0, 1, 1, 0, 1, 1, 1],
+    [0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 2, 2, 1, 1, 2, 2], [0, 0, 1, 1, 0, 0, 1, 1, 0, 0, 2, 2, 0, 0, 2, 2],
+    [0, 0, 2, 2, 0, 0, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1], [0, 0, 1, 1, 0, 0, 1, 1, 2, 2, 1, 1, 2, 2, 1, 1],
+    [0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2], [0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2],
+    [0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 2], [0, 0, 1, 2, 0, 0, 1, 2, 0, 0, 1, 2, 0, 0, 1, 2],
+    [0, 1, 1, 2, 0, 1, 1, 2, 0, 1, 1, 2, 0, 1, 1, 2], [0, 1, 2, 2, 0, 1, 2, 2, 0, 1, 2, 2, 0, 1, 2, 2],
+    [0, 0, 1, 1, 0, 1, 1, 2, 1, 1, 2, 2, 1, 2, 2, 2], [0, 0, 1, 1, 2, 0, 0, 1, 2, 2, 0, 0, 2, 2, 2, 0],
+    [0, 0, 0, 1, 0, 0, 1, 1, 0, 1, 1, 2, 1, 1, 2, 2], [0, 1, 1, 1, 0, 0, 1, 1, 2, 0, 0, 1, 2, 2, 0, 0],
+    [0, 0, 0, 0, 1, 1, 2, 2, 1, 1, 2, 2, 1, 1, 2, 2], [0, 0, 2, 2, 0, 0, 2, 2, 0, 0, 2, 2, 1, 1, 1, 1],
+    [0, 1, 1, 1, 0, 1, 1, 1, 0, 2, 2, 2, 0, 2, 2, 2], [0, 0, 0, 1, 0, 0, 0, 1, 2, 2, 2, 1, 2, 2, 2, 1],
+    [0, 0, 0, 0, 0, 0, 1, 1, 0, 1, 2, 2, 0, 1, 2, 2], [0, 0, 0, 0, 1, 1, 0, 0, 2, 2, 1, 0, 2, 2, 1, 0],
+    [0, 1, 2, 2, 0, 1, 2, 2, 0, 0, 1, 1, 0, 0, 0, 0], [0, 0, 1, 2, 0, 0, 1, 2, 1, 1, 2, 2, 2, 2, 2, 2],
+    [0, 1, 1, 0, 1, 2, 2, 1, 1, 2, 2, 1, 0, 1, 1, 0], [0, 0, 0, 0, 0, 1, 1, 0, 1, 2, 2, 1, 1, 2, 2, 1],
+    [0, 0, 2, 2, 1, 1, 0, 2, 1, 1, 0, 2, 0, 0, 2, 2], [0, 1, 1, 0, 0, 1, 1, 0, 2, 0, 0, 2, 2, 2, 2, 2],
+    [0, 0, 1, 1, 0, 1, 2, 2, 0, 1, 2, 2, 0, 0, 1, 1], [0, 0, 0, 0, 2, 0, 0, 0, 2, 2, 1, 1, 2, 2, 2, 1],
+    [0, 0, 0, 0, 0, 0, 0, 2, 1, 1, 2, 2, 1, 2, 2, 2], [0, 2, 2, 2, 0, 0, 2, 2, 0, 0, 1, 2, 0, 0, 1, 1],
+    [0, 0, 1, 1, 0, 0, 1, 2, 0, 0, 2, 2, 0, 2, 2, 2], [0, 1, 2, 0, 0, 1, 2, 0, 0, 1, 2, 0, 0, 1, 2, 0],
+    [0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 0, 0, 0, 0], [0, 1, 2, 0, 1, 2, 0, 1, 2, 0, 1, 2, 0, 1, 2, 0],
+    [0, 1, 2, 0, 2, 0, 1, 2, 1, 2, 0, 1, 0, 1, 2, 0], [0, 0, 1, 1, 2, 2, 0, 0, 1, 1, 2, 2, 0, 0, 1, 1],
+    [0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 0, 0, 0, 0, 1, 1], [0, 1, 0, 1, 0, 1, 0, 1, 2, 2, 2, 2, 2, 2, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 2, 1, 2, 1, 2, 1, 2, 1], [0, 0, 2, 2, 1, 1, 2, 2, 0, 0, 2, 2, 1, 1, 2, 2],
+    [0, 0, 2, 2, 0, 0, 1, 1, 0, 0, 2, 2, 0, 0, 1, 1], [0, 2, 2, 0, 1, 2, 2, 1, 0, 2, 2, 0, 1, 2, 2, 1],
+    [0, 1, 0, 1, 2, 2, 2, 2, 2, 2, 2, 2, 0, 1, 0, 1], [0, 0, 0, 0, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1],
+    [0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 2, 2, 2, 2], [0, 2, 2, 2, 0, 1, 1, 1, 0, 2, 2, 2, 0, 1, 1, 1],
+    [0, 0, 0, 2, 1, 1, 1, 2, 0, 0, 0, 2, 1, 1, 1, 2], [0, 0, 0, 0, 2, 1, 1, 2, 2, 1, 1, 2, 2, 1, 1, 2],
+    [0, 2, 2, 2, 0, 1, 1, 1, 0, 1, 1, 1, 0, 2, 2, 2], [0, 0, 0, 2, 1, 1, 1, 2, 1, 1, 1, 2, 0, 0, 0, 2],
+    [0, 1, 1, 0, 0, 1, 1, 0, 0, 1, 1, 0, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 2, 1, 1, 2, 2, 1, 1, 2],
+    [0, 1, 1, 0, 0, 1, 1, 0, 2, 2, 2, 2, 2, 2, 2, 2], [0, 0, 2, 2, 0, 0, 1, 1, 0, 0, 1, 1, 0, 0, 2, 2],
+    [0, 0, 2, 2, 1, 1, 2, 2, 1, 1, 2, 2, 0, 0, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 1, 1, 2],
+    [0, 0, 0, 2, 0, 0, 0, 1, 0, 0, 0, 2, 0, 0, 0, 1], [0, 2, 2, 2, 1, 2, 2, 2, 0, 2, 2, 2, 1, 2, 2, 2],
+    [0, 1, 0, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2], [0, 1, 1, 1, 2, 0, 1, 1, 2, 2, 0, 1, 2, 2, 2, 0],
+], dtype=np.int32)
+
+# Anchor pixel of the second subset for two-subset partitions
+ANCHORS_2 = np.array([
+    15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,
+    15, 2, 8, 2, 2, 8, 8, 15, 2, 8, 2, 2, 8, 8, 2, 2,
+    15, 15, 6, 8, 2, 8, 15, 15, 2, 8, 2, 2, 2, 15, 15, 6,
+    6, 2, 6, 8, 15, 15, 2, 2, 15, 15, 15, 15, 15, 2, 2, 15,
+], dtype=np.int32)
+
+# Anchor pixels of the second and third subsets for three-subset partitions
+ANCHORS_3 = np.array([
+    [3, 3, 15, 15, 8, 3, 15, 15, 8, 8, 6, 6, 6, 5, 3, 3,
+     3, 3, 8, 15, 3, 3, 6, 10, 5, 8, 8, 6, 8, 5, 15, 15,
+     8, 15, 3, 5, 6, 10, 8, 15, 15, 3, 15, 5, 15, 15, 15, 15,
+     3, 15, 5, 5, 5, 8, 5, 10, 5, 10, 8, 13, 15, 12, 3, 3],
+    [15, 8, 8, 3, 15, 15, 3, 8, 15, 15, 15, 15, 15, 15, 15, 8,
+     15, 8, 15, 3, 15, 8, 15, 8, 3, 15, 6, 10, 15, 15, 10, 8,
+     15, 3, 15, 10, 10, 8, 9, 10, 6, 15, 8, 15, 3, 6, 6, 8,
+     15, 3, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 3, 15, 15, 8],
+], dtype=np.int32)
+
+class _BitWriter:
+    """Appends fixed-width fields LSB-first into one 128-bit value per block"""
+    
+    def __init__(self, count):
+        self.lo = np.zeros(count, dtype=np.uint64)
+        self.hi = np.zeros(count, dtype=np.uint64)
+        self.pos = 0
+    
+    def put(self, values, width):
+        v = np.asarray(values).astype(np.uint64) & np.uint64((1 << width) - 1)
+        if self.pos < 64:
+            self.lo |= v << np.uint64(self.pos)
+            if self.pos + width > 64:
+                self.hi |= v >> np.uint64(64 - self.pos)
+        else:
+            self.hi |= v << np.uint64(self.pos - 64)
+        self.pos += width
+    
+    def put_indices(self, indices, bits):
+        """Write 16 indices, the anchor (first pixel) one bit shorter"""
+        self.put(indices[:, 0], bits - 1)
+        for i in range(1, 16):
+            self.put(indices[:, i], bits)
+
+def _quantize_pbit(values, bits, p):
+    """Quantize (n, c) endpoints to `bits` bits above a fixed p-bit, returning (q, expanded)"""
+    total = bits + 1
+    q = np.clip(np.rint((values * (((1 << total) - 1) / 255) - p) / 2), 0, (1 << bits) - 1).astype(np.int32)
+    e = (q << 1) | p
+    return q, (e << (8 - total)) | (e >> (2 * total - 8))
+
+def _quantize(values, bits, pbit):
+    """Quantize (n, c) endpoints to `bits` bits plus an optional p-bit of their own, returning (q, p, expanded)"""
+    if pbit:
+        candidates = []
+        for p in (0, 1):
+            q, e = _quantize_pbit(values, bits, p)
+            candidates.append((q, e, ((e - values) ** 2).sum(axis=1)))
+        (q0, e0, err0), (q1, e1, err1) = candidates
+        use_one = err1 < err0
+        return (np.where(use_one[:, None], q1, q0), use_one.astype(np.int32),
+                np.where(use_one[:, None], e1, e0))
+    
+    q = np.clip(np.rint(values * (((1 << bits) - 1) / 255)), 0, (1 << bits) - 1).astype(np.int32)
+    e = (q << (8 - bits)) | (q >> (2 * bits - 8))
+    return q, np.zeros(len(values), dtype=np.int32), e
+
+def _quantize_shared(lo, hi, bits):
+    """Quantize an endpoint pair whose p-bit is shared, returning (q0, p, e0, q1, p, e1)"""
+    candidates = []
+    for p in (0, 1):
+        q0, e0 = _quantize_pbit(lo, bits, p)
+        q1, e1 = _quantize_pbit(hi, bits, p)
+        candidates.append((q0, e0, q1, e1, ((e0 - lo) ** 2).sum(axis=1) + ((e1 - hi) ** 2).sum(axis=1)))
+    (a0, ae0, a1, ae1, err0), (b0, be0, b1, be1, err1) = candidates
+    use_one = (err1 < err0)[:, None]
+    p = use_one[:, 0].astype(np.int32)
+    return (np.where(use_one, b0, a0), p, np.where(use_one, be0, ae0),
+            np.where(use_one, b1, a1), p, np.where(use_one, be1, ae1))
+
+def _select(mask, new, old):
+    """Per-block choice between two arrays sharing the leading block axis"""
+    return np.where(mask.reshape((-1,) + (1,) * (new.ndim - 1)), new, old)
+
+def _fit(values, index_bits, bits, pbit, iterations, mask=None, anchor=None):
+    """Fit one subset of (n, 16, c) pixels, returning endpoints, indices and squared error per block
+    
+    pbit is 'endpoint', 'shared' or None. mask (n, 16) picks the subset's pixels, all of them
+    when None, and anchor (n,) is the pixel whose index must have its top bit clear, pixel 0
+    when None. Indices of pixels outside the mask are meaningless.
+    """
+    weights = WEIGHTS[index_bits]
+    midpoints = (weights[1:] + weights[:-1]) / 2
+    lo, hi = principal_endpoints(values, mask)
+    
+    best = None
+    for i in range(iterations + 1):
+        if pbit == 'shared':
+            q0, p0, e0, q1, p1, e1 = _quantize_shared(lo, hi, bits)
+        else:
+            q0, p0, e0 = _quantize(lo, bits, pbit == 'endpoint')
+            q1, p1, e1 = _quantize(hi, bits, pbit == 'endpoint')
+        
+        d = (e1 - e0).astype(np.float32)
+        dd = np.maximum((d * d).sum(axis=1), 1e-8)
+        t = np.matmul(values - e0[:, None, :], d[..., None])[..., 0] * (64 / dd[:, None])
+        indices = np.searchsorted(midpoints, t)
+        
+        w = weights[indices][..., None]
+        recon = ((64 - w) * e0[:, None, :] + w * e1[:, None, :] + 32) >> 6
+        err = ((recon - values) ** 2).sum(axis=2)
+        err = err.sum(axis=1) if mask is None else (err * mask).sum(axis=1)
+        
+        fit = {'q0': q0, 'p0': p0, 'q1': q1, 'p1': p1, 'indices': indices, 'err': err}
+        if best is None:
+            best = fit
+        else:
+            better = err < best['err']
+            best = {k: _select(better, fit[k], best[k]) for k in best}
+        
+        if i < iterations:
+            new_lo, new_hi, ok = least_squares_endpoints(values, 1 - weights[indices] / np.float32(64), mask)
+            lo, hi = _select(ok, new_lo, lo), _select(ok, new_hi, hi)
+    
+    # The anchor index must have its top bit clear, swapping endpoints mirrors every index
+    anchor_index = best['indices'][:, 0] if anchor is None else best['indices'][np.arange(len(values)), anchor]
+    swap = anchor_index >= (1 << (index_bits - 1))
+    for a, b in (('q0', 'q1'), ('p0', 'p1')):
+        best[a], best[b] = _select(swap, best[b], best[a]), _select(swap, best[a], best[b])
+    best['indices'] = _select(swap, (1 << index_bits) - 1 - best['indices'], best['indices'])
+    return best
+
+def _rotate(values, rotation):
+    """Swap alpha with R, G or B for modes 4 and 5 (the decoder swaps them back)"""
+    if rotation == 0:
+        return values
+    order = [0, 1, 2, 3]
+    order[rotation - 1], order[3] = 3, rotation - 1
+    return values[..., order]
+
+def _encode_mode6(values, iterations):
+    """Mode 6: one RGBA subset, 7-bit endpoints with p-bits, 4-bit indices"""
+    fit = _fit(values, 4, 7, 'endpoint', iterations)
+    
+    out = _BitWriter(len(values))
+    out.put(1 << 6, 7)
+    for ch in range(4):
+        out.put(fit['q0'][:, ch], 7)
+        out.put(fit['q1'][:, ch], 7)
+    out.put(fit['p0'], 1)
+    out.put(fit['p1'], 1)
+    out.put_indices(fit['indices'], 4)
+    return out, fit['err']
+
+def _encode_mode5(values, rotation, iterations):
+    """Mode 5: separate RGB (7-bit) and alpha (8-bit) endpoints, 2-bit indices for both"""
+    rotated = _rotate(values, rotation)
+    color = _fit(rotated[..., :3], 2, 7, None, iterations)
+    alpha = _fit(rotated[..., 3:], 2, 8, None, iterations)
+    
+    out = _BitWriter(len(values))
+    out.put(1 << 5, 6)
+    out.put(rotation, 2)
+    for ch in range(3):
+        out.put(color['q0'][:, ch], 7)
+        out.put(color['q1'][:, ch], 7)
+    out.put(alpha['q0'][:, 0], 8)
+    out.put(alpha['q1'][:, 0], 8)
+    out.put_indices(color['indices'], 2)
+    out.put_indices(alpha['indices'], 2)
+    return out, color['err'] + alpha['err']
+
+def _encode_mode4(values, rotation, index_mode, iterations):
+    """Mode 4: RGB (5-bit) and alpha (6-bit) endpoints, one 2-bit and one 3-bit index set"""
+    rotated = _rotate(values, rotation)
+    color = _fit(rotated[..., :3], 3 if index_mode else 2, 5, None, iterations)
+    alpha = _fit(rotated[..., 3:], 2 if index_mode else 3, 6, None, iterations)
+    
+    out = _BitWriter(len(values))
+    out.put(1 << 4, 5)
+    out.put(rotation, 2)
+    out.put(index_mode, 1)
+    for ch in range(3):
+        out.put(color['q0'][:, ch], 5)
+        out.put(color['q1'][:, ch], 5)
+    out.put(alpha['q0'][:, 0], 6)
+    out.put(alpha['q1'][:, 0], 6)
+    
+    # The 2-bit index set always comes first, the index mode says which one is colour
+    two_bit, three_bit = (alpha, color) if index_mode else (color, alpha)
+    out.put_indices(two_bit['indices'], 2)
+    out.put_indices(three_bit['indices'], 3)
+    return out, color['err'] + alpha['err']
+
+def _partition_scores(values, partitions):
+    """Score every partition (n, p) by how far its subsets stray from a line in each block
+    
+    The score is the variance left off each subset's principal axis, a cheap stand-in
+    for the error of actually encoding the block with that partition.
+    """
+    scores = np.empty((len(values), len(partitions)), dtype=np.float32)
+    for i, subset in enumerate(partitions):
+        score = 0
+        for k in range(subset.max() + 1):
+            pixels = values[:, subset == k]
+            centered = pixels - pixels.mean(axis=1, keepdims=True)
+            cov = np.matmul(centered.transpose(0, 2, 1), centered)
+            axis = (pixels.max(axis=1) - pixels.min(axis=1))[..., None] + np.float32(1e-3)
+            for _ in range(POWER_ITERATIONS):
+                axis = np.matmul(cov, axis)
+                axis /= np.maximum(np.abs(axis).max(axis=1, keepdims=True), 1e-8)
+            along = np.matmul(axis.transpose(0, 2, 1), np.matmul(cov, axis))[:, 0, 0] / np.maximum((axis * axis).sum(axis=(1, 2)), 1e-8)
+            score = score + np.trace(cov, axis1=1, axis2=2) - along
+        scores[:, i] = score
+    return scores
+
+def _top_partitions(scores):
+    """Get the QUALITY_PARTITIONS best-scoring partition numbers (n, QUALITY_PARTITIONS) per block"""
+    return np.argsort(scores, axis=1, kind='stable')[:, :QUALITY_PARTITIONS]
+
+def _encode_partitioned(values, mode, partition, iterations):
+    """Modes 0, 1, 2, 3 and 7: two or three subsets picked by a per-block partition number"""
+    subsets, partition_bits, bits, pbit, index_bits, with_alpha = PARTITIONED_MODES[mode]
+    n = len(values)
+    subset = (PARTITIONS_2 if subsets == 2 else PARTITIONS_3)[partition]
+    if subsets == 2:
+        anchors = [None, ANCHORS_2[partition]]
+    else:
+        anchors = [None, ANCHORS_3[0, partition], ANCHORS_3[1, partition]]
+    
+    channels = values if with_alpha else values[..., :3]
+    fits = [_fit(channels, index_bits, bits, pbit, iterations, subset == k, anchors[k]) for k in range(subsets)]
+    
+    indices = np.zeros((n, 16), dtype=fits[0]['indices'].dtype)
+    err = 0
+    for k, fit in enumerate(fits):
+        indices = np.where(subset == k, fit['indices'], indices)
+        err = err + fit['err']
+    if not with_alpha:
+        # Opaque modes decode alpha as 255
+        err = err + ((255 - values[..., 3]) ** 2).sum(axis=1)
+    
+    # Anchor pixels, whose indices are a bit shorter, depend on the partition, so blocks
+    # are written in groups sharing one
+    out = _BitWriter(n)
+    for p in np.unique(partition):
+        sel = partition == p
+        group = _BitWriter(int(sel.sum()))
+        group.put(1 << mode, mode + 1)
+        group.put(p, partition_bits)
+        for ch in range(channels.shape[2]):
+            for fit in fits:
+                group.put(fit['q0'][sel, ch], bits)
+                group.put(fit['q1'][sel, ch], bits)
+        if pbit == 'endpoint':
+            for fit in fits:
+                group.put(fit['p0'][sel], 1)
+                group.put(fit['p1'][sel], 1)
+        elif pbit == 'shared':
+            for fit in fits:
+                group.put(fit['p0'][sel], 1)
+        
+        anchor_pixels = {0} | {int(a[sel][0]) for a in anchors[1:]}
+        for i in range(16):
+            group.put(indices[sel, i], index_bits - (i in anchor_pixels))
+        out.lo[sel], out.hi[sel] = group.lo, group.hi
+    return out, err
+
+def encode_blocks_bc7(blocks, preset='fast'):
+    """Encode (n, 16, 4) uint8 RGBA blocks to BC7, returning the raw 16-byte blocks"""
+    if preset not in BC7_PRESETS:
+        raise ValueError(f"Unknown BC7 preset: {preset}")
+    
+    values = blocks.astype(np.float32)
+    
+    # Each candidate encodes the blocks at some rows, the opaque ones (modes 0-3) never store alpha
+    if preset == 'fast':
+        candidates = [(False, lambda rows: _encode_mode6(values[rows], FAST_ITERATIONS))]
+    else:
+        candidates = [(False, lambda rows: _encode_mode6(values[rows], QUALITY_ITERATIONS))]
+        for rotation in range(4):
+            candidates.append((False, lambda rows, r=rotation: _encode_mode5(values[rows], r, QUALITY_ITERATIONS)))
+            for index_mode in (0, 1):
+                candidates.append((False, lambda rows, r=rotation, m=index_mode:
+                                   _encode_mode4(values[rows], r, m, QUALITY_ITERATIONS)))
+        
+        # Every partition is scored and the best few per block are encoded in full
+        scores_3 = _partition_scores(values, PARTITIONS_3)
+        ranked = {0: _top_partitions(scores_3[:, :16]), 2: _top_partitions(scores_3)}
+        ranked[1] = ranked[3] = ranked[7] = _top_partitions(_partition_scores(values, PARTITIONS_2))
+        for mode, layout in PARTITIONED_MODES.items():
+            for rank in range(QUALITY_PARTITIONS):
+                candidates.append((not layout[5], lambda rows, m=mode, r=rank:
+                                   _encode_partitioned(values[rows], m, ranked[m][rows, r], QUALITY_ITERATIONS)))
+    
+    opaque_err = ((255 - values[..., 3]) ** 2).sum(axis=1)
+    best, best_err = None, None
+    for opaque, encode in candidates:
+        rows = np.arange(len(values))
+        if opaque and best is not None:
+            # Missing alpha alone costs opaque_err, blocks already below it can not improve
+            rows = rows[opaque_err < best_err]
+            if not len(rows):
+                continue
+        
+        out, err = encode(rows)
+        if best is None:
+            best, best_err = out, err
+        else:
+            better = err < best_err[rows]
+            picked = rows[better]
+            best.lo[picked] = out.lo[better]
+            best.hi[picked] = out.hi[better]
+            best_err[picked] = err[better]
+    
+    packed = np.empty((len(values), 2), dtype='<u8')
+    packed[:, 0], packed[:, 1] = best.lo, best.hi
+    return packed.tobytes()
@@ -0,0 +1,138 @@
+import numpy as np
+from Modules.bc_encoder import BC1_BLOCK, BC3_BLOCK, BC7_FORMATS
+from Modules.dat_module import DatMetadata
+
+# Blocks decoded per NumPy pass, keeps temporaries small when a whole bundle is decoded at once
+DECODE_CHUNK_BLOCKS = 1 << 16
+
+BLOCK_BYTES = {'BC1_UNORM': 8, 'BC2_UNORM': 16, 'BC3_UNORM': 16, 'BC7_UNORM': 16}
+BC2_BLOCK = np.dtype([('alpha', '<u8'), ('c0', '<u2'), ('c1', '<u2'), ('indices', '<u4')])
+
+def _expand_565(packed):
+    packed = packed.astype(np.int32)
+    r, g, b = (packed >> 11) & 31, (packed >> 5) & 63, packed & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1)
+
+def _decode_colors(blocks, four_color_only):
+    """Decode the BC1 colour half of structured blocks to (n, 16, 4) RGBA"""
+    c0, c1 = blocks['c0'], blocks['c1']
+    e0, e1 = _expand_565(c0), _expand_565(c1)
+    four_color = ((c0 > c1) | four_color_only)[:, None]
+    
+    # c0 > c1 interpolates thirds, otherwise halves plus transparent black (BC1 only)
+    palette = np.zeros((len(blocks), 4, 4), dtype=np.uint8)
+    palette[:, 0, :3], palette[:, 1, :3] = e0, e1
+    palette[:, 2, :3] = np.where(four_color, (2 * e0 + e1) // 3, (e0 + e1) // 2)
+    palette[:, 3, :3] = np.where(four_color, (e0 + 2 * e1) // 3, 0)
+    palette[..., 3] = 255
+    palette[:, 3, 3] = np.where(four_color[:, 0], 255, 0)
+    
+    # Gathering whole RGBA entries as uint32 is much faster than per-channel indexing
+    indices = (blocks['indices'][:, None] >> (np.arange(16, dtype=np.uint32) * 2)) & 3
+    indices = indices + (np.arange(len(blocks), dtype=np.uint32) * 4)[:, None]
+    return palette.view(np.uint32).reshape(-1)[indices].view(np.uint8).reshape(-1, 16, 4)
+
+def _decode_alpha(blocks):
+    """Decode BC3 8 or 6 value alpha to (n, 16)"""
+    a0, a1 = blocks['a0'].astype(np.int32), blocks['a1'].astype(np.int32)
+    eight = (a0 > a1)[:, None]
+    
+    steps = np.arange(1, 7, dtype=np.int32)
+    palette = np.zeros((len(blocks), 8), dtype=np.uint8)
+    palette[:, 0], palette[:, 1] = a0, a1
+    palette[:, 2:] = np.where(eight, ((7 - steps) * a0[:, None] + steps * a1[:, None]) // 7,
+                              ((5 - steps) * a0[:, None] + steps * a1[:, None]) // 5)
+    palette[:, 6] = np.where(eight[:, 0], palette[:, 6], 0)
+    palette[:, 7] = np.where(eight[:, 0], palette[:, 7], 255)
+    
+    packed = blocks['alpha_indices'].astype(np.uint64) << (np.arange(6, dtype=np.uint64) * 8)
+    bits = packed.sum(axis=1, dtype=np.uint64)
+    indices = (bits[:, None] >> (np.arange(16, dtype=np.uint64) * 3)) & np.uint64(7)
+    indices = indices.astype(np.intp) + (np.arange(len(blocks)) * 8)[:, None]
+    return palette.reshape(-1)[indices]
+
+def decode_blocks(data, format_type):
+    """Decode a BC1/BC2/BC3/BC7 payload to (n, 16, 4) uint8 RGBA pixels, one row of 16 per block"""
+    if format_type in BC7_FORMATS:
+        from Modules.bc7_decoder import decode_blocks_bc7
+        return decode_blocks_bc7(np.frombuffer(data, dtype=np.uint8))
+    
+    if format_type in ('BC1_UNORM', 'DXT1'):
+        return _decode_colors(np.frombuffer(data, dtype=BC1_BLOCK), False)
+    if format_type in ('BC2_UNORM', 'DXT3'):
+        blocks = np.frombuffer(data, dtype=BC2_BLOCK)
+        pixels = _decode_colors(blocks, True)
+        pixels[..., 3] = ((blocks['alpha'][:, None] >> (np.arange(16, dtype=np.uint64) * 4)) & np.uint64(15)) * 17
+        return pixels
+    if format_type in ('BC3_UNORM', 'DXT5'):
+        blocks = np.frombuffer(data, dtype=BC3_BLOCK)
+        pixels = _decode_colors(blocks, True)
+        pixels[..., 3] = _decode_alpha(blocks)
+        return pixels
+    raise ValueError(f"Unsupported format for the NumPy decoder: {format_type}")
+
+def _to_image(pixels, width, height):
+    """Reassemble (n, 16, 4) block pixels into an (height, width, 4) array"""
+    bh, bw = (height + 3) // 4, (width + 3) // 4
+    image = pixels.reshape(bh, bw, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(bh * 4, bw * 4, 4)
+    return image[:height, :width]
+
+def decode_image(payload, width, height, format_type):
+    """Decode a raw texture payload (the contents of a _texture.dat) to an (height, width, 4) RGBA array"""
+    return decode_images([(payload, width, height, format_type)])[0]
+
+def decode_images(items):
+    """Decode (payload, width, height, format_type) items, returning RGBA arrays in order
+    
+    Payloads of one format are decoded together, so a bundle of small textures costs a
+    handful of NumPy passes instead of several per texture. Items whose payload is too
+    short for their dimensions come back as None.
+    """
+    results = [None] * len(items)
+    groups = {}
+    for i, (payload, width, height, format_type) in enumerate(items):
+        block_bytes = BLOCK_BYTES.get(format_type)
+        if block_bytes is None:
+            raise ValueError(f"Unsupported format for the NumPy decoder: {format_type}")
+        size = ((width + 3) // 4) * ((height + 3) // 4) * block_bytes
+        if len(payload) >= size:
+            groups.setdefault(format_type, []).append((i, memoryview(payload)[:size]))
+    
+    for format_type, members in groups.items():
+        data = b''.join(payload for _, payload in members)
+        block_bytes = BLOCK_BYTES[format_type]
+        chunk = DECODE_CHUNK_BLOCKS * block_bytes
+        pixels = np.concatenate([decode_blocks(data[start:start + chunk], format_type)
+                                 for start in range(0, len(data), chunk)])
+        
+        offset = 0
+        for i, payload in members:
+            count = len(payload) // block_bytes
+            _, width, height, _ = items[i]
+            results[i] = _to_image(pixels[offset:offset + count], width, height)
+            offset += count
+    return results
+
+def read_texture_dats(texture_dat_paths):
+    """Decode _texture.dat files using the format and dimensions in their metadata DATs
+    
+    Returns an RGBA array per path in order, None where the DAT could not be read or decoded.
+    """
+    items, readable = [], []
+    for path in texture_dat_paths:
+        metadata_dat_path = path.replace('_texture.dat', '.dat')
+        try:
+            with DatMetadata(metadata_dat_path) as metadata:
+                format_type = metadata.read_format()
+                width, height = metadata.read_dimensions()
+            if format_type not in BLOCK_BYTES or not width or not height:
+                continue
+            with open(path, 'rb') as f:
+                payload = f.read()
+        except (OSError, ValueError):
+            continue
+        items.append((payload, width, height, format_type))
+        readable.append(path)
+    
+    decoded = dict(zip(readable, decode_images(items)))
+    return [decoded.get(path) for path in texture_dat_paths]
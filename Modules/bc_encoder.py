@@ -0,0 +1,212 @@
+import os
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+ENCODE_WORKERS = os.cpu_count() or 1
+BC7_FORMATS = ('BC7_UNORM', 'BC7')
+
+# 4x4 blocks encoded per NumPy pass, whole rows of blocks at a time. Keeps temporaries
+# the same size however large the image is (32 rows of a 4096 wide image)
+STRIP_BLOCKS = 32768
+POWER_ITERATIONS = 4
+
+BC1_BLOCK = np.dtype([('c0', '<u2'), ('c1', '<u2'), ('indices', '<u4')])
+BC3_BLOCK = np.dtype([('a0', 'u1'), ('a1', 'u1'), ('alpha_indices', 'u1', 6),
+                      ('c0', '<u2'), ('c1', '<u2'), ('indices', '<u4')])
+
+# Palette weight of endpoint 0 for BC1 colour indices 0..3 in 4-colour mode
+BC1_WEIGHTS = np.array([1.0, 0.0, 2.0 / 3.0, 1.0 / 3.0], dtype=np.float32)
+# Colour index for thirds of the way from endpoint 1 to endpoint 0
+STEP_TO_INDEX = np.array([1, 3, 2, 0], dtype=np.uint32)
+
+def to_blocks(pixels):
+    """Split an (h, w, c) array into (block rows, blocks per row, 16, c), edge-padding to multiples of 4"""
+    h, w, c = pixels.shape
+    ph, pw = (h + 3) // 4 * 4, (w + 3) // 4 * 4
+    if (ph, pw) != (h, w):
+        pixels = np.pad(pixels, ((0, ph - h), (0, pw - w), (0, 0)), mode='edge')
+    blocks = pixels.reshape(ph // 4, 4, pw // 4, 4, c).transpose(0, 2, 1, 3, 4)
+    return blocks.reshape(ph // 4, pw // 4, 16, c)
+
+def _quantize_565(colors):
+    """Round float RGB endpoints to packed 565"""
+    c = np.clip(np.rint(colors * np.array([31 / 255, 63 / 255, 31 / 255], dtype=np.float32)), 0, [31, 63, 31])
+    c = c.astype(np.uint16)
+    return (c[..., 0] << 11) | (c[..., 1] << 5) | c[..., 2]
+
+def _expand_565(packed):
+    """Expand packed 565 endpoints to 8-bit RGB the way decoders do"""
+    packed = packed.astype(np.int32)
+    r, g, b = (packed >> 11) & 31, (packed >> 5) & 63, packed & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1).astype(np.float32)
+
+def _pick_indices(colors, c0, c1):
+    """Nearest 4-colour palette entry for every pixel, plus the total squared error per block"""
+    e0, e1 = _expand_565(c0), _expand_565(c1)
+    
+    # The palette lies on the e1 -> e0 line, so project onto it instead of measuring all 4 distances
+    d = e0 - e1
+    dd = np.maximum((d * d).sum(axis=1), 1e-8)
+    t = np.matmul(colors - e1[:, None, :], d[..., None])[..., 0] / dd[:, None]
+    steps = np.clip(np.rint(t * 3), 0, 3).astype(np.intp)
+    indices = STEP_TO_INDEX[steps]
+    
+    chosen = e1[:, None, :] + (steps[..., None] / np.float32(3)) * d[:, None, :]
+    error = ((colors - chosen) ** 2).sum(axis=(1, 2))
+    return indices, error
+
+def least_squares_endpoints(colors, w0, mask=None):
+    """Least-squares endpoints for fixed per-pixel weights of endpoint 0, with a mask of blocks where the fit is solvable
+    
+    An (n, 16) pixel mask leaves the other pixels of each block out of the fit.
+    """
+    a = w0 if mask is None else w0 * mask
+    b = 1 - w0 if mask is None else (1 - w0) * mask
+    aa, bb, ab = (a * a).sum(1), (b * b).sum(1), (a * b).sum(1)
+    ax = (a[..., None] * colors).sum(1)
+    bx = (b[..., None] * colors).sum(1)
+    det = aa * bb - ab * ab
+    ok = np.abs(det) > 1e-6
+    det = np.where(ok, det, 1)[:, None]
+    e0 = (bb[:, None] * ax - ab[:, None] * bx) / det
+    e1 = (aa[:, None] * bx - ab[:, None] * ax) / det
+    return np.clip(e0, 0, 255), np.clip(e1, 0, 255), ok
+
+def principal_endpoints(colors, mask=None):
+    """Get the (low, high) pixels of each (n, 16, c) block along its principal axis
+    
+    An (n, 16) pixel mask limits each block to the pixels of one subset.
+    """
+    # Power iteration started from the bounding box diagonal
+    if mask is None:
+        mean = colors.mean(axis=1, keepdims=True)
+        centered = colors - mean
+        extent = colors.max(axis=1) - colors.min(axis=1)
+    else:
+        m = mask[..., None].astype(colors.dtype)
+        mean = (colors * m).sum(axis=1, keepdims=True) / np.maximum(m.sum(axis=1, keepdims=True), 1)
+        centered = (colors - mean) * m
+        extent = np.where(m > 0, colors, 0).max(axis=1) - np.where(m > 0, colors, 255).min(axis=1)
+    cov = np.matmul(centered.transpose(0, 2, 1), centered)
+    axis = extent[..., None] + np.float32(1e-3)
+    for _ in range(POWER_ITERATIONS):
+        axis = np.matmul(cov, axis)
+        axis /= np.maximum(np.abs(axis).max(axis=1, keepdims=True), 1e-8)
+    proj = np.matmul(centered, axis)[..., 0]
+    rows = np.arange(len(colors))
+    if mask is None:
+        return colors[rows, proj.argmin(axis=1)], colors[rows, proj.argmax(axis=1)]
+    return colors[rows, np.where(mask, proj, np.inf).argmin(axis=1)], colors[rows, np.where(mask, proj, -np.inf).argmax(axis=1)]
+
+def _encode_colors(colors):
+    """Encode (n, 16, 3) float colours into BC1 4-colour endpoints and packed indices"""
+    # Endpoints from the extent of the block along its principal axis
+    lo, hi = principal_endpoints(colors)
+    
+    c0, c1 = _quantize_565(hi), _quantize_565(lo)
+    indices, error = _pick_indices(colors, c0, c1)
+    
+    # One least-squares refinement pass, kept only where it lowers the error
+    e0, e1, ok = least_squares_endpoints(colors, BC1_WEIGHTS[indices])
+    r0, r1 = _quantize_565(e0), _quantize_565(e1)
+    r_indices, r_error = _pick_indices(colors, r0, r1)
+    better = ok & (r_error < error)
+    c0, c1 = np.where(better, r0, c0), np.where(better, r1, c1)
+    indices = np.where(better[:, None], r_indices, indices)
+    
+    # 4-colour mode needs c0 > c1, swapping endpoints swaps indices 0<->1 and 2<->3
+    swap = c0 < c1
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+    indices = np.where(swap[:, None], indices ^ 1, indices)
+    indices = np.where((c0 == c1)[:, None], 0, indices)
+    
+    shifts = np.arange(16, dtype=np.uint32) * 2
+    packed = (indices.astype(np.uint32) << shifts).sum(axis=1, dtype=np.uint32)
+    return c0, c1, packed
+
+def _encode_alpha(alpha):
+    """Encode (n, 16) alpha values into BC3 8-value endpoints and 6 bytes of indices"""
+    a0 = alpha.max(axis=1).astype(np.int32)
+    a1 = alpha.min(axis=1).astype(np.int32)
+    
+    # a0 > a1 selects 8-value mode: a0, a1, then 6 interpolated steps from a0 to a1
+    steps = np.array([0, 7, 1, 2, 3, 4, 5, 6], dtype=np.int32)
+    palette = ((7 - steps)[None, :] * a0[:, None] + steps[None, :] * a1[:, None]) // 7
+    dist = np.abs(alpha[:, :, None].astype(np.int32) - palette[:, None, :])
+    indices = dist.argmin(axis=-1).astype(np.uint64)
+    indices[a0 == a1] = 0
+    
+    bits = (indices << (np.arange(16, dtype=np.uint64) * 3)).sum(axis=1, dtype=np.uint64)
+    packed = np.stack([(bits >> np.uint64(8 * i)) & np.uint64(0xFF) for i in range(6)], axis=1).astype(np.uint8)
+    return a0.astype(np.uint8), a1.astype(np.uint8), packed
+
+def encode_blocks(blocks, format_type):
+    """Encode (n, 16, 4) uint8 RGBA blocks into a structured BC1 or BC3 block array"""
+    colors = blocks[..., :3].astype(np.float32)
+    c0, c1, indices = _encode_colors(colors)
+    
+    if format_type in ('BC1_UNORM', 'DXT1'):
+        out = np.empty(len(blocks), dtype=BC1_BLOCK)
+    elif format_type in ('BC3_UNORM', 'DXT5'):
+        out = np.empty(len(blocks), dtype=BC3_BLOCK)
+        out['a0'], out['a1'], out['alpha_indices'] = _encode_alpha(blocks[..., 3])
+    else:
+        raise ValueError(f"Unsupported format for the NumPy encoder: {format_type}")
+    
+    out['c0'], out['c1'], out['indices'] = c0, c1, indices
+    return out
+
+def strip_rows(width):
+    """Get the pixel rows per strip for an image size, a multiple of 4"""
+    blocks_per_row = (width + 3) // 4
+    return max(1, STRIP_BLOCKS // blocks_per_row) * 4
+
+def _encode_strip(pixels, top, rows, format_type, preset):
+    """Encode the block rows of pixels starting at pixel row top"""
+    strip = np.asarray(pixels[top:top + rows], dtype=np.uint8)
+    if strip.shape[2] == 3:
+        strip = np.concatenate([strip, np.full(strip.shape[:2] + (1,), 255, dtype=np.uint8)], axis=2)
+    
+    # Only the last strip can be short of a block row, to_blocks edge-pads it like the whole image would be
+    blocks = to_blocks(strip).reshape(-1, 16, 4)
+    if format_type in BC7_FORMATS:
+        from Modules.bc7_encoder import encode_blocks_bc7
+        return encode_blocks_bc7(blocks, preset)
+    return encode_blocks(blocks, format_type).tobytes()
+
+def iter_encode_image(pixels, format_type, preset='fast', workers=None):
+    """Yield the raw BC1/BC3/BC7 payload of an (h, w, 3 or 4) uint8 image strip by strip, top to bottom
+    
+    pixels is an array, or anything with a shape that returns arrays for slices of rows,
+    so a source can build each strip when it is asked for. Only a few strips are worked
+    on or waiting to be written at once, so memory stays bounded on 8192x8192 images.
+    """
+    height, width = pixels.shape[:2]
+    rows = strip_rows(width)
+    tops = range(0, height, rows)
+    workers = min(workers or ENCODE_WORKERS, len(tops))
+    
+    if workers <= 1:
+        for top in tops:
+            yield _encode_strip(pixels, top, rows, format_type, preset)
+        return
+    
+    # NumPy releases the GIL inside its array loops, so strips encode in parallel on threads.
+    # At most two strips per thread are in flight, finished ones are yielded in order.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for top in tops:
+            pending.append(executor.submit(_encode_strip, pixels, top, rows, format_type, preset))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def encode_image(pixels, format_type, preset='fast', workers=None):
+    """Encode an (h, w, 3 or 4) uint8 array to the raw BC1/BC3/BC7 payload, rows of blocks top to bottom"""
+    return b''.join(iter_encode_image(pixels, format_type, preset, workers))
+
+def supports_format(format_type):
+    """Check whether the NumPy encoder can produce a format"""
+    return format_type in ('BC1_UNORM', 'DXT1', 'BC3_UNORM', 'DXT5') + BC7_FORMATS
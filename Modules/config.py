@@ -7,7 +7,16 @@ CONFIG_FILE = "decal_tool_config.json"
 DEFAULT_CONFIG = {
     "images_dir": "Images",
     "raw_dir": "Raw",
-    "texconv_path": "texconv.exe"
+    "texconv_path": "texconv.exe",
+    "encoder": "auto",
+    "bc7_preset": "fast",
+    "scratch_dir": "",  # empty picks RAM-backed storage when available
+    "cache_dir": "decal_payload_cache",
+    "cache_size_mb": 4096,  # 0 disables the conversion cache
+    "stale_check_hash": False,  # hash sources whose mtime changed before reconverting them
+    "conversion_workers": 0,  # 0 starts one conversion process per core
+    "index_format": "binary",
+    "watch_index": False
 }
 
 def load_config():
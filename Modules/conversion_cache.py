@@ -0,0 +1,126 @@
+import os
+import shutil
+import hashlib
+from Modules.dds_module import copy_file_range
+
+CACHE_VERSION = 2       # bump when the key layout or stored payloads change
+HASH_CHUNK = 1024 * 1024
+EVICT_TARGET = 0.9      # evict down to this share of the cap, so eviction doesn't run on every store
+
+def hash_file(path):
+    """Fast content hash of a file, read in chunks"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class ConversionCache:
+    """Encoded texture payloads on disk, keyed by source content and encode parameters
+    
+    Entries are plain files named by key. Their mtime is the LRU clock: hits touch it,
+    and the oldest entries go first once the folder grows past max_bytes.
+    """
+    
+    def __init__(self, cache_dir="decal_payload_cache", max_bytes=4096 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._usage = None
+        self.hits = 0
+        self.misses = 0
+    
+    def key(self, source_hash, width, height, format_type, backend, bc7_preset="fast", transform=''):
+        """Key for a source encoded to a format and size by a backend
+        
+        transform says how the source was brought to that size ('resized', 'padded' or ''),
+        since resizing and padding can reach the same size with different pixels.
+        """
+        preset = bc7_preset if format_type == 'BC7_UNORM' else ''
+        params = (f"{CACHE_VERSION}|{source_hash}|{width}x{height}|{transform}|{format_type}|"
+                  f"{backend.name}/{backend.version}|{preset}")
+        return hashlib.blake2b(params.encode(), digest_size=16).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.bin')
+    
+    def fetch(self, key, out_path):
+        """Copy a cached payload to out_path, returning its size or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as src, open(out_path, 'wb') as out:
+                size = copy_file_range(src, out, 0, os.fstat(src.fileno()).st_size)
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return size
+    
+    def store(self, key, payload_path):
+        """Add the payload file at payload_path under key, evicting old entries past the cap"""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            shutil.copyfile(payload_path, temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"       Warning: Could not cache payload: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        
+        self._usage = self.usage() + os.path.getsize(path) - old_size
+        if self._usage > self.max_bytes:
+            self.evict()
+    
+    def _entries(self):
+        """List (mtime, size, path) for every cached payload"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.bin'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+    
+    def usage(self):
+        """Total bytes of cached payloads, scanned once and tracked afterwards"""
+        if self._usage is None:
+            self._usage = sum(size for _, size, _ in self._entries())
+        return self._usage
+    
+    def evict(self):
+        """Remove least recently used payloads until the cache is back under its cap"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._usage = total
+        if removed:
+            print(f"       Cache: evicted {removed} old payload(s)")
+    
+    def clear(self):
+        """Remove every cached payload"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self._usage = 0
+
+def open_cache(config):
+    """Get the conversion cache described by the config, None when it is disabled"""
+    if not config.get('cache_size_mb'):
+        return None
+    return ConversionCache(config['cache_dir'], config['cache_size_mb'] * 1024 * 1024)
@@ -0,0 +1,63 @@
+from Modules.utils import is_power_of_2, next_power_of_2, previous_power_of_2
+
+POW2_MODES = ('nearest', 'larger', 'smaller', 'pad', 'keep', 'refuse')
+
+class ConversionPolicy:
+    """Answers to the questions conversion would otherwise ask, so it can run unattended
+    
+    pow2 decides what happens to images whose size is not a power of 2: 'nearest', 'larger'
+    and 'smaller' resize, 'pad' adds borders (transparent when the image has alpha) up to
+    the next power of 2, 'keep' converts at the current size and 'refuse' fails the image.
+    Conversion never prompts, the menus ask once up front and pass the answer in here.
+    update_dat_dimensions lets a decal conversion match the metadata DAT's size to the new
+    image. Sizes changed by resizing or padding are always written, so the metadata
+    describes the payload.
+    regenerate_alpha and allow_opaque are used when a whole decal is converted.
+    """
+    
+    def __init__(self, pow2='keep', update_dat_dimensions=True, regenerate_alpha=False, allow_opaque=True):
+        if pow2 not in POW2_MODES:
+            raise ValueError(f"Unknown power-of-2 mode '{pow2}', expected one of: {', '.join(POW2_MODES)}")
+        self.pow2 = pow2
+        self.update_dat_dimensions = update_dat_dimensions
+        self.regenerate_alpha = regenerate_alpha
+        self.allow_opaque = allow_opaque
+    
+    def pow2_size(self, width, height, mode=None):
+        """Get the power-of-2 size for a mode, ties in 'nearest' going to the smaller size"""
+        mode = mode or self.pow2
+        
+        def fit(n):
+            if is_power_of_2(n) or mode in ('keep', 'refuse'):
+                return n
+            smaller, larger = previous_power_of_2(n), next_power_of_2(n)
+            if mode in ('larger', 'pad'):
+                return larger
+            if mode == 'smaller':
+                return smaller
+            return larger if larger - n < n - smaller else smaller
+        
+        return fit(width), fit(height)
+
+class ConversionResult:
+    """Outcome of converting one image into its _texture.dat, truthy when it was written"""
+    
+    def __init__(self, image_path, dat_path):
+        self.image_path = image_path
+        self.dat_path = dat_path
+        self.ok = False
+        self.format_type = None
+        self.source_size = None     # (width, height) of the source image
+        self.size = None            # (width, height) encoded, after any resize or padding
+        self.resized = False
+        self.padded = False
+        self.cached = False
+        self.dat_dimensions_updated = False
+        self.error = None
+    
+    def __bool__(self):
+        return self.ok
+    
+    def __repr__(self):
+        state = "ok" if self.ok else f"failed: {self.error}"
+        return f"<ConversionResult {self.image_path} → {self.dat_path} ({state})>"
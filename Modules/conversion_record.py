@@ -0,0 +1,78 @@
+import os
+import json
+from Modules.conversion_cache import hash_file
+
+RECORD_VERSION = 1
+RECORD_SUFFIX = '.src.json'  # sidecar next to the _texture.dat, ignored by the locator and packer
+
+def record_path(dat_path):
+    return dat_path + RECORD_SUFFIX
+
+def write_record(image_path, dat_path, source_hash=None):
+    """Note the source a _texture.dat was just converted from, for later stale checks"""
+    path = record_path(dat_path)
+    temp_path = path + '.tmp'
+    try:
+        source, dat = os.stat(image_path), os.stat(dat_path)
+        record = {
+            'version': RECORD_VERSION,
+            'source': os.path.basename(image_path),
+            'size': source.st_size,
+            'mtime_ns': source.st_mtime_ns,
+            'hash': source_hash or hash_file(image_path),
+            'dat_size': dat.st_size,
+            'dat_mtime_ns': dat.st_mtime_ns
+        }
+        with open(temp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"       Warning: Could not write conversion record: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def read_record(dat_path):
+    """Get the conversion record of a _texture.dat, None if there is none or it is unreadable"""
+    try:
+        with open(record_path(dat_path), 'r') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(record, dict) or record.get('version') != RECORD_VERSION:
+        return None
+    return record
+
+def is_up_to_date(image_path, dat_path, check_hash=False):
+    """Check whether a _texture.dat was converted from the source as it is now
+    
+    Size and mtime of the source decide, so nothing is read. With check_hash, a source
+    whose mtime moved but whose size did not (touched, copied back, restored) is hashed
+    and counts as unchanged when the content matches, refreshing the record. The
+    _texture.dat must also be the one that was written, not replaced since.
+    """
+    record = read_record(dat_path)
+    if not record:
+        return False
+    
+    try:
+        source, dat = os.stat(image_path), os.stat(dat_path)
+    except OSError:
+        return False
+    
+    if (dat.st_size, dat.st_mtime_ns) != (record.get('dat_size'), record.get('dat_mtime_ns')):
+        return False
+    if record.get('source') != os.path.basename(image_path) or source.st_size != record.get('size'):
+        return False
+    if source.st_mtime_ns == record.get('mtime_ns'):
+        return True
+    
+    if not check_hash or not record.get('hash'):
+        return False
+    try:
+        source_hash = hash_file(image_path)
+    except OSError:
+        return False
+    if source_hash != record['hash']:
+        return False
+    write_record(image_path, dat_path, source_hash)
+    return True
@@ -1,29 +1,110 @@
 import os
+import mmap
 from Modules.utils import read_image_dimensions
 
+REMASTERED_MAGICS = (b'\x00' * 12 + b'\x07', b'\x00' * 12 + b'\x09')
+ORIGINAL_MAGIC = b'\x00' * 8 + b'\x01'
+
+# Where each layout keeps the format and the dimensions, and how it writes the format
+LAYOUTS = {
+    'remastered': {'format_offset': 0x2C, 'format_size': 1, 'dimensions_offset': 0x34,
+                   'formats': {b'\x47': 'BC1_UNORM', b'\x4D': 'BC3_UNORM', b'\x62': 'BC7_UNORM'}},
+    'original': {'format_offset': 0xC, 'format_size': 4, 'dimensions_offset': 0x10,
+                 'formats': {b'DXT1': 'BC1_UNORM', b'DXT3': 'BC2_UNORM', b'DXT5': 'BC3_UNORM'}}
+}
+
+FORMAT_ALIASES = {'DXT1': 'BC1_UNORM', 'DXT3': 'BC2_UNORM', 'DXT5': 'BC3_UNORM', 'BC7': 'BC7_UNORM'}
+FORMAT_NAMES = {'BC1_UNORM': 'DXT1', 'BC2_UNORM': 'DXT3', 'BC3_UNORM': 'DXT5', 'BC7_UNORM': 'BC7'}
+
+class DatMetadata:
+    """A metadata DAT opened once and memory-mapped, with typed access to its texture header
+    
+    The layout (Remastered or Original) is detected from the magic when it is opened.
+    Formats are read and written as BC*_UNORM names, dimensions as (width, height).
+    Files of an unknown layout have no format and keep their dimensions where the
+    Original layout does. Use it as a context manager, or call close().
+    """
+    
+    def __init__(self, dat_path, writable=False):
+        self.dat_path = dat_path
+        with open(dat_path, 'r+b' if writable else 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        
+        magic = self._map[:13]
+        if magic in REMASTERED_MAGICS:
+            self.layout = 'remastered'
+        elif magic[:9] == ORIGINAL_MAGIC:
+            self.layout = 'original'
+        else:
+            self.layout = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        if not self._map.closed:
+            self._map.close()
+    
+    def _field(self, offset, length):
+        if offset + length > len(self._map):
+            raise ValueError(f"Metadata DAT is too short ({len(self._map)} bytes): {self.dat_path}")
+        return slice(offset, offset + length)
+    
+    def read_format(self):
+        """Get the texture format, None when it is not a known block format"""
+        if not self.layout:
+            return None
+        layout = LAYOUTS[self.layout]
+        return layout['formats'].get(self._map[self._field(layout['format_offset'], layout['format_size'])])
+    
+    def write_format(self, format_type):
+        """Set the texture format, False when the layout has no way to express it"""
+        format_type = FORMAT_ALIASES.get(format_type, format_type)
+        if not self.layout:
+            return False
+        layout = LAYOUTS[self.layout]
+        code = next((code for code, name in layout['formats'].items() if name == format_type), None)
+        if code is None:
+            return False
+        self._map[self._field(layout['format_offset'], layout['format_size'])] = code
+        return True
+    
+    def _dimensions_offset(self):
+        return LAYOUTS[self.layout or 'original']['dimensions_offset']
+    
+    def read_dimensions(self):
+        field = self._field(self._dimensions_offset(), 4)
+        data = self._map[field]
+        return int.from_bytes(data[:2], 'little'), int.from_bytes(data[2:], 'little')
+    
+    def write_dimensions(self, width, height):
+        field = self._field(self._dimensions_offset(), 4)
+        self._map[field] = width.to_bytes(2, 'little') + height.to_bytes(2, 'little')
+
+def update_dat_dimensions(dat_paths, width, height):
+    """Set the same width and height in many metadata DATs, opening each once
+    
+    Returns (path, previous (width, height), error) per path in order, error None on success.
+    """
+    results = []
+    for dat_path in dat_paths:
+        try:
+            with DatMetadata(dat_path, writable=True) as dat:
+                previous = dat.read_dimensions()
+                dat.write_dimensions(width, height)
+            results.append((dat_path, previous, None))
+        except (OSError, ValueError, OverflowError) as e:
+            results.append((dat_path, None, e))
+    return results
+
 def write_dat_format(dat_path, format_str):
     """Write texture format to a DAT metadata file"""
     try:
-        with open(dat_path, 'r+b') as f:
-            magic = f.read(13)
-            
-            # Remastered version check
-            if magic in (b'\x00' * 12 + b'\x07', b'\x00' * 12 + b'\x09'):
-                # Remastered - format at 0x2C
-                f.seek(0x2C)
-                if format_str == 'DXT5' or format_str == 'BC3_UNORM':
-                    f.write(b'\x4D')  # DXT5
-                elif format_str == 'DXT1' or format_str == 'BC1_UNORM':
-                    f.write(b'\x47')  # DXT1
-                elif format_str == 'BC7' or format_str == 'BC7_UNORM':
-                    f.write(b'\x62')  # BC7
-            elif magic[:9] == b'\x00' * 8 + b'\x01':
-                # Original - format at 0xC
-                f.seek(0xC)
-                if format_str == 'DXT5' or format_str == 'BC3_UNORM':
-                    f.write(b'DXT5')
-                elif format_str == 'DXT1' or format_str == 'BC1_UNORM':
-                    f.write(b'DXT1')
+        with DatMetadata(dat_path, writable=True) as dat:
+            dat.write_format(format_str)
         
         print(f"       Updated format in metadata DAT to {format_str}")
         return True
@@ -33,32 +114,14 @@ def write_dat_format(dat_path, format_str):
 
 def read_dat_dimensions(dat_path):
     """Read width and height from a DAT metadata file"""
-    with open(dat_path, 'rb') as f:
-        magic = f.read(13)
-        
-        # Remastered version check
-        if magic in (b'\x00' * 12 + b'\x07', b'\x00' * 12 + b'\x09'):
-            f.seek(0x34)
-        else:
-            f.seek(0x10)
-        
-        w = int.from_bytes(f.read(2), 'little')
-        h = int.from_bytes(f.read(2), 'little')
-    
-    return w, h
+    with DatMetadata(dat_path) as dat:
+        return dat.read_dimensions()
 
 def write_dat_dimensions(dat_path, width, height):
     """Write new width and height to a DAT metadata file"""
     try:
-        with open(dat_path, 'r+b') as f:
-            magic = f.read(13)
-            
-            # Remastered version check
-            offset = 0x34 if magic in (b'\x00' * 12 + b'\x07', b'\x00' * 12 + b'\x09') else 0x10
-            
-            f.seek(offset)
-            f.write(width.to_bytes(2, 'little'))
-            f.write(height.to_bytes(2, 'little'))
+        with DatMetadata(dat_path, writable=True) as dat:
+            dat.write_dimensions(width, height)
         
         print(f"       Updated: {dat_path}")
         return True
@@ -66,10 +129,10 @@ def write_dat_dimensions(dat_path, width, height):
         print(f"       Error: {e}")
         return False
 
-def warn_if_dimension_mismatch(image_path, dat_path):
+def warn_if_dimension_mismatch(image_path, dat_path, img_dims=None):
     warnings = []
 
-    img_dims = read_image_dimensions(image_path)
+    img_dims = img_dims or read_image_dimensions(image_path)
     if not img_dims:
         warnings.append("Could not read image dimensions")
         return warnings
@@ -1,126 +1,259 @@
 import os
+import mmap
+import struct
 import subprocess
 
-def run_texconv(input_path, output_dir, format_type, output_name, texconv_path):
-    """Run texconv.exe to convert image to DDS"""
+TEXCONV_BATCH_SIZE = 64  # files per texconv run, keeps the command line well under Windows' limit
+
+# 128-byte header including the magic: flags, height, width, pitch, depth, mip count, pixel format
+DDS_HEADER = struct.Struct('<4sIIIIIII44xII4s40x')
+# Extension after the header when the fourcc is DX10: DXGI format, dimension, flags, array size, flags
+DX10_HEADER = struct.Struct('<IIIII')
+
+FOURCC_FORMATS = {b'DXT1': 'BC1_UNORM', b'DXT3': 'BC2_UNORM', b'DXT5': 'BC3_UNORM'}
+# sRGB variants hold the same blocks, the game only cares about the block layout
+DXGI_FORMATS = {71: 'BC1_UNORM', 72: 'BC1_UNORM', 74: 'BC2_UNORM', 75: 'BC2_UNORM',
+                77: 'BC3_UNORM', 78: 'BC3_UNORM', 98: 'BC7_UNORM', 99: 'BC7_UNORM'}
+BLOCK_SIZES = {'BC1_UNORM': 8, 'BC2_UNORM': 16, 'BC3_UNORM': 16, 'BC7_UNORM': 16}
+
+def run_texconv_batch(input_paths, output_dir, format_type, texconv_path, extra_args=()):
+    """Convert many PNGs with as few texconv runs as possible
+    
+    Returns the DDS path for each input in order, None where texconv produced nothing.
+    """
     if not os.path.isabs(texconv_path) and not os.path.dirname(texconv_path):
         texconv_path = os.path.abspath(texconv_path)
     
     if not os.path.exists(texconv_path):
         print(f"      Warning: texconv not found at {texconv_path}")
-        return None
+        return [None] * len(input_paths)
     
-    try:
-        cmd = [
-            texconv_path,
-            "-f", format_type,
-            "-m", "1",           # Only 1 mip level (no mipmaps)
-            "-o", output_dir,
-            "-y",                # Overwrite existing
-            input_path
-        ]
+    for start in range(0, len(input_paths), TEXCONV_BATCH_SIZE):
+        chunk = input_paths[start:start + TEXCONV_BATCH_SIZE]
+        cmd = [texconv_path, "-f", format_type, "-m", "1", "-o", output_dir, "-y", *extra_args, *chunk]
         
-        print(f"      Running texconv: {' '.join(cmd)}")
+        print(f"      Running texconv on {len(chunk)} file(s) ({format_type})")
         
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        
-        temp_output = os.path.join(output_dir, os.path.basename(input_path).replace('.png', '.dds'))
-        final_output = os.path.join(output_dir, output_name)
-        
-        if os.path.exists(temp_output):
-            file_size = os.path.getsize(temp_output)
-            print(f"      Generated DDS: {file_size:,} bytes")
-            
-            if os.path.exists(final_output):
-                os.remove(final_output)
-            os.rename(temp_output, final_output)
-            return final_output
-        else:
-            print(f"      Error: texconv did not create output file at {temp_output}")
-            return None
-            
-    except subprocess.CalledProcessError as e:
-        print(f"      Error with texconv: {e}")
-        if e.stderr:
-            print(f"      texconv stderr: {e.stderr}")
+        try:
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            # Files before the failing one are still converted, the checks below sort them out
+            print(f"      Error with texconv: {e}")
+            if e.stderr:
+                print(f"      texconv stderr: {e.stderr}")
+        except FileNotFoundError as e:
+            print(f"      Error: texconv not found: {e}")
+            return [None] * len(input_paths)
+    
+    outputs = []
+    for input_path in input_paths:
+        dds_path = os.path.join(output_dir, os.path.splitext(os.path.basename(input_path))[0] + '.dds')
+        outputs.append(dds_path if os.path.exists(dds_path) else None)
+    return outputs
+
+def dds_header(width, height, format_type, payload_size):
+    """Build a single-mip DDS header for a block payload (DX10 extension for BC7)"""
+    fourcc = {'BC1_UNORM': b'DXT1', 'BC3_UNORM': b'DXT5', 'BC7_UNORM': b'DX10'}.get(format_type, format_type.encode('ascii'))
+    
+    header = struct.pack('<4sIIIIIII44x', b'DDS ', 124,
+                         0x1 | 0x2 | 0x4 | 0x1000 | 0x80000,  # caps, height, width, pixelformat, linearsize
+                         height, width, payload_size, 0, 1)
+    header += struct.pack('<II4sIIIII', 32, 0x4, fourcc, 0, 0, 0, 0, 0)  # DDPF_FOURCC
+    header += struct.pack('<IIII4x', 0x1000, 0, 0, 0)                      # DDSCAPS_TEXTURE
+    if fourcc == b'DX10':
+        header += struct.pack('<IIIII', 98, 3, 0, 1, 0)                    # DXGI_FORMAT_BC7_UNORM, 2D texture
+    return header
+
+def write_dds(dds_path, width, height, format_type, payload):
+    """Write a single-mip DDS file around an already encoded block payload"""
+    with open(dds_path, 'wb') as f:
+        f.write(dds_header(width, height, format_type, len(payload)))
+        f.write(payload)
+    return dds_path
+
+def parse_dds_header(data):
+    """Parse the DDS header and DX10 extension at the start of data, None if it is not a DDS
+    
+    Returns a dict with 'width', 'height', 'mip_count', 'fourcc', 'dxgi_format', 'format_name'
+    for messages, 'format_type' (None for formats other than BC1/2/3/7), 'data_offset' and
+    'data_size', the byte size of the top mip level (None when the format is not known).
+    """
+    if len(data) < DDS_HEADER.size:
         return None
-    except FileNotFoundError as e:
-        print(f"      Error: texconv not found: {e}")
+    magic, _, _, height, width, pitch, _, mip_count, _, _, fourcc = DDS_HEADER.unpack_from(data)
+    if magic != b'DDS ':
         return None
+    
+    info = {'width': width, 'height': height, 'pitch': pitch, 'mip_count': mip_count or 1,
+            'fourcc': fourcc, 'dxgi_format': None, 'format_name': fourcc.decode('ascii', errors='ignore'),
+            'format_type': FOURCC_FORMATS.get(fourcc), 'data_offset': DDS_HEADER.size}
+    
+    if fourcc == b'DX10':
+        if len(data) < DDS_HEADER.size + DX10_HEADER.size:
+            return None
+        dxgi_format = DX10_HEADER.unpack_from(data, DDS_HEADER.size)[0]
+        info['dxgi_format'] = dxgi_format
+        info['format_type'] = DXGI_FORMATS.get(dxgi_format)
+        info['format_name'] = f"DX10/DXGI {dxgi_format}"
+        info['data_offset'] += DX10_HEADER.size
+    
+    block_size = BLOCK_SIZES.get(info['format_type'])
+    info['data_size'] = ((width + 3) // 4) * ((height + 3) // 4) * block_size if block_size else None
+    return info
 
-def save_image_dds(img, output_dir, base_name, suffix, format_type, texconv_path):
-    """Save image as DDS with texconv or fallback to PNG"""
-    temp_png = os.path.join(output_dir, f"{base_name}{suffix}_temp.png")
-    output_dds = os.path.join(output_dir, f"{base_name}{suffix}.dds")
+def read_dds_header(dds_path):
+    """Read and parse the header of a DDS file in one read
     
-    img.save(temp_png, format='PNG', compress_level=0)
+    Adds 'payload_size' to the parsed header, the bytes after the headers, every mip level included.
+    """
+    with open(dds_path, 'rb') as f:
+        info = parse_dds_header(f.read(DDS_HEADER.size + DX10_HEADER.size))
+        if info:
+            info['payload_size'] = _payload_size(info, os.fstat(f.fileno()).st_size)
+        return info
+
+def _payload_size(info, file_size):
+    return max(file_size - info['data_offset'], 0)
+
+def copy_file_range(src, out_file, offset, count):
+    """Copy count bytes at offset in src to the current position of out_file, returning the byte count
+    
+    The bytes never pass through Python objects: copy_file_range or sendfile where the
+    kernel has them, otherwise a memory map of the source written straight out.
+    """
+    if count <= 0:
+        return 0
+    
+    out_file.flush()
+    start = out_file.tell()
+    src_fd, out_fd = src.fileno(), out_file.fileno()
+    copied = 0
+    
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < count:
+                n = os.copy_file_range(src_fd, out_fd, count - copied, offset + copied, start + copied)
+                if not n:
+                    break
+                copied += n
+        except OSError:
+            pass  # Not supported for this pair of files, carry on from where it stopped
+    
+    if copied < count and hasattr(os, 'sendfile'):
+        try:
+            os.lseek(out_fd, start + copied, os.SEEK_SET)
+            while copied < count:
+                n = os.sendfile(out_fd, src_fd, offset + copied, count - copied)
+                if not n:
+                    break
+                copied += n
+        except OSError:
+            pass  # Some platforms only send to sockets
     
-    print(f"      Saved temp PNG: {os.path.getsize(temp_png):,} bytes")
+    if copied < count:
+        out_file.seek(start + copied)
+        with mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            copied += out_file.write(view[offset + copied:offset + count])
     
-    result = run_texconv(temp_png, output_dir, format_type, f"{base_name}{suffix}.dds", texconv_path)
+    out_file.seek(start + copied)
+    return copied
+
+def copy_dds_payload(dds_path, out_file, header=None):
+    """Copy the payload of a DDS, every mip level it has, into an open binary file, returning the byte count
+    
+    header is the parsed DDS header when the caller already has it.
+    """
+    with open(dds_path, 'rb') as src:
+        if header is None:
+            header = parse_dds_header(src.read(DDS_HEADER.size + DX10_HEADER.size))
+            if not header:
+                return None
+        size = _payload_size(header, os.fstat(src.fileno()).st_size)
+        return copy_file_range(src, out_file, header['data_offset'], size)
+
+def save_image_dds(img, output_dir, base_name, suffix, format_type, texconv_path, encoder="auto", scratch_dir=None):
+    """Save image as DDS with the selected encoder backend or fallback to PNG
     
-    if result:
-        print(f"      DDS saved with {format_type} compression")
+    img can be a PIL image, an array or a strip source, see EncoderBackend.
+    """
+    from Modules.encoders import select_encoder, image_size, as_image
+    
+    output_dds = os.path.join(output_dir, f"{base_name}{suffix}.dds")
+    backend = select_encoder(format_type, encoder, texconv_path, scratch_dir)
+    width, height = image_size(img)
+    
+    if backend:
+        # The payload streams in after a placeholder header, which is rewritten once its size is known.
+        # It goes to a part file that only replaces the DDS once complete, so a failure leaves no
+        # truncated DDS next to the images
+        part_path = output_dds + '.part'
+        try:
+            with open(part_path, 'wb') as f:
+                header_size = len(dds_header(width, height, format_type, 0))
+                f.write(b'\0' * header_size)
+                size = backend.encode(img, format_type, f)
+                if size:
+                    f.seek(0)
+                    f.write(dds_header(width, height, format_type, size))
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
         
-        # Clean up temp PNG
-        if os.path.exists(temp_png):
-            try:
-                os.remove(temp_png)
-            except:
-                pass
-        return result
-    
-    print(f"      Fallback: keeping temp PNG (texconv failed)")
+        if size:
+            os.replace(part_path, output_dds)
+            print(f"      Generated DDS: {os.path.getsize(output_dds):,} bytes")
+            print(f"      DDS saved with {format_type} compression ({backend.name})")
+            return output_dds
+        os.remove(part_path)
+    
+    print(f"      Fallback: saving PNG (no encoder could produce {format_type})")
     fallback_name = os.path.join(output_dir, f"{base_name}{suffix}.png")
-    if os.path.exists(fallback_name):
-        os.remove(fallback_name)
-    os.rename(temp_png, fallback_name)
+    as_image(img).save(fallback_name, format='PNG')
     return fallback_name
 
-def get_dds_format_info(dds_path):
-    """Read DDS format information from header"""
-    try:
-        with open(dds_path, 'rb') as f:
-            # Read magic
-            magic = f.read(4)
-            if magic != b'DDS ':
-                return None, None
-            
-            # Skip header size
-            f.read(4)
-            
-            # Skip flags, height, width
-            f.seek(0x14, 0)
-            
-            # Read pitchOrLinearSize
-            pitch = int.from_bytes(f.read(4), 'little')
-            
-            # Jump to pixel format
-            f.seek(0x54, 0)
-            fourcc = f.read(4)
-            
-            format_name = fourcc.decode('ascii', errors='ignore') if len(fourcc) == 4 else 'Unknown'
-            
-            return format_name, pitch
-    except Exception as e:
-        print(f"Error reading DDS header: {e}")
-        return None, None
+def _decode_bc1_pixel(block, x, y, three_color_allowed):
+    """Decode one pixel's RGB from an 8-byte BC1 colour block"""
+    c0, c1, indices = struct.unpack('<HHI', block)
+    
+    def rgb565(c):
+        r, g, b = (c >> 11) & 31, (c >> 5) & 63, c & 31
+        return ((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2))
+    
+    idx = (indices >> (2 * (y * 4 + x))) & 3
+    p0, p1 = rgb565(c0), rgb565(c1)
+    if idx < 2:
+        return p0 if idx == 0 else p1
+    if c0 > c1 or not three_color_allowed:
+        a, b = (p0, p1) if idx == 2 else (p1, p0)
+        return tuple((2 * ca + cb) // 3 for ca, cb in zip(a, b))
+    if idx == 2:
+        return tuple((ca + cb) // 2 for ca, cb in zip(p0, p1))
+    return (0, 0, 0)
 
-def get_dds_compression_data(dds_path):
-    """Extract raw compressed texture data from DDS file"""
-    try:
-        with open(dds_path, 'rb') as f:
-            # DDS header is always 128 bytes (0x80)
-            # Skip to texture data
-            f.seek(0x80)
-            data = f.read()
-            
-            # Debug info
-            format_name, pitch = get_dds_format_info(dds_path)
-            if format_name:
-                print(f"       DDS Format: {format_name}, Data size: {len(data)} bytes")
-            
-            return data
-    except Exception as e:
-        print(f"Error reading DDS: {e}")
-        return None
\ No newline at end of file
+def sample_dds_pixels(dds_path, sample_points):
+    """Decode only the DXT1/3/5 blocks holding the sampled pixels, with or without a DX10 header
+    
+    sample_points(width, height) gives the (x, y) pixels to read. Returns a list of
+    RGB tuples, or None when the DDS is not block compressed in a way handled here.
+    """
+    with open(dds_path, 'rb') as f:
+        info = parse_dds_header(f.read(DDS_HEADER.size + DX10_HEADER.size))
+        if not info or info['format_type'] not in ('BC1_UNORM', 'BC2_UNORM', 'BC3_UNORM'):
+            return None
+        
+        width, height = info['width'], info['height']
+        block_size = BLOCK_SIZES[info['format_type']]
+        if not width or not height:
+            return None
+        
+        blocks_wide = (width + 3) // 4
+        pixels = []
+        for x, y in sample_points(width, height):
+            f.seek(info['data_offset'] + ((y // 4) * blocks_wide + x // 4) * block_size)
+            block = f.read(block_size)
+            if len(block) < block_size:
+                return None
+            # DXT3/5 keep the colour block after 8 bytes of alpha and never use 3-colour mode
+            pixels.append(_decode_bc1_pixel(block[-8:], x % 4, y % 4, info['format_type'] == 'BC1_UNORM'))
+        return pixels
\ No newline at end of file
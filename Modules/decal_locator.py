@@ -1,14 +1,274 @@
 import os
 import json
+import threading
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from Modules.utils import get_base_name
+from Modules.index_format import CompactIndex, write_compact_index
+from Modules.search_index import TrigramIndex
+from Modules.probe_cache import ProbeCache
+from Modules.index_watcher import IndexWatcher, WATCH_INTERVAL
+
+IMAGE_EXTENSIONS = ('.dds', '.png', '.jpg', '.tga')
+
+# Directory listing is I/O bound (network shares especially), so use more threads than cores
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+def _locked(method):
+    """Run a DecalLocator method while holding its lock, so the watcher never edits mid-query"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class DecalLocator:
-    def __init__(self, images_dir="Images", raw_dir="Raw"):
+    def __init__(self, images_dir="Images", raw_dir="Raw", index_format="binary"):
         self.images_dir = images_dir
         self.raw_dir = raw_dir
+        self.index_format = index_format
         self.index_file = "decal_index.json"
+        self.binary_index_file = "decal_index.bin"
+        self.state_file = "decal_index_state.json"
+        self.scan_workers = SCAN_WORKERS
+        self.probe_cache = ProbeCache("decal_probe_cache.json")
+        self._probes_loaded = False
+        self.lock = threading.RLock()
+        self.watcher = None
         self.texture_map = {}
+        self.ambiguous = {}
+        self.dir_state = {'images': {}, 'raw': {}}
+        self._by_bundle = None
+        self._by_base = None
+        self._name_search = None
+        self._bundle_search = None
+    
+    def _scan_dir(self, path, extensions, old_entry):
+        """List one directory unless its mtime shows it is unchanged"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, False
+        
+        if old_entry and old_entry['mtime'] == mtime:
+            return old_entry, False
+        
+        entry = {'mtime': mtime, 'subdirs': [], 'files': {}}
+        try:
+            with os.scandir(path) as it:
+                for e in it:
+                    # DirEntry carries the type from the listing, no extra stat needed.
+                    # Symlinks and junctions are not followed, like os.walk, so link loops end
+                    if e.is_dir(follow_symlinks=False):
+                        if not (hasattr(e, 'is_junction') and e.is_junction()):
+                            entry['subdirs'].append(e.name)
+                    elif e.name.lower().endswith(extensions):
+                        st = e.stat()
+                        entry['files'][e.name] = [st.st_size, st.st_mtime_ns]
+        except OSError:
+            return None, False
+        return entry, True
+    
+    def _scan_trees(self, trees):
+        """Walk several trees at once on a thread pool, only relisting changed directories
+        
+        trees is a list of (key, root, extensions, old_dirs), returns {key: (dirs, rescanned)}
+        """
+        results = {key: ({}, 0) for key, _, _, _ in trees}
+        
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as pool:
+            def submit(key, path, extensions, old_dirs):
+                future = pool.submit(self._scan_dir, path, extensions, old_dirs.get(path))
+                pending[future] = (key, path, extensions, old_dirs)
+            
+            pending = {}
+            for key, root, extensions, old_dirs in trees:
+                submit(key, root, extensions, old_dirs or {})
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, path, extensions, old_dirs = pending.pop(future)
+                    entry, rescanned = future.result()
+                    if entry is None:
+                        continue
+                    
+                    dirs, count = results[key]
+                    dirs[path] = entry
+                    results[key] = (dirs, count + rescanned)
+                    for d in entry['subdirs']:
+                        submit(key, os.path.join(path, d), extensions, old_dirs)
+        
+        return results
+    
+    def _dat_files(self):
+        """List every scanned DAT file in a stable order"""
+        return [
+            {
+                'base_name': get_base_name(f),
+                'dat_path': os.path.join(r, f),
+                'bundle': os.path.basename(os.path.dirname(r))
+            }
+            for r in sorted(self.dir_state['raw'])
+            for f in sorted(self.dir_state['raw'][r]['files'])
+        ]
+    
+    def _image_files(self):
+        """List every scanned image file in a stable order"""
+        return [
+            {
+                'original_name': f,
+                'base_name': get_base_name(f),
+                'image_path': os.path.join(r, f)
+            }
+            for r in sorted(self.dir_state['images'])
+            for f in sorted(self.dir_state['images'][r]['files'])
+        ]
+    
+    def _join(self, base_names=None):
+        """Map images to DATs by base name, only touching base_names if given"""
+        # Key every DAT by base name once, first one found wins like before
+        dats_by_base = {}
+        self.ambiguous = {}
+        for dat in self._dat_files():
+            first = dats_by_base.setdefault(dat['base_name'], dat)
+            if first is not dat:
+                self.ambiguous.setdefault(dat['base_name'], [first['dat_path']]).append(dat['dat_path'])
+        
+        if base_names is None:
+            self._release_index()
+            self.texture_map = {}
+            self._reset_lookups()
+        else:
+            self._materialize()
+            for base in base_names:
+                for img, info in list(self.find_by_base_name(base).items()):
+                    if info['base_name'] == base:
+                        self._del_entry(img)
+        
+        for img in self._image_files():
+            if base_names is not None and img['base_name'] not in base_names:
+                continue
+            dat = dats_by_base.get(img['base_name'])
+            if dat:
+                self._set_entry(img['original_name'], {
+                    'image_path': img['image_path'],
+                    'dat_path': dat['dat_path'],
+                    'bundle': dat['bundle'],
+                    'base_name': img['base_name']
+                })
+    
+    def _reset_lookups(self):
+        """Drop the bundle, base name and search lookups, rebuilt on next query"""
+        self._by_bundle = None
+        self._by_base = None
+        self._name_search = None
+        self._bundle_search = None
+    
+    def _ensure_lookups(self):
+        """Build bundle -> entries and base name -> entries lookups once"""
+        if self._by_bundle is not None:
+            return
+        self._by_bundle = {}
+        self._by_base = {}
+        for img, info in self.texture_map.items():
+            self._by_bundle.setdefault(info['bundle'], {})[img] = info
+            self._by_base.setdefault(info['base_name'].lower(), {})[img] = info
+    
+    def _ensure_search(self):
+        """Build the trigram indexes over image, base and bundle names once"""
+        if self._name_search is not None:
+            return
+        self._ensure_lookups()
+        self._name_search = TrigramIndex()
+        self._bundle_search = TrigramIndex()
+        for img, info in self.texture_map.items():
+            self._name_search.add(img, img, info['base_name'])
+        for bundle in self._by_bundle:
+            self._bundle_search.add(bundle, bundle)
+    
+    def _set_entry(self, img, info):
+        """Add or replace a mapping, keeping the lookups in sync"""
+        if img in self.texture_map:
+            self._del_entry(img)
+        self.texture_map[img] = info
+        if self._by_bundle is not None:
+            self._by_bundle.setdefault(info['bundle'], {})[img] = info
+            self._by_base.setdefault(info['base_name'].lower(), {})[img] = info
+        if self._name_search is not None:
+            self._name_search.add(img, img, info['base_name'])
+            self._bundle_search.add(info['bundle'], info['bundle'])
+    
+    def _del_entry(self, img):
+        """Remove a mapping, keeping the lookups in sync"""
+        info = self.texture_map.pop(img)
+        if self._by_bundle is not None:
+            for lookup, key in ((self._by_bundle, info['bundle']), (self._by_base, info['base_name'].lower())):
+                entries = lookup.get(key, {})
+                entries.pop(img, None)
+                if not entries:
+                    lookup.pop(key, None)
+        if self._name_search is not None:
+            self._name_search.remove(img)
+            if info['bundle'] not in self._by_bundle:
+                self._bundle_search.remove(info['bundle'])
     
+    def _release_index(self):
+        """Close a memory-mapped index so its file can be replaced"""
+        if isinstance(self.texture_map, CompactIndex):
+            self.texture_map.close()
+            self.texture_map = {}
+    
+    def _materialize(self):
+        """Turn a memory-mapped index into a regular dict before editing it"""
+        if isinstance(self.texture_map, CompactIndex):
+            texture_map = self.texture_map.to_dict()
+            self._release_index()
+            self.texture_map = texture_map
+    
+    def _save_index(self, write_map=True):
+        """Write the index and the directory scan state"""
+        if write_map:
+            self._materialize()
+            if self.index_format == 'binary':
+                write_compact_index(self.binary_index_file, self.texture_map)
+            else:
+                with open(self.index_file, 'w') as f:
+                    json.dump(self.texture_map, f, indent=2)
+        
+        with open(self.state_file, 'w') as f:
+            json.dump({
+                'images_dir': self.images_dir,
+                'raw_dir': self.raw_dir,
+                'dirs': self.dir_state
+            }, f)
+        
+        if self._probes_loaded:
+            self.probe_cache.prune(info['image_path'] for info in self.texture_map.values())
+            self.probe_cache.save()
+    
+    def _load_state(self):
+        """Load the directory scan state if it matches the configured folders"""
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            if state['images_dir'] == self.images_dir and state['raw_dir'] == self.raw_dir:
+                return state['dirs']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+    
+    def _print_ambiguous(self):
+        """List base names that matched more than one .DAT file"""
+        if self.ambiguous:
+            print(f"Warning: {len(self.ambiguous)} base name(s) match more than one .DAT file:")
+            for base, paths in sorted(self.ambiguous.items()):
+                print(f"  - {base} (using {paths[0]})")
+                for path in paths[1:]:
+                    print(f"      also: {path}")
+            print()
+    
+    @_locked
     def build_index(self):
         """Build an index mapping image names to their .DAT file locations"""
         print("\nBuilding decal index...")
@@ -20,76 +280,258 @@ class DecalLocator:
             print("Please configure directories in the setup menu.\n")
             return 0
         
-        dat_files = [
-            {
-                'base_name': get_base_name(f),
-                'dat_path': os.path.join(r, f),
-                'bundle': os.path.basename(os.path.dirname(os.path.dirname(os.path.join(r, f))))
-            }
-            for r, _, files in os.walk(self.raw_dir)
-            for f in files if f.lower().endswith('.dat')
-        ]
-        
-        image_files = []
+        trees = [('raw', self.raw_dir, '.dat', None)]
         if os.path.exists(self.images_dir):
-            image_files = [
-                {
-                    'original_name': f,
-                    'base_name': get_base_name(f),
-                    'image_path': os.path.join(r, f)
-                }
-                for r, _, files in os.walk(self.images_dir)
-                for f in files if f.lower().endswith(('.dds', '.png', '.jpg', '.tga'))
-            ]
+            trees.append(('images', self.images_dir, IMAGE_EXTENSIONS, None))
         else:
             print(f"\nWarning: Images directory '{self.images_dir}' not found!")
         
-        self.texture_map = {}
-        for img in image_files:
-            for dat in dat_files:
-                if img['base_name'] == dat['base_name']:
-                    self.texture_map[img['original_name']] = {
-                        'image_path': img['image_path'],
-                        'dat_path': dat['dat_path'],
-                        'bundle': dat['bundle'],
-                        'base_name': img['base_name']
-                    }
-                    break
-        
-        with open(self.index_file, 'w') as f:
-            json.dump(self.texture_map, f, indent=2)
+        self.dir_state = {'images': {}, 'raw': {}}
+        for key, (dirs, _) in self._scan_trees(trees).items():
+            self.dir_state[key] = dirs
+        
+        self._join()
+        self._save_index()
+        self._ensure_search()
         
         print(f"\nIndex built! Found {len(self.texture_map)} decal mappings.\n")
+        self._print_ambiguous()
+        return len(self.texture_map)
+    
+    def _tree_specs(self):
+        """Get (key, root, extensions) for the Raw and Images trees"""
+        return [('raw', self.raw_dir, '.dat'), ('images', self.images_dir, IMAGE_EXTENSIONS)]
+    
+    def _rescan(self, old_state, only_dirs=None):
+        """Rescan against old_state and re-join the base names whose files came or went
+        
+        With only_dirs, just those directories (and anything new below them) are relisted,
+        the rest of old_state is kept as is. Returns (added, removed, modified, rescanned, total).
+        """
+        trees = []
+        new_state = {}
+        for key, root, extensions in self._tree_specs():
+            old_dirs = old_state.get(key, {})
+            if only_dirs is None:
+                new_state[key] = {}
+                if os.path.exists(root):
+                    trees.append((key, root, extensions, old_dirs))
+                continue
+            
+            roots = [d for d in only_dirs if d == root or d.startswith(os.path.join(root, ''))]
+            prefixes = tuple(os.path.join(d, '') for d in roots)
+            new_state[key] = {d: e for d, e in old_dirs.items() if d not in roots and not d.startswith(prefixes)}
+            relist = {d: e for d, e in old_dirs.items() if d not in roots}
+            trees.extend((key, d, extensions, relist) for d in roots)
+        
+        rescanned = 0
+        for key, (dirs, count) in self._scan_trees(trees).items():
+            new_state[key].update(dirs)
+            rescanned += count
+        
+        old_files = {}
+        new_files = {}
+        for key in ('raw', 'images'):
+            for dirs, files in ((old_state.get(key, {}), old_files), (new_state[key], new_files)):
+                for r, entry in dirs.items():
+                    for f in entry['files']:
+                        files[os.path.join(r, f)] = entry['files'][f]
+        
+        self.dir_state = new_state
+        
+        added = new_files.keys() - old_files.keys()
+        removed = old_files.keys() - new_files.keys()
+        changed = [p for p in new_files.keys() & old_files.keys() if new_files[p] != old_files[p]]
+        
+        total = sum(len(dirs) for dirs in new_state.values())
+        
+        # Nothing moved, so the state on disk is still right, keep polls from rewriting it
+        if new_state == old_state:
+            return added, removed, changed, rescanned, total
+        
+        affected = {get_base_name(os.path.basename(p)) for p in added | removed}
+        if affected:
+            self._join(affected)
+        self._save_index(write_map=bool(affected))
+        return added, removed, changed, rescanned, total
+    
+    @_locked
+    def refresh_index(self):
+        """Update the index in place, rescanning only folders that changed"""
+        old_state = self._load_state()
+        if old_state is None or not os.path.exists(self.raw_dir) or \
+           (not self.texture_map and not self.load_index()):
+            return self.build_index()
+        
+        print("\nRefreshing decal index...")
+        
+        added, removed, changed, rescanned, total = self._rescan(old_state)
+        
+        print(f"  Rescanned {rescanned} of {total} folders")
+        print(f"  Files added: {len(added)}, removed: {len(removed)}, modified: {len(changed)}")
+        print(f"\nIndex refreshed! {len(self.texture_map)} decal mappings.\n")
+        self._print_ambiguous()
         return len(self.texture_map)
     
+    @_locked
+    def apply_changes(self, changed_dirs=None):
+        """Quietly fold folder changes into the index, for the watcher
+        
+        changed_dirs limits the rescan to those folders, otherwise every folder's mtime is checked.
+        Returns (added, removed) file paths.
+        """
+        if not any(self.dir_state.values()):
+            state = self._load_state()
+            if state is None or (not self.texture_map and not self.load_index()):
+                return set(), set()
+            self.dir_state = state
+        
+        added, removed, _, _, _ = self._rescan(self.dir_state, changed_dirs)
+        return added, removed
+    
+    def start_watching(self, interval=WATCH_INTERVAL):
+        """Keep the index up to date while files change, in a background thread"""
+        if self.watcher is None:
+            self.watcher = IndexWatcher(self, interval)
+            self.watcher.start()
+        return self.watcher
+    
+    def stop_watching(self):
+        """Stop the background index watcher"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+    
+    @_locked
     def load_index(self):
-        """Load existing index"""
-        if os.path.exists(self.index_file):
-            with open(self.index_file, 'r') as f:
-                self.texture_map = json.load(f)
-            return True
+        """Load existing index, preferring the configured format"""
+        loaders = [(self.binary_index_file, self._load_binary), (self.index_file, self._load_json)]
+        if self.index_format != 'binary':
+            loaders.reverse()
+        
+        for path, loader in loaders:
+            if os.path.exists(path):
+                try:
+                    self._release_index()
+                    self.texture_map = loader(path)
+                    self._reset_lookups()
+                    return True
+                except (OSError, ValueError) as e:
+                    print(f"\nWarning: Could not load {path}: {e}")
         return False
     
+    def _load_binary(self, path):
+        """Map the compact index, records are decoded on access"""
+        return CompactIndex(path)
+    
+    def _load_json(self, path):
+        """Parse the JSON index"""
+        with open(path, 'r') as f:
+            return json.load(f)
+    
+    @_locked
+    def items(self):
+        """Get a snapshot of every (image name, info) pair, safe to iterate while the watcher edits the index"""
+        return list(self.texture_map.items())
+    
+    @_locked
+    def count(self):
+        """Get the number of indexed decals"""
+        return len(self.texture_map)
+    
+    @_locked
+    def probe(self, image_path):
+        """Get dimensions, mode, alpha and icon/alpha/main role of an image, cached on disk"""
+        if not self._probes_loaded:
+            self.probe_cache.load()
+            self._probes_loaded = True
+        return self.probe_cache.probe(image_path)
+    
+    def save_probes(self):
+        """Persist any new image probes"""
+        self.probe_cache.save()
+    
+    @_locked
     def find_dat(self, image_name):
         """Find the .DAT file for a given image"""
         if image_name in self.texture_map:
             return self.texture_map[image_name]
         
         base = get_base_name(image_name)
-        for img, info in self.texture_map.items():
+        for info in self.find_by_base_name(base).values():
             if info['base_name'] == base:
                 return info
         return None
     
-    def search(self, query):
-        """Search for textures by partial name"""
-        q = query.lower()
-        return [(img, info) for img, info in self.texture_map.items()
-                if q in img.lower() or q in info['base_name'].lower()]
+    @_locked
+    def find_by_base_name(self, base_name):
+        """Get {image name: info} for a base name, ignoring case"""
+        self._ensure_lookups()
+        return dict(self._by_base.get(base_name.lower(), {}))
+    
+    @_locked
+    def find_file(self, filename, bundle=None):
+        """Find a mapping by image filename or base name, optionally within a bundle"""
+        if bundle:
+            candidates = self.get_bundle_files(bundle)
+        else:
+            candidates = list(self.find_by_base_name(get_base_name(filename)).items())
+            if filename in self.texture_map:
+                candidates.insert(0, (filename, self.texture_map[filename]))
+        
+        for img, info in candidates:
+            if img.lower() == filename.lower() or info['base_name'].lower() == get_base_name(filename).lower():
+                return info
+        return None
+    
+    @_locked
+    def find_decal_id(self, decal_id):
+        """Find the best match whose base name contains a decal ID (e.g. 8A_EA_7D_70)"""
+        q = decal_id.lower()
+        for _, info in self.search(decal_id):
+            if q in info['base_name'].lower():
+                return info
+        return None
+    
+    @_locked
+    def search(self, query, limit=None):
+        """Search for textures by partial image, base or bundle name, best matches first"""
+        self._ensure_search()
+        ranks = self._name_search.search(query)
+        
+        # Files only matched through their bundle name rank below direct name matches
+        for bundle, rank in self._bundle_search.search(query).items():
+            for img in self._by_bundle.get(bundle, {}):
+                ranks.setdefault(img, rank + 3)
+        
+        ranked = sorted(ranks, key=lambda img: (ranks[img], len(img), img))
+        if limit:
+            ranked = ranked[:limit]
+        return [(img, self.texture_map[img]) for img in ranked]
     
+    @_locked
     def get_bundles(self):
         """Get sorted list of unique bundles"""
-        return sorted(set(info['bundle'] for info in self.texture_map.values()))
+        if self._by_bundle is None and isinstance(self.texture_map, CompactIndex):
+            return self.texture_map.bundle_names()
+        self._ensure_lookups()
+        return sorted(self._by_bundle)
+    
+    @_locked
+    def get_bundle_files(self, bundle):
+        """Get (image name, info) pairs for every file in a bundle"""
+        if self._by_bundle is None and isinstance(self.texture_map, CompactIndex):
+            return self.texture_map.bundle_items(bundle)
+        self._ensure_lookups()
+        return list(self._by_bundle.get(bundle, {}).items())
+    
+    @_locked
+    def get_bundle_counts(self):
+        """Get {bundle: number of files} without scanning the whole map"""
+        if self._by_bundle is None and isinstance(self.texture_map, CompactIndex):
+            return self.texture_map.bundle_counts()
+        self._ensure_lookups()
+        return {bundle: len(entries) for bundle, entries in self._by_bundle.items()}
     
     def select_bundle(self, bundle_input, bundles):
         """Select a bundle from input"""
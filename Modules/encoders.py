@@ -0,0 +1,240 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+from PIL import Image
+from Modules.bc_encoder import iter_encode_image
+from Modules.dds_module import copy_dds_payload, run_texconv_batch
+
+ENCODERS = {}
+
+def register_encoder(cls):
+    """Class decorator adding an encoder backend to the registry under its name"""
+    ENCODERS[cls.name] = cls
+    return cls
+
+def as_array(img):
+    """Get an (h, w, 3 or 4) uint8 array, or a strip source, from a PIL image"""
+    if not isinstance(img, Image.Image):
+        return img
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    return np.asarray(img)
+
+def as_image(img):
+    """Get a PIL image from an (h, w, 3 or 4) uint8 array or strip source, or a PIL image"""
+    if not isinstance(img, Image.Image):
+        pixels = np.ascontiguousarray(img)
+        return Image.fromarray(pixels, 'RGBA' if pixels.shape[2] == 4 else 'RGB')
+    return img
+
+def image_size(img):
+    """Get (width, height) of a PIL image, array or strip source"""
+    if isinstance(img, Image.Image):
+        return img.size
+    return img.shape[1], img.shape[0]
+
+def resolve_scratch_dir(scratch_dir=None):
+    """Get the folder for encoder intermediates, preferring RAM-backed storage when none is configured"""
+    if scratch_dir:
+        os.makedirs(scratch_dir, exist_ok=True)
+        return scratch_dir
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+class EncoderBackend:
+    """Writes the raw block payload of an image in a texture format to an open binary file
+    
+    Images are PIL images, (h, w, 3 or 4) uint8 arrays as decoded by a TextureContext, or
+    strip sources: objects with that shape that build arrays for slices of rows on demand.
+    The NumPy encoder streams those strip by strip, the CLI backends need them whole.
+    """
+    
+    name = None
+    formats = ()
+    priority = 100  # auto-selection prefers the lowest
+    version = 1     # bump when the payloads a backend writes change, invalidates cached conversions
+    batched = False # encode_batch handles many images in one run, worth holding them decoded for
+    
+    def __init__(self, texconv_path="texconv.exe", scratch_dir=None):
+        self.scratch_dir = scratch_dir
+    
+    def available(self):
+        return True
+    
+    def supports(self, format_type):
+        return format_type in self.formats
+    
+    def rank(self, format_type, bc7_preset="fast"):
+        """Get the auto-selection order of this backend for a format and preset, lowest preferred"""
+        return self.priority
+    
+    def encode(self, img, format_type, out_file, bc7_preset="fast"):
+        """Write the payload at the current position of out_file, returning its size or None on failure"""
+        raise NotImplementedError
+    
+    def encode_batch(self, items, format_type, bc7_preset="fast"):
+        """Encode (img, out_file) items to one format, returning payload sizes in order"""
+        return [self.encode(img, format_type, out_file, bc7_preset) for img, out_file in items]
+    
+    def _work_dir(self):
+        """Create a private folder for this run's intermediates in the scratch directory"""
+        return tempfile.mkdtemp(prefix=f"decal_{self.name}_", dir=resolve_scratch_dir(self.scratch_dir))
+
+@register_encoder
+class NumpyEncoder(EncoderBackend):
+    """In-process BC1/BC3/BC7 encoder, no process spawn or temp files"""
+    
+    name = "numpy"
+    formats = ('BC1_UNORM', 'BC3_UNORM', 'BC7_UNORM')
+    priority = 10
+    
+    def rank(self, format_type, bc7_preset="fast"):
+        # Ahead of spawning a compressor for BC1/BC3, but BC7 is far slower and lower quality
+        # here than in the native encoders, so it only runs when none of them is installed
+        return 50 if format_type == 'BC7_UNORM' else self.priority
+    
+    def encode(self, img, format_type, out_file, bc7_preset="fast"):
+        size = 0
+        for chunk in iter_encode_image(as_array(img), format_type, bc7_preset):
+            out_file.write(chunk)
+            size += len(chunk)
+        return size
+
+@register_encoder
+class TexconvEncoder(EncoderBackend):
+    """DirectXTex texconv, from the configured path or PATH"""
+    
+    name = "texconv"
+    formats = ('BC1_UNORM', 'BC2_UNORM', 'BC3_UNORM', 'BC7_UNORM')
+    priority = 20
+    batched = True
+    
+    def __init__(self, texconv_path="texconv.exe", scratch_dir=None):
+        super().__init__(texconv_path, scratch_dir)
+        path = texconv_path
+        if not os.path.isabs(path) and not os.path.dirname(path):
+            path = os.path.abspath(path)
+        if not os.path.exists(path):
+            path = shutil.which('texconv') or path
+        self.path = path
+    
+    def available(self):
+        return os.path.exists(self.path)
+    
+    @staticmethod
+    def _extra_args(format_type, bc7_preset):
+        # texconv's quick BC7 compression only tries mode 6, like the fast preset
+        return ["-bc", "q"] if format_type == 'BC7_UNORM' and bc7_preset == 'fast' else []
+    
+    def encode(self, img, format_type, out_file, bc7_preset="fast"):
+        return self.encode_batch([(img, out_file)], format_type, bc7_preset)[0]
+    
+    def encode_batch(self, items, format_type, bc7_preset="fast"):
+        """Convert every item in as few texconv runs as possible"""
+        # Numbered names in a private folder, so same-named images from different bundles can't collide
+        work_dir = self._work_dir()
+        try:
+            inputs = []
+            for i, (img, _) in enumerate(items):
+                temp_png = os.path.join(work_dir, f"{i:05d}.png")
+                as_image(img).save(temp_png, 'PNG', compress_level=0)
+                inputs.append(temp_png)
+            
+            outputs = run_texconv_batch(inputs, work_dir, format_type, self.path, self._extra_args(format_type, bc7_preset))
+            return [copy_dds_payload(dds, out_file) if dds else None
+                    for dds, (_, out_file) in zip(outputs, items)]
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+class CommandLineEncoder(EncoderBackend):
+    """Any compressor CLI on PATH that reads a PNG and writes a DDS"""
+    
+    executable = None
+    format_args = {}
+    
+    def __init__(self, texconv_path="texconv.exe", scratch_dir=None):
+        super().__init__(texconv_path, scratch_dir)
+        self.path = shutil.which(self.executable)
+    
+    def available(self):
+        return self.path is not None
+    
+    def supports(self, format_type):
+        return format_type in self.format_args
+    
+    def command(self, input_path, output_path, format_type, bc7_preset):
+        raise NotImplementedError
+    
+    def encode(self, img, format_type, out_file, bc7_preset="fast"):
+        work_dir = self._work_dir()
+        temp_png = os.path.join(work_dir, "input.png")
+        temp_dds = os.path.join(work_dir, "output.dds")
+        
+        as_image(img).save(temp_png, 'PNG', compress_level=0)
+        try:
+            cmd = self.command(temp_png, temp_dds, format_type, bc7_preset)
+            print(f"      Running {self.name}: {' '.join(cmd)}")
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            if not os.path.exists(temp_dds):
+                print(f"      Error: {self.name} did not create output file at {temp_dds}")
+                return None
+            return copy_dds_payload(temp_dds, out_file)
+        except subprocess.CalledProcessError as e:
+            print(f"      Error with {self.name}: {e}")
+            if e.stderr:
+                print(f"      {self.name} stderr: {e.stderr}")
+            return None
+        except OSError as e:
+            print(f"      Error running {self.name}: {e}")
+            return None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+@register_encoder
+class NvcompressEncoder(CommandLineEncoder):
+    """NVIDIA Texture Tools nvcompress"""
+    
+    name = "nvcompress"
+    executable = "nvcompress"
+    format_args = {'BC1_UNORM': '-bc1', 'BC3_UNORM': '-bc3', 'BC7_UNORM': '-bc7'}
+    priority = 30
+    
+    def command(self, input_path, output_path, format_type, bc7_preset):
+        quality = ["-fast"] if bc7_preset == 'fast' else ["-production"]
+        return [self.path, self.format_args[format_type], "-nomips"] + quality + [input_path, output_path]
+
+@register_encoder
+class CompressonatorEncoder(CommandLineEncoder):
+    """AMD Compressonator CLI"""
+    
+    name = "compressonator"
+    executable = "compressonatorcli"
+    format_args = {'BC1_UNORM': 'BC1', 'BC3_UNORM': 'BC3', 'BC7_UNORM': 'BC7'}
+    priority = 40
+    
+    def command(self, input_path, output_path, format_type, bc7_preset):
+        return [self.path, "-fd", self.format_args[format_type], "-nomipmap", input_path, output_path]
+
+def available_encoders(texconv_path="texconv.exe", scratch_dir=None):
+    """Get instances of every usable backend, fastest first"""
+    backends = [cls(texconv_path, scratch_dir) for cls in ENCODERS.values()]
+    return sorted((b for b in backends if b.available()), key=lambda b: b.priority)
+
+def select_encoder(format_type, name="auto", texconv_path="texconv.exe", scratch_dir=None, bc7_preset="fast"):
+    """Get the configured backend, or the best available one for the format and preset"""
+    if name != "auto":
+        cls = ENCODERS.get(name)
+        if cls is None:
+            print(f"      Warning: Unknown encoder '{name}', choosing automatically")
+        else:
+            backend = cls(texconv_path, scratch_dir)
+            if backend.available() and backend.supports(format_type):
+                return backend
+            reason = "not available" if not backend.available() else f"cannot encode {format_type}"
+            print(f"      Warning: Encoder '{name}' {reason}, choosing automatically")
+    
+    backends = [b for b in available_encoders(texconv_path, scratch_dir) if b.supports(format_type)]
+    return min(backends, key=lambda b: b.rank(format_type, bc7_preset), default=None)
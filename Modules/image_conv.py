@@ -1,48 +1,87 @@
+import io
 import os
-from PIL import Image
-from Modules.dds_module import get_dds_compression_data, get_dds_format_info, run_texconv
-from Modules.utils import get_base_name, is_alpha_mask
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import Modules.bc_encoder as bc_encoder
+from Modules.dds_module import copy_dds_payload, read_dds_header
+from Modules.dat_module import DatMetadata, FORMAT_NAMES
+from Modules.encoders import select_encoder
+from Modules.conversion_cache import hash_file
+from Modules.conversion_record import write_record
+from Modules.conversion_policy import ConversionPolicy, ConversionResult
+from Modules.texture_context import TextureContext
+from Modules.utils import get_base_name
 
-def convert_image_to_dat(image_path, dat_path, texconv_path):
-    """Convert image to DAT by extracting raw texture data"""
+CONVERSION_BATCH_SIZE = 32  # jobs per batch, the unit of work handed to each process
+BATCH_PIXELS = 16 * 1024 * 1024  # decoded pixels held for one run of a batched encoder (texconv)
+
+def load_texture_source(image_path, dat_path, policy=None, result=None, context=None, metadata=None):
+    """Read the header of a DDS, or prepare any other image for encoding
+    
+    Returns a dict with 'format_type' and either 'dds_header' (DDS input, the payload is
+    copied later) or the 'pixels' to encode with their 'width' and 'height', and the
+    'transform' ('resized', 'padded' or '') that brought them to that size. Returns None
+    on failure. The ConversionPolicy settles power-of-2 sizes, and what was done (or why
+    it failed) is noted on the ConversionResult.
+    
+    Other images are decoded once into a TextureContext, or a caller's already decoded
+    one is used, and every step below works from its array. metadata is the metadata DAT
+    opened for this conversion by open_metadata, None when there is none.
+    """
+    policy = policy or ConversionPolicy()
+    if result is None:
+        result = ConversionResult(image_path, dat_path)
     try:
         file_ext = os.path.splitext(image_path)[1].lower()
         format_type = None
         
         if file_ext == '.dds':
-            # Get format info from the DDS file
-            dds_format, _ = get_dds_format_info(image_path)
-            if dds_format in ['DXT1', 'DXT3', 'DXT5']:
-                format_map = {'DXT1': 'BC1_UNORM', 'DXT3': 'BC2_UNORM', 'DXT5': 'BC3_UNORM'}
-                format_type = format_map.get(dds_format)
-                print(f"       DDS file format: {dds_format} → {format_type}")
+            # One read of the header, legacy or DX10, the payload is never loaded
+            header = read_dds_header(image_path)
+            if not header:
+                print(f"Error: {image_path} is not a DDS file")
+                result.error = "Not a DDS file"
+                return None
             
-            texture_data = get_dds_compression_data(image_path)
+            dds_format = header['format_name']
+            format_type = header['format_type']
+            if format_type:
+                print(f"       DDS file format: {dds_format} → {format_type}")
             
-            if not texture_data:
+            if not header['payload_size']:
                 print(f"Error: Could not extract texture data from {image_path}")
-                return False
+                result.error = "No texture data in the DDS"
+                return None
+            
+            print(f"       DDS Format: {dds_format}, Data size: {header['payload_size']} bytes")
+            if header['mip_count'] > 1:
+                print(f"       Mip levels: {header['mip_count']} (copied as they are)")
             
             # Verify DDS data size
-            img_w, img_h = Image.open(image_path).size
-            expected_size = calculate_dds_size(img_w, img_h, dds_format)
-            actual_size = len(texture_data)
+            expected_size = calculate_dds_size(header['width'], header['height'], format_type or dds_format)
+            actual_size = header['payload_size']
             
-            print(f"       Extracted raw DDS texture data")
+            print(f"       Found raw DDS texture data")
             print(f"       Expected size: {expected_size} bytes")
             print(f"       Actual size: {actual_size} bytes")
             
             if actual_size < expected_size * 0.9:  # Allow 10% tolerance
                 print(f"       WARNING: DDS data size mismatch!")
+            
+            result.source_size = result.size = (header['width'], header['height'])
+            result.format_type = format_type
+            return {'format_type': format_type, 'dds_header': header}
         
         elif file_ext in ['.png', '.jpg', '.jpeg', '.tga']:
             print(f"       Converting {file_ext.upper()} to DDS first...")
             
-            img = Image.open(image_path)
-            img_width, img_height = img.size
-            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            if context is None:
+                context = TextureContext.load(image_path)
+            img_width, img_height = context.size
+            result.source_size = context.size
+            has_alpha = context.has_alpha
             
-            is_alpha = is_alpha_mask(image_path)
+            is_alpha = context.is_alpha_mask
             
             # DXT/BC formats require dimensions that are multiples of 4
             # Calculate padded dimensions
@@ -53,6 +92,7 @@ def convert_image_to_dat(image_path, dat_path, texconv_path):
             from Modules.utils import is_power_of_2, next_power_of_2, previous_power_of_2
             
             pow2_warning = False
+            pad_note = "(DXT/BC formats require dimensions divisible by 4)"
             if not is_power_of_2(padded_width) or not is_power_of_2(padded_height):
                 pow2_warning = True
                 print(f"       ")
@@ -78,61 +118,42 @@ def convert_image_to_dat(image_path, dat_path, texconv_path):
                 print(f"       ⚠️  GAME MAY CRASH OR FAIL TO LOAD THIS DECAL PROPERLY ⚠️")
                 print(f"       ")
                 
-                # Ask user if they want to auto-resize
-                user_input = input("       Resize to nearest power-of-2? (y/n): ").strip().lower()
-                
-                if user_input == 'y':
-                    target_width = previous_power_of_2(padded_width)
-                    target_height = previous_power_of_2(padded_height)
-                    
-                    if abs(next_power_of_2(padded_width) - padded_width) < abs(padded_width - previous_power_of_2(padded_width)):
-                        target_width = next_power_of_2(padded_width)
-                    if abs(next_power_of_2(padded_height) - padded_height) < abs(padded_height - previous_power_of_2(padded_height)):
-                        target_height = next_power_of_2(padded_height)
+                # Settled by the policy, the menus ask before conversion starts
+                mode = policy.pow2
+                if mode == 'refuse':
+                    print(f"       Refusing to convert a non-power-of-2 image")
+                    result.error = f"Not a power-of-2 size: {padded_width}x{padded_height}"
+                    return None
+                elif mode in ('nearest', 'larger', 'smaller'):
+                    target_width, target_height = policy.pow2_size(padded_width, padded_height, mode)
                     
                     print(f"       Resizing to {target_width}x{target_height}...")
-                    img = img.resize((target_width, target_height), Image.LANCZOS)
+                    context.resize(target_width, target_height)
                     padded_width, padded_height = target_width, target_height
                     img_width, img_height = target_width, target_height
+                    result.resized = True
                     
                     # Update metadata
-                    metadata_dat_path = dat_path.replace('_texture.dat', '.dat')
-                    if os.path.exists(metadata_dat_path):
-                        try:
-                            from Modules.dat_module import write_dat_dimensions
-                            write_dat_dimensions(metadata_dat_path, target_width, target_height)
-                            print(f"       Updated .DAT dimensions to {target_width}x{target_height}")
-                        except Exception as e:
-                            print(f"       Warning: Could not update .DAT dimensions: {e}")
+                    _update_metadata_dimensions(metadata, target_width, target_height, result)
+                elif mode == 'pad':
+                    # Padded up to the power-of-2 size below instead of to the next multiple of 4
+                    padded_width, padded_height = policy.pow2_size(padded_width, padded_height, mode)
+                    pow2_warning = False
+                    pad_note = "(padded out to power-of-2 dimensions)"
                 else:
                     print(f"       Continuing with non-power-of-2 dimensions (may crash game)...")
             
             if (img_width, img_height) != (padded_width, padded_height) and not pow2_warning:
                 print(f"       Padding image from {img_width}x{img_height} to {padded_width}x{padded_height}")
-                print(f"       (DXT/BC formats require dimensions divisible by 4)")
+                print(f"       {pad_note}")
                 
-                # Create new image with padded size
-                if has_alpha or is_alpha:
-                    padded_img = Image.new('RGBA', (padded_width, padded_height), (0, 0, 0, 0))
-                else:
-                    padded_img = Image.new('RGB', (padded_width, padded_height), (0, 0, 0))
-                
-                # Paste original image at top-left
-                if img.mode != padded_img.mode:
-                    img = img.convert(padded_img.mode)
-                padded_img.paste(img, (0, 0))
-                img = padded_img
+                # Padded at the top-left, transparent black where there is alpha
+                context.pad(padded_width, padded_height)
                 img_width, img_height = padded_width, padded_height
+                result.padded = True
                 
                 # Update .DAT metadata with new dimensions
-                metadata_dat_path = dat_path.replace('_texture.dat', '.dat')
-                if os.path.exists(metadata_dat_path):
-                    try:
-                        from Modules.dat_module import write_dat_dimensions
-                        write_dat_dimensions(metadata_dat_path, padded_width, padded_height)
-                        print(f"       Updated .DAT dimensions to {padded_width}x{padded_height}")
-                    except Exception as e:
-                        print(f"       Warning: Could not update .DAT dimensions: {e}")
+                _update_metadata_dimensions(metadata, padded_width, padded_height, result)
             
             # Try to match format from existing DDS or metadata DAT
             format_type = None
@@ -140,45 +161,21 @@ def convert_image_to_dat(image_path, dat_path, texconv_path):
             
             possible_dds = os.path.join(os.path.dirname(image_path), f"{base_name}.dds")
             if os.path.exists(possible_dds):
-                existing_format, _ = get_dds_format_info(possible_dds)
-                if existing_format in ['DXT1', 'DXT3', 'DXT5']:
-                    format_map = {'DXT1': 'BC1_UNORM', 'DXT3': 'BC2_UNORM', 'DXT5': 'BC3_UNORM'}
-                    format_type = format_map.get(existing_format)
-                    print(f"       Matching existing DDS format: {existing_format} → {format_type}")
+                existing = read_dds_header(possible_dds)
+                if existing and existing['format_type']:
+                    format_type = existing['format_type']
+                    print(f"       Matching existing DDS format: {existing['format_name']} → {format_type}")
             
             # Check metadata DAT file
-            if not format_type and not is_alpha:
-                metadata_dat_path = dat_path.replace('_texture.dat', '.dat')
-                
-                if os.path.exists(metadata_dat_path):
-                    try:
-                        with open(metadata_dat_path, 'rb') as f:
-                            magic = f.read(13)
-                            if magic in (b'\x00' * 12 + b'\x07', b'\x00' * 12 + b'\x09'):
-                                # Remastered - format at 0x2C
-                                f.seek(0x2C)
-                                fmt_byte = f.read(1)
-                                if fmt_byte == b'\x47':
-                                    format_type = 'BC1_UNORM'  # DXT1
-                                    print(f"       From metadata DAT: DXT1 → BC1_UNORM")
-                                elif fmt_byte == b'\x4D':
-                                    format_type = 'BC3_UNORM'  # DXT5
-                                    print(f"       From metadata DAT: DXT5 → BC3_UNORM")
-                                elif fmt_byte == b'\x62':
-                                    format_type = 'BC7_UNORM'  # BC7
-                                    print(f"       From metadata DAT: BC7 → BC7_UNORM")
-                            elif magic[:9] == b'\x00' * 8 + b'\x01':
-                                # Original - format at 0xC
-                                f.seek(0xC)
-                                fmt_str = f.read(4).decode('ascii', errors='ignore')
-                                if fmt_str == 'DXT1':
-                                    format_type = 'BC1_UNORM'
-                                    print(f"       From metadata DAT: DXT1 → BC1_UNORM")
-                                elif fmt_str == 'DXT5':
-                                    format_type = 'BC3_UNORM'
-                                    print(f"       From metadata DAT: DXT5 → BC3_UNORM")
-                    except Exception as e:
-                        print(f"       Warning: Could not read metadata DAT: {e}")
+            if not format_type and not is_alpha and metadata:
+                try:
+                    dat_format = metadata.read_format()
+                    # DXT3 has no encoder here, it falls through to auto-detection
+                    if dat_format in ('BC1_UNORM', 'BC3_UNORM', 'BC7_UNORM'):
+                        format_type = dat_format
+                        print(f"       From metadata DAT: {FORMAT_NAMES[dat_format]} → {format_type}")
+                except Exception as e:
+                    print(f"       Warning: Could not read metadata DAT: {e}")
             
             # Fallback to auto-detection
             if not format_type:
@@ -192,134 +189,365 @@ def convert_image_to_dat(image_path, dat_path, texconv_path):
                     format_type = 'BC1_UNORM'
                     print(f"       Auto-detect: Opaque image → BC1_UNORM (DXT1)")
             
-            # Pre-process PNG
-            temp_dir = os.path.dirname(image_path)
-            base_name_file = os.path.splitext(os.path.basename(image_path))[0]
-            
-            # Save a clean version of the PNG for conversion
-            temp_png = os.path.join(temp_dir, f"{base_name_file}_temp_clean.png")
-            
-            if format_type == 'BC1_UNORM':
-                img_clean = img.convert('RGB')
-            elif is_alpha:
-                img_clean = img.convert('RGB')
-            else:
-                img_clean = img.convert('RGBA')
-            
-            img_clean.save(temp_png, 'PNG')
-            
-            temp_dds = os.path.join(temp_dir, f"{base_name_file}_temp_convert.dds")
-            
-            # Run texconv
-            result = run_texconv(temp_png, temp_dir, format_type, f"{base_name_file}_temp_convert.dds", texconv_path)
-            
-            # Clean up temp PNG
-            try:
-                os.remove(temp_png)
-            except:
-                pass
-            
-            if not result or not os.path.exists(temp_dds):
-                print(f"       Error: texconv conversion failed")
-                return False
-            
-            # Verify the DDS file before extracting
-            dds_format, _ = get_dds_format_info(temp_dds)
-            dds_size = os.path.getsize(temp_dds)
-            expected_data_size = calculate_dds_size(img_width, img_height, dds_format)
-            
-            print(f"       Generated DDS: {dds_size} bytes total")
-            print(f"       Expected texture data: {expected_data_size} bytes")
-            
-            # Verify DDS has correct size
-            if dds_size < (128 + expected_data_size * 0.9):  # Header + 90% of expected data
-                print(f"       ERROR: DDS file is too small!")
-                print(f"       This usually means texconv failed silently.")
-                try:
-                    os.remove(temp_dds)
-                except:
-                    pass
-                return False
-            
-            # Extract raw texture data from the temporary DDS
-            texture_data = get_dds_compression_data(temp_dds)
-            
-            # Clean up temporary file
-            try:
-                os.remove(temp_dds)
-            except:
-                pass
-            
-            if not texture_data:
-                print(f"       Error: Could not extract texture data from converted DDS")
-                return False
-            
-            # Verify extracted data size
-            if len(texture_data) < expected_data_size * 0.9:
-                print(f"       ERROR: Extracted data is too small!")
-                print(f"       Expected: {expected_data_size} bytes")
-                print(f"       Got: {len(texture_data)} bytes")
-                return False
+            result.size = (img_width, img_height)
+            result.format_type = format_type
+            transform = 'resized' if result.resized else 'padded' if result.padded else ''
+            return {'format_type': format_type, 'pixels': context.encoder_pixels(format_type),
+                    'width': img_width, 'height': img_height, 'transform': transform}
         
         else:
             print(f"Error: Unsupported file format {file_ext}")
             print(f"       Supported: .dds, .png, .jpg, .jpeg, .tga")
-            return False
+            result.error = f"Unsupported file format {file_ext}"
+            return None
         
-        # Create DAT directory if needed
-        dat_dir = os.path.dirname(dat_path)
-        if dat_dir and not os.path.exists(dat_dir):
-            os.makedirs(dat_dir)
-        
-        # Write raw texture data to _texture.dat
-        with open(dat_path, 'wb') as f:
-            f.write(texture_data)
+    except Exception as e:
+        print(f"Error converting {image_path}: {e}")
+        result.error = str(e)
+        import traceback
+        traceback.print_exc()
+        return None
+
+def open_metadata(dat_path):
+    """Open the metadata DAT next to a _texture.dat for one conversion, None when there is none
+    
+    It is opened writable where possible, so the format lookup and every later update go
+    through the same DatMetadata. The caller closes it once the conversion is done.
+    """
+    metadata_dat_path = dat_path.replace('_texture.dat', '.dat')
+    if not os.path.exists(metadata_dat_path):
+        return None
+    try:
+        try:
+            return DatMetadata(metadata_dat_path, writable=True)
+        except PermissionError:
+            return DatMetadata(metadata_dat_path)
+    except Exception as e:
+        print(f"       Warning: Could not read metadata DAT: {e}")
+        return None
+
+def _update_metadata_dimensions(metadata, width, height, result):
+    """Write the size the pixels were resized or padded to into the metadata DAT"""
+    if not metadata:
+        return
+    try:
+        metadata.write_dimensions(width, height)
+        print(f"       Updated .DAT dimensions to {width}x{height}")
+        result.dat_dimensions_updated = True
+    except Exception as e:
+        print(f"       Warning: Could not update .DAT dimensions: {e}")
+
+def _ensure_dat_dir(dat_path):
+    # Create DAT directory if needed
+    dat_dir = os.path.dirname(dat_path)
+    if dat_dir and not os.path.exists(dat_dir):
+        os.makedirs(dat_dir)
+
+def update_metadata_format(metadata, format_type):
+    """Point a metadata DAT from open_metadata at the format its payload was written in"""
+    # Update metadata DAT format if needed and possible
+    if metadata:
+        if format_type:
+            try:
+                if metadata.write_format(format_type):
+                    print(f"       Updated metadata DAT format to {FORMAT_NAMES.get(format_type, format_type)}")
+                elif metadata.layout:
+                    print(f"       Note: Metadata DAT cannot hold {format_type}, format not updated")
+            except Exception as e:
+                print(f"       Warning: Could not update metadata DAT format: {e}")
+        else:
+            print(f"       Note: Format type unknown, metadata DAT not updated")
+    else:
+        print(f"       Note: Metadata DAT not found, texture data only")
+
+def extract_dds_to_dat(dds_path, dat_path, header, format_type, metadata=None):
+    """Copy the payload of a DDS into its _texture.dat and update the metadata DAT format"""
+    part_path = dat_path + '.part'
+    try:
+        _ensure_dat_dir(dat_path)
         
-        print(f"       Wrote: {len(texture_data)} bytes → {dat_path}")
+        # Copied file to file by the kernel where possible, never loaded into memory
+        with open(part_path, 'wb') as f:
+            size = copy_dds_payload(dds_path, f, header)
+        os.replace(part_path, dat_path)
         
-        # Update metadata DAT format if needed and possible
-        metadata_dat_path = dat_path.replace('_texture.dat', '.dat')
-        if os.path.exists(metadata_dat_path):
-            if format_type:
-                try:
-                    with open(metadata_dat_path, 'r+b') as f:
-                        magic = f.read(13)
-                        if magic in (b'\x00' * 12 + b'\x07', b'\x00' * 12 + b'\x09'):
-                            # Remastered - format at 0x2C
-                            f.seek(0x2C)
-                            if format_type == 'BC1_UNORM':
-                                f.write(b'\x47')  # DXT1
-                                print(f"       Updated metadata DAT format to DXT1")
-                            elif format_type == 'BC3_UNORM':
-                                f.write(b'\x4D')  # DXT5
-                                print(f"       Updated metadata DAT format to DXT5")
-                            elif format_type == 'BC7_UNORM':
-                                f.write(b'\x62')  # BC7
-                                print(f"       Updated metadata DAT format to BC7")
-                        elif magic[:9] == b'\x00' * 8 + b'\x01':
-                            # Original - format at 0xC
-                            f.seek(0xC)
-                            if format_type == 'BC1_UNORM':
-                                f.write(b'DXT1')
-                                print(f"       Updated metadata DAT format to DXT1")
-                            elif format_type == 'BC3_UNORM':
-                                f.write(b'DXT5')
-                                print(f"       Updated metadata DAT format to DXT5")
-                except Exception as e:
-                    print(f"       Warning: Could not update metadata DAT format: {e}")
-            else:
-                print(f"       Note: Format type unknown, metadata DAT not updated")
-        else:
-            print(f"       Note: Metadata DAT not found, texture data only")
+        print(f"       Wrote: {size} bytes → {dat_path}")
         
+        update_metadata_format(metadata, format_type)
         return True
         
     except Exception as e:
-        print(f"Error converting {image_path}: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error writing {dat_path}: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
         return False
 
+def encode_texture_sources(sources, texconv_path, encoder="auto", bc7_preset="fast", scratch_dir=None, cache=None,
+                           backends=None):
+    """Encode prepared images straight into their _texture.dat files
+    
+    Sources are grouped so batch-capable backends run once per format. Each payload is
+    streamed into a part file beside its _texture.dat and only replaces it once the size
+    checks out. Each source gets 'written' set to whether that happened, and an 'error'
+    when it did not. With a ConversionCache, payloads already encoded with the same
+    parameters are copied from it. backends maps formats to the encoder already selected
+    for them, and is filled in for formats that have none yet.
+    """
+    backends = {} if backends is None else backends
+    groups = {}
+    for source in sources:
+        source['written'] = False
+        format_type = source['format_type']
+        if format_type not in backends:
+            backends[format_type] = select_encoder(format_type, encoder, texconv_path, scratch_dir, bc7_preset)
+        backend = backends[format_type]
+        if not backend:
+            print(f"       Error: No available encoder can produce {format_type}")
+            source['error'] = f"No available encoder can produce {format_type}"
+            continue
+        groups.setdefault((backend.name, format_type), (backend, []))[1].append(source)
+    
+    for (name, format_type), (backend, group) in groups.items():
+        if cache:
+            group = _fetch_cached(group, format_type, backend, bc7_preset, cache)
+            if not group:
+                continue
+        
+        preset_note = f", {bc7_preset} preset" if format_type == 'BC7_UNORM' else ""
+        print(f"\n       Encoding {len(group)} image(s) to {format_type} with {name}{preset_note}...")
+        
+        files = []
+        try:
+            for source in group:
+                _ensure_dat_dir(source['dat_path'])
+                files.append(open(source['dat_path'] + '.part', 'wb'))
+            sizes = backend.encode_batch([(s['pixels'], f) for s, f in zip(group, files)], format_type, bc7_preset)
+        except BaseException:
+            # A run that fails outright leaves no part files behind in the Raw folders
+            for f in files:
+                f.close()
+                os.remove(f.name)
+            raise
+        finally:
+            for f in files:
+                f.close()
+        
+        for source, size in zip(group, sizes):
+            image_name = os.path.basename(source['image_path'])
+            part_path = source['dat_path'] + '.part'
+            expected_data_size = calculate_dds_size(source['width'], source['height'], format_type)
+            
+            if not size:
+                print(f"       Error: {name} conversion failed for {image_name}")
+                source['error'] = f"{name} conversion failed"
+            elif size < expected_data_size * 0.9:
+                # Verify encoded data size
+                print(f"       ERROR: Encoded data for {image_name} is too small!")
+                print(f"       Expected: {expected_data_size} bytes")
+                print(f"       Got: {size} bytes")
+                source['error'] = f"Encoded data too small ({size} of {expected_data_size} bytes)"
+            else:
+                if cache:
+                    cache.store(source['cache_key'], part_path)
+                os.replace(part_path, source['dat_path'])
+                print(f"       Wrote: {size} bytes → {source['dat_path']}")
+                source['written'] = True
+                continue
+            
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+def _fetch_cached(group, format_type, backend, bc7_preset, cache):
+    """Fill _texture.dat files from the cache where possible, returning the sources still to encode"""
+    pending = []
+    for source in group:
+        source['source_hash'] = hash_file(source['image_path'])
+        source['cache_key'] = cache.key(source['source_hash'], source['width'], source['height'],
+                                        format_type, backend, bc7_preset, source.get('transform', ''))
+        part_path = source['dat_path'] + '.part'
+        expected_data_size = calculate_dds_size(source['width'], source['height'], format_type)
+        
+        _ensure_dat_dir(source['dat_path'])
+        size = cache.fetch(source['cache_key'], part_path)
+        if size and size >= expected_data_size * 0.9:
+            os.replace(part_path, source['dat_path'])
+            print(f"       Cached: {size} bytes → {source['dat_path']}")
+            source['written'] = source['cached'] = True
+            continue
+        
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        pending.append(source)
+    return pending
+
+def _convert_batch(batch, texconv_path, encoder, bc7_preset, scratch_dir, cache, policy, show_names, contexts=None):
+    """Convert one batch of (image_path, dat_path) jobs, returning a ConversionResult per job
+    
+    Images for the in-process and one-image-at-a-time encoders are decoded, encoded and
+    dropped in turn, so only one is held decoded. Images for a batched encoder wait in a
+    group that runs once it holds BATCH_PIXELS pixels, and again for what is left over.
+    Each job is finished as soon as its payload is written.
+    """
+    contexts = contexts or {}
+    results = []
+    backends = {}
+    pending = []
+    pending_pixels = 0
+    
+    def finish(source, result, metadata):
+        # Metadata DAT format, DDS payload copy and conversion record, then the DAT is done with
+        if 'dds_header' not in source:
+            result.ok = bool(source.get('written'))
+            result.cached = bool(source.get('cached'))
+            if result.ok:
+                update_metadata_format(metadata, source['format_type'])
+            else:
+                result.error = source.get('error', "Encoding failed")
+        else:
+            result.ok = extract_dds_to_dat(result.image_path, result.dat_path, source['dds_header'],
+                                           source['format_type'], metadata)
+            if not result.ok:
+                result.error = "Could not copy the DDS payload"
+        
+        if result.ok:
+            write_record(result.image_path, result.dat_path, source.get('source_hash'))
+        if metadata:
+            metadata.close()
+    
+    def encode(jobs):
+        group = [source for source, _, _ in jobs]
+        try:
+            encode_texture_sources(group, texconv_path, encoder, bc7_preset, scratch_dir, cache, backends)
+        except Exception as e:
+            print(f"Error encoding textures: {e}")
+            import traceback
+            traceback.print_exc()
+            for source in group:
+                source.setdefault('error', str(e))
+        for source, result, metadata in jobs:
+            # The payload is in its _texture.dat by now, free the decoded image
+            del source['pixels']
+            finish(source, result, metadata)
+    
+    for image_path, dat_path in batch:
+        result = ConversionResult(image_path, dat_path)
+        results.append(result)
+        if show_names:
+            print(f"\n   {os.path.basename(image_path)}")
+        # One open of the metadata DAT serves the format lookup and every update to it
+        metadata = open_metadata(dat_path)
+        source = load_texture_source(image_path, dat_path, policy, result, contexts.get(image_path), metadata)
+        if not source:
+            if metadata:
+                metadata.close()
+            continue
+        source['image_path'], source['dat_path'] = image_path, dat_path
+        job = (source, result, metadata)
+        if 'pixels' not in source:
+            finish(*job)
+            continue
+        
+        format_type = source['format_type']
+        if format_type not in backends:
+            backends[format_type] = select_encoder(format_type, encoder, texconv_path, scratch_dir, bc7_preset)
+        backend = backends[format_type]
+        if not backend or not backend.batched:
+            encode([job])
+            continue
+        pending.append(job)
+        pending_pixels += source['width'] * source['height']
+        if pending_pixels >= BATCH_PIXELS:
+            encode(pending)
+            pending = []
+            pending_pixels = 0
+    if pending:
+        encode(pending)
+    return results
+
+def _init_worker(encode_threads):
+    # Share the cores between processes instead of every process starting one thread per core
+    bc_encoder.ENCODE_WORKERS = encode_threads
+
+def _convert_batch_captured(batch, texconv_path, encoder, bc7_preset, scratch_dir, cache, policy, show_names):
+    """Run _convert_batch in a worker process, returning its results, console output and cache counters"""
+    if cache:
+        # The pickled cache arrives with the parent's counts, only this batch's are sent back
+        cache.hits = cache.misses = 0
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        results = _convert_batch(batch, texconv_path, encoder, bc7_preset, scratch_dir, cache, policy, show_names)
+    return results, output.getvalue(), (cache.hits, cache.misses) if cache else (0, 0)
+
+def resolve_workers(workers):
+    """Get the number of conversion processes, 0 or None meaning one per core"""
+    return max(1, workers or os.cpu_count() or 1)
+
+def convert_images_to_dat(jobs, texconv_path, encoder="auto", bc7_preset="fast", scratch_dir=None, cache=None,
+                          workers=1, policy=None, contexts=None):
+    """Convert (image_path, dat_path) jobs, returning a ConversionResult per job in order
+    
+    Jobs are handled CONVERSION_BATCH_SIZE at a time. Within a batch each image is
+    decoded, encoded and dropped before the next, except for a batched encoder (texconv)
+    whose runs take images of one format up to BATCH_PIXELS decoded pixels at a time.
+    Every _texture.dat written gets a conversion record for later stale checks. The
+    ConversionPolicy (by default keeping power-of-2 sizes as they are) answers the
+    questions conversion would otherwise put to the user, so it never prompts.
+    
+    contexts maps image paths to TextureContexts the caller already decoded, which are
+    used instead of reading the file again and are left holding the final pixels. Worker
+    processes decode their own, so contexts only apply to serial runs.
+    
+    With more than one worker, batches run in a process pool. Each process prints into
+    a buffer that is shown once the batch is done, in job order, so the console reads
+    the same as a serial run.
+    """
+    policy = policy or ConversionPolicy()
+    show_names = len(jobs) > 1
+    workers = min(resolve_workers(workers), len(jobs)) if jobs else 1
+    
+    if workers == 1:
+        results = []
+        for start in range(0, len(jobs), CONVERSION_BATCH_SIZE):
+            results.extend(_convert_batch(jobs[start:start + CONVERSION_BATCH_SIZE], texconv_path, encoder,
+                                          bc7_preset, scratch_dir, cache, policy, show_names, contexts))
+        return results
+    
+    # Smaller batches than the serial path so every process gets work
+    batch_size = max(1, min(CONVERSION_BATCH_SIZE, -(-len(jobs) // (workers * 2))))
+    encode_threads = max(1, (os.cpu_count() or 1) // workers)
+    
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(encode_threads,)) as pool:
+        futures = [pool.submit(_convert_batch_captured, jobs[start:start + batch_size], texconv_path, encoder,
+                               bc7_preset, scratch_dir, cache, policy, show_names)
+                   for start in range(0, len(jobs), batch_size)]
+        
+        for start, future in zip(range(0, len(jobs), batch_size), futures):
+            try:
+                batch_results, output, (hits, misses) = future.result()
+            except Exception as e:
+                # A worker that died takes its batch with it, the other batches still finish
+                print(f"Error converting batch: {e}")
+                for image_path, dat_path in jobs[start:start + batch_size]:
+                    result = ConversionResult(image_path, dat_path)
+                    result.error = f"Worker failed: {e}"
+                    results.append(result)
+                continue
+            
+            print(output, end='')
+            results.extend(batch_results)
+            if cache:
+                cache.hits += hits
+                cache.misses += misses
+    return results
+
+def convert_image_to_dat(image_path, dat_path, texconv_path, encoder="auto", bc7_preset="fast", scratch_dir=None, cache=None,
+                         policy=None, context=None):
+    """Convert image to DAT by extracting raw texture data, returning its ConversionResult"""
+    contexts = {image_path: context} if context else None
+    return convert_images_to_dat([(image_path, dat_path)], texconv_path, encoder, bc7_preset, scratch_dir, cache,
+                                 policy=policy, contexts=contexts)[0]
+
 
 def calculate_dds_size(width, height, format_name):
     """Calculate expected DDS texture data size using pure integer math"""
@@ -330,8 +558,8 @@ def calculate_dds_size(width, height, format_name):
     if format_name in ['DXT1', 'BC1', 'BC1_UNORM']:
         # DXT1/BC1: 4x4 blocks, 8 bytes per block
         return block_width * block_height * 8
-    elif format_name in ['DXT5', 'BC3', 'BC3_UNORM']:
-        # DXT5/BC3: 4x4 blocks, 16 bytes per block
+    elif format_name in ['DXT3', 'BC2', 'BC2_UNORM', 'DXT5', 'BC3', 'BC3_UNORM']:
+        # DXT3/BC2 and DXT5/BC3: 4x4 blocks, 16 bytes per block
         return block_width * block_height * 16
     elif format_name in ['BC7', 'BC7_UNORM']:
         # BC7: 4x4 blocks, 16 bytes per block (Remastered)
@@ -2,12 +2,37 @@ import os
 import numpy as np
 from PIL import Image
 from Modules.dds_module import save_image_dds
+from Modules.texture_context import TextureContext
 
-def generate_alpha_mask(input_path, output_dir=None, target_size=None, texconv_path="texconv.exe"):
-    """Generate an alpha mask by converting alpha channel to blue/cyan"""
-    img = Image.open(input_path).convert('RGBA')
-    original_size = img.size
-    alpha = np.array(img, dtype=np.uint8)[:, :, 3]
+class AlphaMaskPixels:
+    """Strip source of alpha mask pixels, (0, alpha, 255) built a strip at a time from an alpha channel"""
+    
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.shape = alpha.shape + (3,)
+    
+    def __getitem__(self, rows):
+        alpha = self.alpha[rows]
+        pixels = np.empty(alpha.shape + (3,), dtype=np.uint8)
+        pixels[:, :, 0] = 0      # Red = 0
+        pixels[:, :, 1] = alpha  # Green = alpha
+        pixels[:, :, 2] = 255    # Blue = 255
+        return pixels
+    
+    def __array__(self, dtype=None, copy=None):
+        return self[:] if dtype is None else self[:].astype(dtype)
+
+def generate_alpha_mask(input_path, output_dir=None, target_size=None, texconv_path="texconv.exe", encoder="auto", scratch_dir=None,
+                        context=None):
+    """Generate an alpha mask by converting alpha channel to blue/cyan
+    
+    A TextureContext of the input, when the caller already decoded one, is used
+    instead of reading the file again.
+    """
+    if context is None:
+        context = TextureContext.load(input_path)
+    original_size = context.size
+    alpha = context.alpha()
     
     if target_size:
         final_size = target_size
@@ -19,12 +44,8 @@ def generate_alpha_mask(input_path, output_dir=None, target_size=None, texconv_p
     
     print(f"      Alpha mask will be: {w}x{h} pixels")
     
-    output_data = np.zeros((h, w, 3), dtype=np.uint8)
-    output_data[:, :, 0] = 0      # Red = 0
-    output_data[:, :, 1] = alpha  # Green = alpha
-    output_data[:, :, 2] = 255    # Blue = 255
-    
-    result = Image.fromarray(output_data, 'RGB')
+    # Built strip by strip while encoding, never as a full RGB image
+    result = AlphaMaskPixels(alpha)
     output_dir = output_dir or os.path.dirname(input_path)
     
     filename = os.path.basename(input_path)
@@ -33,7 +54,7 @@ def generate_alpha_mask(input_path, output_dir=None, target_size=None, texconv_p
     print(f"      Saving alpha mask as DDS with DXT5 compression...")
     
     # Always save as DDS with BC3_UNORM (DXT5)
-    output_path = save_image_dds(result, output_dir, name, '_alpha', 'BC3_UNORM', texconv_path)
+    output_path = save_image_dds(result, output_dir, name, '_alpha', 'BC3_UNORM', texconv_path, encoder, scratch_dir)
     
     if output_path and os.path.exists(output_path):
         file_size = os.path.getsize(output_path)
@@ -47,13 +68,13 @@ def generate_alpha_mask(input_path, output_dir=None, target_size=None, texconv_p
         print(f"      Expected size: {expected_total_size:,} bytes ({expected_total_size/1024:.2f} KB)")
         
         if abs(file_size - expected_total_size) > 1000:
-            print(f"      WARNING: File size mismatch! Check texconv output.")
+            print(f"      WARNING: File size mismatch! Check encoder output.")
         else:
             print(f"      ✓ File size is correct!")
     
     return output_path, name
 
-def generate_icon(input_path, output_dir=None, texconv_path="texconv.exe"):
+def generate_icon(input_path, output_dir=None, texconv_path="texconv.exe", encoder="auto", scratch_dir=None):
     """Generate a 128x128 icon from an image"""
     img = Image.open(input_path)
     icon = img.resize((128, 128), Image.LANCZOS).convert('RGBA')
@@ -62,6 +83,6 @@ def generate_icon(input_path, output_dir=None, texconv_path="texconv.exe"):
     name, ext = os.path.splitext(os.path.basename(input_path))
     
     # Always save icons as DDS
-    output_path = save_image_dds(icon, output_dir, name, '_icon', 'BC3_UNORM', texconv_path)
+    output_path = save_image_dds(icon, output_dir, name, '_icon', 'BC3_UNORM', texconv_path, encoder, scratch_dir)
     
     return output_path, name
\ No newline at end of file
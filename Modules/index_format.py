@@ -0,0 +1,238 @@
+import os
+import mmap
+import struct
+from bisect import bisect_right
+from collections.abc import Mapping
+from Modules.utils import get_base_name
+
+# Compact decal index layout (all little-endian):
+#   header   magic, version, table counts and section offsets
+#   dirs     (string offset, length) for every interned directory
+#   bundles  (string offset, length, first record, record count), sorted by name
+#   records  fixed-width, grouped by bundle and sorted by image name inside it
+#   order    record numbers sorted by image name, for binary search
+#   strings  UTF-8 blob shared by everything above
+INDEX_MAGIC = b'DIDX'
+INDEX_VERSION = 1
+
+HEADER = struct.Struct('<4sHHIIIIIIII')
+DIR_ENTRY = struct.Struct('<II')
+BUNDLE_ENTRY = struct.Struct('<IHHII')
+RECORD = struct.Struct('<IHIHII')  # image name, dat name, image dir, dat dir
+ORDER_ENTRY = struct.Struct('<I')
+
+def write_compact_index(path, texture_map):
+    """Write a texture map to the compact binary index format"""
+    strings = bytearray()
+    interned = {}
+    
+    def intern(s):
+        if s not in interned:
+            data = s.encode('utf-8')
+            interned[s] = (len(strings), len(data))
+            strings.extend(data)
+        return interned[s]
+    
+    dirs = {}
+    
+    def dir_id(d):
+        if d not in dirs:
+            dirs[d] = len(dirs)
+        return dirs[d]
+    
+    by_bundle = {}
+    for name, info in texture_map.items():
+        by_bundle.setdefault(info['bundle'], []).append((name, info))
+    
+    bundle_entries = []
+    records = []
+    names = []
+    for bundle in sorted(by_bundle):
+        bundle_off, bundle_len = intern(bundle)
+        bundle_entries.append((bundle_off, bundle_len, 0, len(records), len(by_bundle[bundle])))
+        
+        for name, info in sorted(by_bundle[bundle]):
+            name_off, name_len = intern(name)
+            dat_off, dat_len = intern(os.path.basename(info['dat_path']))
+            records.append((name_off, name_len, dat_off, dat_len,
+                            dir_id(os.path.dirname(info['image_path'])),
+                            dir_id(os.path.dirname(info['dat_path']))))
+            names.append(name)
+    
+    dir_entries = [intern(d) for d in sorted(dirs, key=dirs.get)]
+    order = sorted(range(len(names)), key=names.__getitem__)
+    
+    dirs_off = HEADER.size
+    bundles_off = dirs_off + DIR_ENTRY.size * len(dir_entries)
+    records_off = bundles_off + BUNDLE_ENTRY.size * len(bundle_entries)
+    order_off = records_off + RECORD.size * len(records)
+    strings_off = order_off + ORDER_ENTRY.size * len(order)
+    
+    out = bytearray(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, len(dir_entries), len(bundle_entries),
+                                len(records), dirs_off, bundles_off, records_off, order_off, strings_off))
+    for entry in dir_entries:
+        out += DIR_ENTRY.pack(*entry)
+    for entry in bundle_entries:
+        out += BUNDLE_ENTRY.pack(*entry)
+    for entry in records:
+        out += RECORD.pack(*entry)
+    for i in order:
+        out += ORDER_ENTRY.pack(i)
+    out += strings
+    
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(out)
+    os.replace(temp_path, path)
+
+class CompactIndex(Mapping):
+    """Read-only texture map backed by a memory-mapped compact index file"""
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        try:
+            self._read_tables()
+        except (ValueError, UnicodeDecodeError, struct.error) as e:
+            self._mm.close()
+            raise ValueError(f"{path} is not a valid compact decal index: {e}") from e
+        self._dir_cache = {}
+    
+    def _read_tables(self):
+        """Check the header against the file size and decode the bundle table"""
+        if len(self._mm) < HEADER.size:
+            raise ValueError("file is shorter than its header")
+        
+        (magic, version, _, self._dir_count, self._bundle_count, self._count,
+         self._dirs_off, self._bundles_off, self._records_off, self._order_off,
+         self._strings_off) = HEADER.unpack_from(self._mm, 0)
+        
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError("unknown magic or version")
+        
+        # Sections follow each other in a fixed order, a truncated file cuts one short
+        sections = [(self._dirs_off, DIR_ENTRY.size * self._dir_count),
+                    (self._bundles_off, BUNDLE_ENTRY.size * self._bundle_count),
+                    (self._records_off, RECORD.size * self._count),
+                    (self._order_off, ORDER_ENTRY.size * self._count)]
+        end = HEADER.size
+        for off, size in sections:
+            if off < end:
+                raise ValueError("sections overlap")
+            end = off + size
+        if end > self._strings_off or self._strings_off > len(self._mm):
+            raise ValueError("file is truncated")
+        
+        # Directory names are interned last, so they reach the end of the string blob
+        for i in range(self._dir_count):
+            off, length = DIR_ENTRY.unpack_from(self._mm, self._dirs_off + i * DIR_ENTRY.size)
+            if self._strings_off + off + length > len(self._mm):
+                raise ValueError("file is truncated")
+        
+        # Only the small per-bundle table is decoded up front
+        self._bundles = []
+        self._bundle_starts = []
+        for i in range(self._bundle_count):
+            off, length, _, first, count = BUNDLE_ENTRY.unpack_from(self._mm, self._bundles_off + i * BUNDLE_ENTRY.size)
+            if self._strings_off + off + length > len(self._mm) or first + count > self._count:
+                raise ValueError("file is truncated")
+            self._bundles.append((self._string(off, length), first, count))
+            self._bundle_starts.append(first)
+        self._bundle_ids = {name: i for i, (name, _, _) in enumerate(self._bundles)}
+    
+    def close(self):
+        """Release the memory map"""
+        self._mm.close()
+    
+    def _string(self, off, length):
+        start = self._strings_off + off
+        return self._mm[start:start + length].decode('utf-8')
+    
+    def _dir(self, i):
+        if i not in self._dir_cache:
+            self._dir_cache[i] = self._string(*DIR_ENTRY.unpack_from(self._mm, self._dirs_off + i * DIR_ENTRY.size))
+        return self._dir_cache[i]
+    
+    def _name(self, record_no):
+        off, length = struct.unpack_from('<IH', self._mm, self._records_off + record_no * RECORD.size)
+        return self._string(off, length)
+    
+    def _record(self, record_no, bundle=None):
+        """Decode one record into (image name, info dict)"""
+        name_off, name_len, dat_off, dat_len, image_dir, dat_dir = RECORD.unpack_from(
+            self._mm, self._records_off + record_no * RECORD.size)
+        name = self._string(name_off, name_len)
+        
+        if bundle is None:
+            bundle = self._bundles[bisect_right(self._bundle_starts, record_no) - 1][0]
+        
+        return name, {
+            'image_path': os.path.join(self._dir(image_dir), name),
+            'dat_path': os.path.join(self._dir(dat_dir), self._string(dat_off, dat_len)),
+            'bundle': bundle,
+            'base_name': get_base_name(name)
+        }
+    
+    def _find(self, name):
+        """Binary search the sorted order table for an image name"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record_no = ORDER_ENTRY.unpack_from(self._mm, self._order_off + mid * ORDER_ENTRY.size)[0]
+            mid_name = self._name(record_no)
+            if mid_name == name:
+                return record_no
+            if mid_name < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+    
+    def __getitem__(self, name):
+        if not isinstance(name, str):
+            raise KeyError(name)
+        record_no = self._find(name)
+        if record_no is None:
+            raise KeyError(name)
+        return self._record(record_no)[1]
+    
+    def __contains__(self, name):
+        return isinstance(name, str) and self._find(name) is not None
+    
+    def __len__(self):
+        return self._count
+    
+    def __iter__(self):
+        for name, _ in self.items():
+            yield name
+    
+    def items(self):
+        """Decode every record in bundle order"""
+        for bundle, first, count in self._bundles:
+            for record_no in range(first, first + count):
+                yield self._record(record_no, bundle)
+    
+    def values(self):
+        for _, info in self.items():
+            yield info
+    
+    def bundle_names(self):
+        """Get sorted bundle names without decoding any records"""
+        return [name for name, _, _ in self._bundles]
+    
+    def bundle_counts(self):
+        """Get {bundle: record count} from the bundle table"""
+        return {name: count for name, _, count in self._bundles}
+    
+    def bundle_items(self, bundle):
+        """Decode only the records belonging to one bundle"""
+        i = self._bundle_ids.get(bundle)
+        if i is None:
+            return []
+        _, first, count = self._bundles[i]
+        return [self._record(record_no, bundle) for record_no in range(first, first + count)]
+    
+    def to_dict(self):
+        """Decode the whole index into a regular texture map"""
+        return dict(self.items())
@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+WATCH_INTERVAL = 2.0    # seconds between polls when inotify is unavailable
+SETTLE_TIME = 0.3       # seconds to keep collecting events before applying them
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+def _load_inotify():
+    """Get libc with the inotify calls, or None where inotify is not available"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class IndexWatcher:
+    """Background thread folding adds, removes and renames under the indexed folders into the index"""
+    
+    def __init__(self, locator, interval=WATCH_INTERVAL):
+        self.locator = locator
+        self.interval = interval
+        self.mode = None
+        self._libc = _load_inotify()
+        self._fd = None
+        self._watches = {}  # wd -> directory
+        self._wds = {}      # directory -> wd
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start watching, using inotify when possible and polling otherwise"""
+        self.mode = 'polling'
+        if self._libc:
+            fd = self._libc.inotify_init1(os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                self.mode = 'inotify'
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="IndexWatcher", daemon=True)
+        self._thread.start()
+        
+        print(f"\nWatching '{self.locator.images_dir}' and '{self.locator.raw_dir}' for changes ({self.mode})\n")
+    
+    def stop(self):
+        """Stop the watcher thread and release inotify"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        self._close_inotify()
+    
+    def _close_inotify(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watches.clear()
+            self._wds.clear()
+    
+    def _apply(self, changed_dirs):
+        """Fold changes into the index and report what happened"""
+        try:
+            added, removed = self.locator.apply_changes(changed_dirs)
+        except Exception as e:
+            print(f"\n[Index watcher] Error updating index: {e}")
+            return
+        
+        if added or removed:
+            print(f"\n[Index watcher] {len(added)} file(s) added, {len(removed)} removed - "
+                  f"{self.locator.count()} decals indexed")
+    
+    def _sync_watches(self):
+        """Watch every indexed directory, dropping watches on ones that went away"""
+        with self.locator.lock:
+            dirs = {d for tree in self.locator.dir_state.values() for d in tree}
+        
+        for d in [d for d in self._wds if d not in dirs]:
+            wd = self._wds.pop(d)
+            self._watches.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+        
+        for d in dirs - self._wds.keys():
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(d), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    print("\n[Index watcher] inotify watch limit reached, falling back to polling")
+                    return False
+                continue
+            self._watches[wd] = d
+            self._wds[d] = wd
+        return True
+    
+    def _read_events(self):
+        """Collect changed directories until events settle, None if the queue overflowed"""
+        changed = set()
+        overflow = False
+        deadline = time.monotonic() + SETTLE_TIME
+        
+        while True:
+            data = os.read(self._fd, 64 * 1024)
+            offset = 0
+            while offset + EVENT.size <= len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size + length
+                
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                path = self._watches.get(wd)
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    if path:
+                        self._wds.pop(path, None)
+                if path:
+                    changed.add(path)
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._fd], [], [], remaining)[0]:
+                break
+        
+        return None if overflow else changed
+    
+    def _run(self):
+        # Catch up with anything changed since the index was last saved
+        self._apply(None)
+        
+        if self.mode == 'inotify' and not self._sync_watches():
+            self._close_inotify()
+            self.mode = 'polling'
+        
+        if self.mode == 'polling':
+            while not self._stop.wait(self.interval):
+                self._apply(None)
+            return
+        
+        while not self._stop.is_set():
+            if not select.select([self._fd], [], [], 0.5)[0]:
+                continue
+            self._apply(self._read_events())
+            if not self._sync_watches():
+                self._close_inotify()
+                self.mode = 'polling'
+                while not self._stop.wait(self.interval):
+                    self._apply(None)
+                return
@@ -1,10 +1,44 @@
 import os
+import numpy as np
 from PIL import Image
 from Modules.config import save_config, DEFAULT_CONFIG
-from Modules.utils import strip_quotes, print_section, print_menu_options, confirm_action, parse_dimensions, is_alpha_mask, get_base_name, read_image_dimensions
+from Modules.utils import strip_quotes, print_section, print_menu_options, confirm_action, parse_dimensions, is_alpha_mask, is_power_of_2
 from Modules.image_gen import generate_alpha_mask, generate_icon
-from Modules.dat_module import read_dat_dimensions, write_dat_dimensions, warn_if_dimension_mismatch
-from Modules.image_conv import convert_image_to_dat
+from Modules.dat_module import read_dat_dimensions, write_dat_dimensions, update_dat_dimensions, warn_if_dimension_mismatch
+from Modules.image_conv import convert_image_to_dat, convert_images_to_dat, resolve_workers
+from Modules.bc7_encoder import BC7_PRESETS
+from Modules.encoders import ENCODERS, available_encoders
+from Modules.bc_decoder import read_texture_dats
+from Modules.conversion_cache import ConversionCache, open_cache
+from Modules.conversion_record import is_up_to_date
+from Modules.conversion_policy import ConversionPolicy
+from Modules.auto_convert import inspect_decal, convert_decal
+
+SEARCH_RESULT_LIMIT = 50
+PREVIEW_DIR = "Previews"
+
+def ask_pow2_mode(images):
+    """Ask once whether images that are not power-of-2 sizes get resized, returning a ConversionPolicy pow2 mode
+    
+    images are (image_path, (width, height) or None) pairs. DDS payloads are copied at their
+    own size and other images are padded to multiples of 4 first, so those padded sizes count.
+    """
+    invalid = []
+    for image_path, size in images:
+        if not size or image_path.lower().endswith('.dds'):
+            continue
+        padded_w, padded_h = ((size[0] + 3) // 4) * 4, ((size[1] + 3) // 4) * 4
+        if not (is_power_of_2(padded_w) and is_power_of_2(padded_h)):
+            invalid.append((padded_w, padded_h))
+    
+    if not invalid:
+        return 'keep'
+    if len(invalid) == 1:
+        padded_w, padded_h = invalid[0]
+        print(f"\nWarning: {padded_w}x{padded_h} is not a power-of-2 size, NFS:HPR may crash or fail to load the decal")
+        return 'nearest' if confirm_action("Resize to nearest power-of-2? (y/n): ") else 'keep'
+    print(f"\nWarning: {len(invalid)} images are not power-of-2 sizes, NFS:HPR may crash or fail to load them")
+    return 'nearest' if confirm_action("Resize them to the nearest power-of-2? (y/n): ") else 'keep'
 
 def auto_convert_decal_menu(locator, config):
     print_section("AUTO CONVERT DECAL")
@@ -16,189 +50,116 @@ def auto_convert_decal_menu(locator, config):
     
     decal_name = input("Enter decal name (eg. TEX_1273719_1273720_DL): ").strip()
     
-    # Find ALL files in the bundle
-    bundle_files = [(img, info) for img, info in locator.texture_map.items() 
-                   if info['bundle'] == decal_name]
+    # Find ALL files in the bundle, by role
+    decal = inspect_decal(locator, image_path, decal_name)
     
-    if not bundle_files:
+    if not decal['files']:
         print(f"\nError: Bundle '{decal_name}' not found in index.\n")
         return
     
-    # Separate files by type
-    main_texture_info = None
-    alpha_mask_info = None
-    icon_info = None
-    
-    for img_name, info in bundle_files:
-        img_dims = read_image_dimensions(info['image_path'])
-        
-        # Check if it's an icon (128x128)
-        if img_dims and img_dims == (128, 128):
-            icon_info = (img_name, info)
-        # Check if it's an alpha mask
-        elif is_alpha_mask(info['image_path']):
-            alpha_mask_info = (img_name, info)
-        # Otherwise it's the main texture
-        else:
-            main_texture_info = (img_name, info)
-    
     # Use the main texture info
-    if not main_texture_info:
+    if not decal['main']:
         print(f"\nError: Could not find main texture in bundle '{decal_name}'")
         print(f"Found files:")
-        for img_name, info in bundle_files:
-            img_dims = read_image_dimensions(info['image_path'])
-            file_type = "Icon (128x128)" if img_dims == (128, 128) else ("Alpha Mask" if is_alpha_mask(info['image_path']) else "Unknown")
+        for img_name, role in decal['files']:
+            file_type = {'icon': "Icon (128x128)", 'alpha': "Alpha Mask"}.get(role, "Unknown")
             print(f"  - {img_name} ({file_type})")
         print()
         return
     
-    decal_info = main_texture_info[1]
+    main_name, decal_info = decal['main']
     
-    print(f"\nFound main texture: {main_texture_info[0]}")
+    print(f"\nFound main texture: {main_name}")
     print(f"Bundle: {decal_info['bundle']}")
-    if alpha_mask_info:
-        print(f"Alpha mask: {alpha_mask_info[0]}")
-    if icon_info:
-        print(f"Icon: {icon_info[0]}")
+    if decal['alpha']:
+        print(f"Alpha mask: {decal['alpha'][0]}")
+    if decal['icon']:
+        print(f"Icon: {decal['icon'][0]}")
     
-    try:
-        img = Image.open(image_path)
-        img_w, img_h = img.size
-        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
-        img.close()
+    if not decal['image_size']:
+        print(f"\nError: Could not read image '{image_path}'\n")
+        return
+    if not decal['dat_size']:
+        print(f"\nError: Could not read decal metadata '{decal_info['dat_path']}'\n")
+        return
         
-        print(f"\nImage size: {img_w}x{img_h}")
+    # Every question is asked here, the conversion itself runs without prompts
+    img_w, img_h = decal['image_size']
+    print(f"\nImage size: {img_w}x{img_h}")
         
-        warnings = []
-        if not has_alpha:
-            warnings.append("Image has no transparency - decal will be fully opaque")
+    if not decal['has_alpha']:
+        print("\nWARNINGS:")
+        print("  - Image has no transparency - decal will be fully opaque")
+            
+        if not confirm_action("\nContinue? (y/n): "):
+            print("\nCancelled.\n")
+            return
         
-        if warnings:
-            print("\nWARNINGS:")
-            for w in warnings:
-                print(f"  - {w}")
+    dat_w, dat_h = decal['dat_size']
+    print(f"\nCurrent decal dimensions: {dat_w}x{dat_h}")
+        
+    update_dimensions = True
+    if (img_w, img_h) != (dat_w, dat_h):
+        print(f"Dimension mismatch detected: Image {img_w}x{img_h} != Decal {dat_w}x{dat_h}")
             
-            if not confirm_action("\nContinue? (y/n): "):
+        update_dimensions = confirm_action("Update decal dimensions to match image? (y/n): ")
+        if not update_dimensions:
+            print("\nWarning: Dimension mismatch will remain - this may cause issues")
+            if not confirm_action("Continue anyway? (y/n): "):
                 print("\nCancelled.\n")
                 return
+    else:
+        print(f"Image dimensions match decal metadata ({img_w}x{img_h})")
         
-        dat_w, dat_h = read_dat_dimensions(decal_info['dat_path'])
-        print(f"\nCurrent decal dimensions: {dat_w}x{dat_h}")
-        
-        need_dimension_change = (img_w, img_h) != (dat_w, dat_h)
+    pow2 = ask_pow2_mode([(image_path, (img_w, img_h))])
         
-        if need_dimension_change:
-            print(f"Dimension mismatch detected: Image {img_w}x{img_h} != Decal {dat_w}x{dat_h}")
-            
-            if confirm_action("Update decal dimensions to match image? (y/n): "):
-                print(f"\nUpdating decal dimensions to {img_w}x{img_h}")
-                if not write_dat_dimensions(decal_info['dat_path'], img_w, img_h):
-                    print("Warning: Failed to update dimensions")
-            else:
-                print("\nWarning: Dimension mismatch will remain - this may cause issues")
-                if not confirm_action("Continue anyway? (y/n): "):
-                    print("\nCancelled.\n")
-                    return
-        else:
-            print(f"Image dimensions match decal metadata ({img_w}x{img_h})")
-        
-        print("\n" + "="*60)
-        print("CONVERTING MAIN TEXTURE")
-        print("="*60)
+    regenerate_alpha = False
+    if decal['alpha']:
+        print(f"\nFound alpha mask: {decal['alpha'][0]}")
+        regenerate_alpha = confirm_action("Regenerate alpha mask from new image? (y/n): ")
+        if not regenerate_alpha:
+            print("Skipping alpha mask regeneration")
+    else:
+        print(f"\nNo alpha mask found in bundle")
         
-        main_texture_dat = os.path.join(
-            os.path.dirname(decal_info['dat_path']), 
-            f"{decal_info['base_name']}_texture.dat"
-        )
+    policy = ConversionPolicy(pow2, update_dat_dimensions=update_dimensions, regenerate_alpha=regenerate_alpha)
         
-        print(f"\nConverting: {os.path.basename(image_path)}")
-        print(f"Target: {main_texture_dat}")
+    try:
+        result = convert_decal(decal, image_path, config, policy)
+    except Exception as e:
+        print(f"\nError during auto conversion: {e}\n")
+        import traceback
+        traceback.print_exc()
+        return
         
-        if not convert_image_to_dat(image_path, main_texture_dat, config['texconv_path']):
-            print("\n✗ Error: Failed to convert main texture")
-            return
+    if not result:
+        print(f"\n✗ Error: {result.error}")
+        return
         
-        print("\n✓ Main texture converted successfully")
+    print("\n✓ Main texture converted successfully")
+    if result.alpha:
+        print("\n✓ Alpha mask converted successfully")
         
-        should_regen_alpha = False
-        if alpha_mask_info:
-            alpha_mask_name, alpha_info = alpha_mask_info
-            print(f"\nFound alpha mask: {alpha_mask_name}")
-            
-            if confirm_action("Regenerate alpha mask from new image? (y/n): "):
-                should_regen_alpha = True
-                print(f"\nRegenerating alpha mask...")
-                
-                final_w, final_h = read_dat_dimensions(decal_info['dat_path'])
-                print(f"Using final main texture dimensions: {final_w}x{final_h}")
-                
-                target_size = (final_w, final_h)
-                output_path, _ = generate_alpha_mask(
-                    image_path, 
-                    os.path.dirname(alpha_info['image_path']), 
-                    target_size, 
-                    config['texconv_path']
-                )
-                
-                # Replace the old alpha mask
-                os.replace(output_path, alpha_info['image_path'])
-                print("Alpha mask replaced successfully")
-                
-                # Update alpha mask dimensions to match main texture
-                write_dat_dimensions(alpha_info['dat_path'], final_w, final_h)
-                print(f"Updated alpha mask metadata to {final_w}x{final_h}")
-            else:
-                print("Skipping alpha mask regeneration")
-                alpha_mask_info = None  # Don't convert it later
-        else:
-            print(f"\nNo alpha mask found in bundle")
-            alpha_mask_info = None
+    print(f"\n{'=' * 60}")
+    print("AUTO CONVERSION COMPLETE")
+    print(f"{'=' * 60}")
+    print(f"Bundle: {decal_name}")
+    print(f"Main texture: {main_name}")
         
-        # Convert alpha mask if it was regenerated
-        if alpha_mask_info:
-            alpha_mask_name, alpha_info = alpha_mask_info
-            
-            print("\n" + "="*60)
-            print("CONVERTING ALPHA MASK")
-            print("="*60)
-            
-            alpha_dat = os.path.join(
-                os.path.dirname(alpha_info['dat_path']), 
-                f"{alpha_info['base_name']}_texture.dat"
-            )
-            
-            print(f"\nConverting: {alpha_mask_name}")
-            print(f"Target: {alpha_dat}")
-            
-            if not convert_image_to_dat(alpha_info['image_path'], alpha_dat, config['texconv_path']):
-                print("\n⚠ Warning: Failed to convert alpha mask")
-            else:
-                print("\n✓ Alpha mask converted successfully")
-        
-        print(f"\n{'=' * 60}")
-        print("AUTO CONVERSION COMPLETE")
-        print(f"{'=' * 60}")
-        print(f"Bundle: {decal_name}")
-        print(f"Main texture: {main_texture_info[0]}")
-        
-        # Show FINAL dimensions from DAT (after any resizing)
-        final_w, final_h = read_dat_dimensions(decal_info['dat_path'])
-        print(f"Final dimensions: {final_w}x{final_h}")
-        
-        if should_regen_alpha:
-            print(f"Alpha mask: Regenerated at {final_w}x{final_h} and converted")
-        elif alpha_mask_info:
-            print(f"Alpha mask: Converted (not regenerated)")
-        else:
-            print(f"Alpha mask: Not found")
+    final_w, final_h = result.dimensions
+    print(f"Final dimensions: {final_w}x{final_h}")
         
-        print(f"{'=' * 60}\n")
+    if result.alpha_regenerated:
+        print(f"Alpha mask: Regenerated at {final_w}x{final_h}" + (" and converted" if result.alpha else ", conversion failed"))
+    elif decal['alpha']:
+        print(f"Alpha mask: Not regenerated")
+    else:
+        print(f"Alpha mask: Not found")
         
-    except Exception as e:
-        print(f"\nError during auto conversion: {e}\n")
-        import traceback
-        traceback.print_exc()
+    for warning in result.warnings:
+        print(f"Warning: {warning}")
+    
+    print(f"{'=' * 60}\n")
 
 def setup_directories_menu(config):
     print_section("DIRECTORY SETUP")
@@ -207,14 +168,24 @@ def setup_directories_menu(config):
     print(f"  Images Directory: {config['images_dir']}")
     print(f"  Raw Directory:    {config['raw_dir']}")
     print(f"  Texconv Path:     {config['texconv_path']}")
+    print(f"  Encoder:          {config['encoder']}")
+    print(f"  BC7 Preset:       {config['bc7_preset']}")
+    print(f"  Scratch Folder:   {config['scratch_dir'] or 'auto'}")
+    print(f"  Cache:            {config['cache_dir']} ({config['cache_size_mb']} MB cap)" if config['cache_size_mb'] else "  Cache:            off")
+    print(f"  Workers:          {config['conversion_workers'] or f'auto ({resolve_workers(0)})'}")
     
     print("\nWhat would you like to configure?")
     print_menu_options([
         "[1] Images Directory (where exported textures are stored)",
         "[2] Raw Directory (where .DAT files are located)",
         "[3] Texconv Path (path to texconv.exe)",
-        "[4] Reset to defaults",
-        "[5] Back to main menu"
+        "[4] Encoder (auto picks the fastest available)",
+        "[5] BC7 Preset (fast or quality, NumPy encoder only)",
+        "[6] Scratch Folder (encoder temp files, blank for auto)",
+        "[7] Conversion Cache (size cap in MB, 0 disables, 'clear' empties it)",
+        "[8] Conversion Workers (processes for bundle conversion, 0 for one per core)",
+        "[9] Reset to defaults",
+        "[10] Back to main menu"
     ])
     
     choice = input("\nChoice: ").strip()
@@ -241,12 +212,60 @@ def setup_directories_menu(config):
             save_config(config)
     
     elif choice == '4':
+        choices = ['auto'] + list(ENCODERS)
+        available = [b.name for b in available_encoders(config['texconv_path'], config['scratch_dir'])]
+        print(f"\nAvailable encoders: {', '.join(available) or 'none'}")
+        new_encoder = input(f"Enter encoder ({'/'.join(choices)}): ").strip().lower()
+        if new_encoder in choices:
+            config['encoder'] = new_encoder
+            print(f"\nEncoder set to: {new_encoder}")
+            save_config(config)
+        elif new_encoder:
+            print(f"\nUnknown encoder, expected one of: {', '.join(choices)}")
+    
+    elif choice == '5':
+        new_preset = input("\nEnter BC7 preset (fast/quality): ").strip().lower()
+        if new_preset in BC7_PRESETS:
+            config['bc7_preset'] = new_preset
+            print(f"\nBC7 preset set to: {new_preset}")
+            save_config(config)
+        elif new_preset:
+            print("\nUnknown preset, expected 'fast' or 'quality'.")
+    
+    elif choice == '6':
+        new_path = strip_quotes(input("\nEnter Scratch Folder path (blank for auto): "))
+        config['scratch_dir'] = new_path
+        print(f"\nScratch Folder set to: {new_path or 'auto'}")
+        save_config(config)
+    
+    elif choice == '7':
+        new_size = input("\nEnter cache size cap in MB (0 disables, 'clear' empties the cache): ").strip().lower()
+        if new_size == 'clear':
+            ConversionCache(config['cache_dir']).clear()
+            print(f"\nCleared {config['cache_dir']}")
+        elif new_size.isdigit():
+            config['cache_size_mb'] = int(new_size)
+            print(f"\nCache size cap set to: {new_size} MB" if int(new_size) else "\nConversion cache disabled")
+            save_config(config)
+        elif new_size:
+            print("\nExpected a number of MB or 'clear'.")
+    
+    elif choice == '8':
+        new_workers = input("\nEnter number of conversion workers (0 for one per core): ").strip()
+        if new_workers.isdigit():
+            config['conversion_workers'] = int(new_workers)
+            print(f"\nConversion workers set to: {int(new_workers) or 'auto'}")
+            save_config(config)
+        elif new_workers:
+            print("\nExpected a number.")
+    
+    elif choice == '9':
         if confirm_action("Reset all settings to defaults? (y/n): "):
             config.update(DEFAULT_CONFIG)
             save_config(config)
             print("\nConfiguration reset to defaults!")
     
-    elif choice == '5':
+    elif choice == '10':
         return
     
     else:
@@ -275,7 +294,7 @@ def icon_generator_menu(config):
         return
     
     try:
-        output_path, filename = generate_icon(input_file, output_dir, config['texconv_path'])
+        output_path, filename = generate_icon(input_file, output_dir, config['texconv_path'], config['encoder'], config['scratch_dir'])
         print(f"\nGenerated Icon for {filename}.\nSaved to: {output_path}\n")
     except Exception as e:
         print(f"\nError generating icon: {e}\n")
@@ -306,7 +325,7 @@ def alpha_mask_menu(config):
         return
     
     try:
-        output_path, filename = generate_alpha_mask(input_file, output_dir, target_size, config['texconv_path'])
+        output_path, filename = generate_alpha_mask(input_file, output_dir, target_size, config['texconv_path'], config['encoder'], config['scratch_dir'])
         print(f"\nGenerated Alpha Mask for {filename}.")
         if target_size:
             print(f"Resized to: {target_size[0]}x{target_size[1]}")
@@ -356,7 +375,7 @@ def regenerate_alpha_mask_menu(config):
         print(f"Target size set to: {target_size[0]}x{target_size[1]}")
     
     try:
-        output_path, filename = generate_alpha_mask(input_file, os.path.dirname(input_file), target_size, config['texconv_path'])
+        output_path, filename = generate_alpha_mask(input_file, os.path.dirname(input_file), target_size, config['texconv_path'], config['encoder'], config['scratch_dir'])
         os.replace(output_path, alpha_mask_file)
         
         print(f"\nRegenerated Alpha Mask for {filename}.")
@@ -372,8 +391,10 @@ def decal_locator_menu(locator):
         print_menu_options([
             "[1] Find .DAT file for an image",
             "[2] Search decals",
-            "[3] Rebuild index",
-            "[4] Back to main menu"
+            "[3] Refresh index (changed folders only)",
+            "[4] Rebuild index (full rescan)",
+            f"[5] Watch folders for changes ({'ON' if locator.watcher else 'OFF'})",
+            "[6] Back to main menu"
         ])
         
         choice = input("\nChoice: ").strip()
@@ -392,7 +413,7 @@ def decal_locator_menu(locator):
         
         elif choice == '2':
             query = input("\nEnter search query: ").strip()
-            results = locator.search(query)
+            results = locator.search(query, limit=SEARCH_RESULT_LIMIT)
             
             if results:
                 print(f"\n{'=' * 60}\n  {len(results)} RESULT(S) FOUND\n{'=' * 60}\n")
@@ -400,22 +421,34 @@ def decal_locator_menu(locator):
                     print(f"  [{i}] {img}")
                     print(f"      DAT: {info['dat_path']}")
                     print(f"      Bundle: {info['bundle']}\n")
+                if len(results) == SEARCH_RESULT_LIMIT:
+                    print(f"  Showing the best {SEARCH_RESULT_LIMIT} matches, refine the query to narrow it down.\n")
             else:
                 print(f"\nNo results found for '{query}'\n")
         
         elif choice == '3':
-            locator.build_index()
+            locator.refresh_index()
         
         elif choice == '4':
+            locator.build_index()
+        
+        elif choice == '5':
+            if locator.watcher:
+                locator.stop_watching()
+                print("\nStopped watching folders.\n")
+            else:
+                locator.start_watching()
+        
+        elif choice == '6':
             break
         
         else:
-            print("\nInvalid choice. Please enter 1-4.\n")
+            print("\nInvalid choice. Please enter 1-6.\n")
 
 def change_decal_dimensions_menu(locator):
     print_section("CHANGE DECAL DIMENSIONS")
     
-    if not locator.texture_map:
+    if not locator.count():
         print("Error: No texture mappings found. Please rebuild index first.\n")
         return
     
@@ -443,12 +476,7 @@ def change_decal_dimensions_menu(locator):
             bundle_name = parts[0] if len(parts) > 1 else None
             filename = parts[-1]
             
-            for img, img_info in locator.texture_map.items():
-                if bundle_name and img_info['bundle'] != bundle_name:
-                    continue
-                if img.lower() == filename.lower() or img_info['base_name'].lower() == get_base_name(filename).lower():
-                    info = img_info
-                    break
+            info = locator.find_file(filename, bundle_name)
         
         if not info or not os.path.exists(info['dat_path']):
             print(f"\nError: Could not find mapping for '{file_input}'\n")
@@ -493,10 +521,10 @@ def change_decal_dimensions_menu(locator):
             print("\nNo bundles found.\n")
             return
         
+        counts = locator.get_bundle_counts()
         print(f"\nAvailable bundles ({len(bundles)}):\n")
         for i, bundle in enumerate(bundles, 1):
-            count = sum(1 for info in locator.texture_map.values() if info['bundle'] == bundle)
-            print(f"  [{i}] {bundle} ({count} files)")
+            print(f"  [{i}] {bundle} ({counts.get(bundle, 0)} files)")
         
         bundle_input = input("\nEnter bundle name or number: ").strip()
         selected = locator.select_bundle(bundle_input, bundles)
@@ -505,7 +533,7 @@ def change_decal_dimensions_menu(locator):
             print(f"\nError: Bundle '{bundle_input}' not found.\n")
             return
         
-        files = [(img, info) for img, info in locator.texture_map.items() if info['bundle'] == selected]
+        files = locator.get_bundle_files(selected)
         
         icon_files = []
         valid_files = []
@@ -514,11 +542,12 @@ def change_decal_dimensions_menu(locator):
             if not os.path.exists(info['dat_path']):
                 continue
             
-            img_dims = read_image_dimensions(info['image_path'])
-            if img_dims and img_dims == (128, 128):
+            probe = locator.probe(info['image_path'])
+            if probe and probe['role'] == 'icon':
                 icon_files.append(img)
             else:
                 valid_files.append((img, info))
+        locator.save_probes()
         
         print(f"\nBundle: {selected}")
         print(f"Files to modify: {len(valid_files)}")
@@ -543,18 +572,20 @@ def change_decal_dimensions_menu(locator):
         
         changed, skipped, errors = 0, 0, 0
         
-        for image_name, info in valid_files:
-            try:
-                curr_w, curr_h = read_dat_dimensions(info['dat_path'])
-                print(f"Changing {image_name}: {curr_w}x{curr_h} -> {new_w}x{new_h}")
-                
-                if write_dat_dimensions(info['dat_path'], new_w, new_h):
-                    changed += 1
-                else:
-                    errors += 1
-            except Exception as e:
-                print(f"  Error: {e}")
+        # Each DAT is opened once, reading the old size and writing the new one together
+        results = update_dat_dimensions([info['dat_path'] for _, info in valid_files], new_w, new_h)
+        
+        for (image_name, _), (dat_path, previous, error) in zip(valid_files, results):
+            if error:
+                print(f"Changing {image_name} -> {new_w}x{new_h}")
+                print(f"  Error: {error}")
                 errors += 1
+                continue
+            
+            curr_w, curr_h = previous
+            print(f"Changing {image_name}: {curr_w}x{curr_h} -> {new_w}x{new_h}")
+            print(f"       Updated: {dat_path}")
+            changed += 1
         
         if icon_files:
             print(f"\nSkipped {len(icon_files)} icon files (128x128 images)")
@@ -568,7 +599,7 @@ def change_decal_dimensions_menu(locator):
 def convert_images_to_dat_menu(locator, config):
     print_section("CONVERT IMAGES TO DAT")
 
-    if not locator.texture_map:
+    if not locator.count():
         print("Error: No texture mappings found. Please rebuild index first.\n")
         return
 
@@ -598,13 +629,7 @@ def convert_images_to_dat_menu(locator, config):
             bundle_name = parts[0] if len(parts) > 1 else None
             filename = parts[-1]
 
-            for img, img_info in locator.texture_map.items():
-                if bundle_name and img_info['bundle'] != bundle_name:
-                    continue
-                if img.lower() == filename.lower() or \
-                   img_info['base_name'].lower() == get_base_name(filename).lower():
-                    info = img_info
-                    break
+            info = locator.find_file(filename, bundle_name)
 
         if not info or not os.path.exists(info['image_path']):
             print(f"\nError: Could not find mapping for '{file_input}'\n")
@@ -613,7 +638,9 @@ def convert_images_to_dat_menu(locator, config):
         dat_dir = os.path.dirname(info['dat_path'])
         texture_dat = os.path.join(dat_dir, f"{info['base_name']}_texture.dat")
 
-        file_type = "Alpha Mask" if is_alpha_mask(info['image_path']) else "Texture"
+        probe = locator.probe(info['image_path'])
+        locator.save_probes()
+        file_type = "Alpha Mask" if probe and probe['role'] == 'alpha' else "Texture"
 
         print(f"\nFound: {os.path.basename(info['image_path'])} ({file_type})")
         print(f"Bundle: {info['bundle']}")
@@ -621,7 +648,8 @@ def convert_images_to_dat_menu(locator, config):
 
         warnings = warn_if_dimension_mismatch(
             info['image_path'],
-            info['dat_path']
+            info['dat_path'],
+            probe['size'] if probe else None
         )
 
         if warnings:
@@ -633,7 +661,9 @@ def convert_images_to_dat_menu(locator, config):
                 print("\nSkipped.\n")
                 return
 
-        if convert_image_to_dat(info['image_path'], texture_dat, config['texconv_path']):
+        policy = ConversionPolicy(ask_pow2_mode([(info['image_path'], probe['size'] if probe else None)]))
+        if convert_image_to_dat(info['image_path'], texture_dat, config['texconv_path'], config['encoder'], config['bc7_preset'], config['scratch_dir'], open_cache(config),
+                                policy):
             print("\nConversion successful!\n")
         else:
             print("\nConversion failed!\n")
@@ -647,11 +677,10 @@ def convert_images_to_dat_menu(locator, config):
                 print("\nNo bundles found.\n")
                 return
 
+            counts = locator.get_bundle_counts()
             print(f"\nAvailable bundles ({len(bundles)}):\n")
             for i, bundle in enumerate(bundles, 1):
-                count = sum(1 for info in locator.texture_map.values()
-                            if info['bundle'] == bundle)
-                print(f"  [{i}] {bundle} ({count} images)")
+                print(f"  [{i}] {bundle} ({counts.get(bundle, 0)} images)")
 
             bundle_input = input("\nEnter bundle name or number: ").strip()
             selected = locator.select_bundle(bundle_input, bundles)
@@ -660,33 +689,30 @@ def convert_images_to_dat_menu(locator, config):
                 print(f"\nError: Bundle '{bundle_input}' not found.\n")
                 return
 
-            images_to_convert = [
-                (img, info) for img, info in locator.texture_map.items()
-                if info['bundle'] == selected
-            ]
+            images_to_convert = locator.get_bundle_files(selected)
         else:
             print("\nThis will convert ALL images in EVERY bundle to their")
             print("corresponding _texture.dat files.")
 
-            images_to_convert = list(locator.texture_map.items())
+            images_to_convert = locator.items()
 
         if not confirm_action():
             print("\nCancelled.\n")
             return
 
+        # Only images edited since their _texture.dat was last written, per its conversion record
+        only_changed = confirm_action("Convert only images changed since their last conversion? (y/n): ")
+
         bundles_to_check = {}
         for image_name, info in images_to_convert:
             bundle = info['bundle']
             if bundle not in bundles_to_check:
                 bundles_to_check[bundle] = {'texture': False, 'alpha': False, 'icon': False}
             
-            img_dims = read_image_dimensions(info['image_path'])
-            if img_dims and img_dims == (128, 128):
-                bundles_to_check[bundle]['icon'] = True
-            elif is_alpha_mask(info['image_path']):
-                bundles_to_check[bundle]['alpha'] = True
-            else:
-                bundles_to_check[bundle]['texture'] = True
+            probe = locator.probe(info['image_path'])
+            role = probe['role'] if probe else 'main'
+            bundles_to_check[bundle]['texture' if role == 'main' else role] = True
+        locator.save_probes()
 
         # Check for missing textures
         missing_texture_bundles = [b for b, files in bundles_to_check.items() 
@@ -702,18 +728,16 @@ def convert_images_to_dat_menu(locator, config):
             
             print(f"\nAttempting to rebuild index to find missing textures...")
             
-            # Rebuild index
-            old_count = len(locator.texture_map)
-            locator.build_index()
-            new_count = len(locator.texture_map)
+            # Refresh index
+            old_count = locator.count()
+            locator.refresh_index()
+            new_count = locator.count()
             
             print(f"\nIndex rebuilt: {old_count} → {new_count} mappings")
             
             # Re-check after rebuild
-            images_to_convert = list(locator.texture_map.items()) if choice == '3' else [
-                (img, info) for img, info in locator.texture_map.items()
-                if info['bundle'] == selected
-            ]
+            images_to_convert = locator.items() if choice == '3' else \
+                locator.get_bundle_files(selected)
             
             bundles_to_check = {}
             for image_name, info in images_to_convert:
@@ -721,13 +745,10 @@ def convert_images_to_dat_menu(locator, config):
                 if bundle not in bundles_to_check:
                     bundles_to_check[bundle] = {'texture': False, 'alpha': False, 'icon': False}
                 
-                img_dims = read_image_dimensions(info['image_path'])
-                if img_dims and img_dims == (128, 128):
-                    bundles_to_check[bundle]['icon'] = True
-                elif is_alpha_mask(info['image_path']):
-                    bundles_to_check[bundle]['alpha'] = True
-                else:
-                    bundles_to_check[bundle]['texture'] = True
+                probe = locator.probe(info['image_path'])
+                role = probe['role'] if probe else 'main'
+                bundles_to_check[bundle]['texture' if role == 'main' else role] = True
+            locator.save_probes()
             
             still_missing = [b for b, files in bundles_to_check.items() 
                            if not files['texture'] and (files['alpha'] or files['icon'])]
@@ -757,7 +778,10 @@ def convert_images_to_dat_menu(locator, config):
             else:
                 print(f"\n✓ All textures found after rebuild!")
 
-        converted, skipped, errors = 0, 0, 0
+        skipped = 0
+        up_to_date = 0
+        sizes = []
+        jobs = []
 
         for image_name, info in images_to_convert:
             if not os.path.exists(info['image_path']):
@@ -766,8 +790,8 @@ def convert_images_to_dat_menu(locator, config):
                 continue
 
             # Check if this is an icon (128x128) - skip it
-            img_dims = read_image_dimensions(info['image_path'])
-            if img_dims and img_dims == (128, 128):
+            probe = locator.probe(info['image_path'])
+            if probe and probe['role'] == 'icon':
                 print(f"\nSkipping icon: {image_name} (128x128)")
                 skipped += 1
                 continue
@@ -775,12 +799,17 @@ def convert_images_to_dat_menu(locator, config):
             dat_dir = os.path.dirname(info['dat_path'])
             texture_dat = os.path.join(dat_dir, f"{info['base_name']}_texture.dat")
 
-            file_type = "Alpha" if is_alpha_mask(info['image_path']) else "Texture"
-            print(f"\nConverting [{file_type}]: {image_name}")
+            if only_changed and is_up_to_date(info['image_path'], texture_dat, config['stale_check_hash']):
+                up_to_date += 1
+                continue
+
+            file_type = "Alpha" if probe and probe['role'] == 'alpha' else "Texture"
+            print(f"\nQueued [{file_type}]: {image_name}")
 
             warnings = warn_if_dimension_mismatch(
                 info['image_path'],
-                info['dat_path']
+                info['dat_path'],
+                probe['size'] if probe else None
             )
 
             if warnings:
@@ -788,16 +817,103 @@ def convert_images_to_dat_menu(locator, config):
                 for w in warnings:
                     print(f"    - {w}")
 
-            if convert_image_to_dat(info['image_path'], texture_dat, config['texconv_path']):
-                converted += 1
-            else:
-                errors += 1
+            sizes.append((info['image_path'], probe['size'] if probe else None))
+            jobs.append((info['image_path'], texture_dat))
+
+        locator.save_probes()
+
+        if only_changed:
+            print(f"\n{up_to_date} image(s) already up to date")
+        # Conversion never prompts, so the power-of-2 question is asked once for the whole run
+        workers = min(resolve_workers(config['conversion_workers']), len(jobs) or 1)
+        policy = ConversionPolicy(ask_pow2_mode(sizes))
+
+        print(f"\nConverting {len(jobs)} image(s)" + (f" with {workers} workers..." if workers > 1 else "..."))
+        cache = open_cache(config)
+        results = convert_images_to_dat(jobs, config['texconv_path'], config['encoder'], config['bc7_preset'], config['scratch_dir'], cache,
+                                        workers, policy)
+        converted = sum(1 for r in results if r)
+        errors = len(results) - converted
 
         print(f"\n{'=' * 60}\nSUMMARY\n{'=' * 60}")
         print(f"Images converted: {converted}")
+        if cache:
+            print(f"  from cache:     {cache.hits}")
+        if only_changed:
+            print(f"Up to date:       {up_to_date}")
         print(f"Images skipped:   {skipped}")
         print(f"Errors:           {errors}")
+        for result in results:
+            if not result:
+                print(f"  - {os.path.basename(result.image_path)}: {result.error}")
         print(f"{'=' * 60}\n")
 
     else:
         print("\nInvalid choice.\n")
+
+def preview_bundle_dats_menu(locator):
+    print_section("PREVIEW & VERIFY BUNDLE DATS")
+    
+    bundles = locator.get_bundles()
+    if not bundles:
+        print("No bundles found.\n")
+        return
+    
+    counts = locator.get_bundle_counts()
+    print(f"Available bundles ({len(bundles)}):\n")
+    for i, bundle in enumerate(bundles, 1):
+        print(f"  [{i}] {bundle} ({counts.get(bundle, 0)} files)")
+    
+    bundle_input = input("\nEnter bundle name or number: ").strip()
+    selected = locator.select_bundle(bundle_input, bundles)
+    
+    if not selected:
+        print(f"\nError: Bundle '{bundle_input}' not found.\n")
+        return
+    
+    files = []
+    for image_name, info in locator.get_bundle_files(selected):
+        texture_dat = os.path.join(os.path.dirname(info['dat_path']), f"{info['base_name']}_texture.dat")
+        if os.path.exists(texture_dat):
+            files.append((image_name, info, texture_dat))
+    
+    if not files:
+        print(f"\nNo _texture.dat files found for bundle '{selected}'.\n")
+        return
+    
+    # Every DAT in the bundle is decoded in one batch
+    print(f"\nDecoding {len(files)} texture(s)...")
+    decoded = read_texture_dats([texture_dat for _, _, texture_dat in files])
+    
+    output_dir = os.path.join(PREVIEW_DIR, selected)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    written, failed = 0, 0
+    for (image_name, info, texture_dat), pixels in zip(files, decoded):
+        if pixels is None:
+            print(f"\n  {image_name}: could not decode {os.path.basename(texture_dat)}")
+            failed += 1
+            continue
+        
+        height, width = pixels.shape[:2]
+        preview_path = os.path.join(output_dir, f"{info['base_name']}.png")
+        Image.fromarray(pixels, 'RGBA').save(preview_path)
+        written += 1
+        
+        # Compare against the source image when the sizes line up
+        note = ""
+        try:
+            with Image.open(info['image_path']) as source:
+                if source.size == (width, height):
+                    diff = np.abs(np.asarray(source.convert('RGB'), dtype=np.int16) - pixels[..., :3])
+                    note = f", mean error {diff.mean():.2f}, max {diff.max()}"
+                else:
+                    note = f", source is {source.size[0]}x{source.size[1]}"
+        except Exception:
+            note = ", source image unreadable"
+        
+        print(f"\n  {image_name}: {width}x{height}{note}")
+    
+    print(f"\n{'=' * 60}\nSUMMARY\n{'=' * 60}")
+    print(f"Previews written: {written}\nFailed to decode: {failed}")
+    print(f"Folder: {output_dir}\n{'=' * 60}\n")
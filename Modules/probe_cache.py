@@ -0,0 +1,79 @@
+import os
+import json
+from PIL import Image
+from Modules.utils import is_alpha_mask
+
+ICON_SIZE = (128, 128)
+
+def probe_image(image_path):
+    """Read dimensions, mode and alpha info of an image and classify it as icon, alpha or main"""
+    size, mode, has_alpha = None, None, False
+    try:
+        with Image.open(image_path) as img:
+            size = img.size
+            mode = img.mode
+            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    except Exception:
+        pass
+    
+    if size == ICON_SIZE:
+        role = 'icon'
+    elif is_alpha_mask(image_path):
+        role = 'alpha'
+    else:
+        role = 'main'
+    
+    return {'size': size, 'mode': mode, 'has_alpha': has_alpha, 'role': role}
+
+class ProbeCache:
+    """Image probe results keyed by path, reused while the file size and mtime are unchanged"""
+    
+    def __init__(self, cache_file="decal_probe_cache.json"):
+        self.cache_file = cache_file
+        self.entries = {}
+        self.dirty = False
+    
+    def load(self):
+        """Load cached probes from disk"""
+        try:
+            with open(self.cache_file, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.dirty = False
+    
+    def save(self):
+        """Write cached probes to disk if anything changed"""
+        if not self.dirty:
+            return
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(self.entries, f)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save probe cache: {e}")
+    
+    def prune(self, image_paths):
+        """Forget probes for images that are no longer indexed"""
+        keep = set(image_paths)
+        for path in [p for p in self.entries if p not in keep]:
+            del self.entries[path]
+            self.dirty = True
+    
+    def probe(self, image_path):
+        """Get the probe for an image, only opening it when the file changed"""
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        
+        cached = self.entries.get(image_path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            _, _, size, mode, has_alpha, role = cached
+            return {'size': tuple(size) if size else None, 'mode': mode, 'has_alpha': has_alpha, 'role': role}
+        
+        result = probe_image(image_path)
+        self.entries[image_path] = [st.st_size, st.st_mtime_ns, result['size'], result['mode'],
+                                    result['has_alpha'], result['role']]
+        self.dirty = True
+        return result
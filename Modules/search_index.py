@@ -0,0 +1,77 @@
+GRAM_SIZE = 3
+
+def _grams(text):
+    """Get the set of trigrams in a lowercase string"""
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+class TrigramIndex:
+    """Substring index mapping trigrams to the keys whose names contain them"""
+    
+    def __init__(self):
+        self._postings = {}
+        self._names = {}
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def add(self, key, *names):
+        """Index a key under one or more names"""
+        if key in self._names:
+            self.remove(key)
+        names = tuple(n.lower() for n in names)
+        self._names[key] = names
+        for name in names:
+            for gram in _grams(name):
+                self._postings.setdefault(gram, set()).add(key)
+    
+    def remove(self, key):
+        """Drop a key from the index"""
+        names = self._names.pop(key, None)
+        if not names:
+            return
+        for name in names:
+            for gram in _grams(name):
+                keys = self._postings.get(gram)
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        del self._postings[gram]
+    
+    def _candidates(self, q):
+        """Get keys that contain every trigram of the query"""
+        if len(q) < GRAM_SIZE:
+            # Too short to have a trigram, only the names themselves are left to check
+            return self._names.keys()
+        
+        postings = []
+        for gram in _grams(q):
+            keys = self._postings.get(gram)
+            if not keys:
+                return ()
+            postings.append(keys)
+        postings.sort(key=len)
+        
+        result = set(postings[0])
+        for keys in postings[1:]:
+            result &= keys
+            if not result:
+                break
+        return result
+    
+    def search(self, query):
+        """Get {key: rank} for keys with a name containing query (0 exact, 1 prefix, 2 substring)"""
+        q = query.lower()
+        matches = {}
+        for key in self._candidates(q):
+            rank = None
+            for name in self._names[key]:
+                if name == q:
+                    rank = 0
+                    break
+                if name.startswith(q):
+                    rank = 1
+                elif q in name and rank is None:
+                    rank = 2
+            if rank is not None:
+                matches[key] = rank
+        return matches
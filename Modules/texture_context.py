@@ -0,0 +1,69 @@
+import numpy as np
+from PIL import Image
+from Modules.utils import alpha_mask_sample_points, looks_like_alpha_mask
+from Modules.probe_cache import ICON_SIZE
+
+class TextureContext:
+    """A source image decoded once, with what every conversion stage needs to know about it
+    
+    pixels is an (h, w, 3 or 4) uint8 array, 4 channels when the source has alpha.
+    Classification, power-of-2 resizing, padding, alpha mask generation and encoding
+    all work from it. Resizing and padding replace it, so later stages see the final image.
+    """
+    
+    def __init__(self, image_path, pixels, has_alpha, role=None):
+        self.image_path = image_path
+        self.pixels = pixels
+        self.has_alpha = has_alpha
+        
+        # Same samples and test as is_alpha_mask, taken from the decoded array
+        points = alpha_mask_sample_points(self.width, self.height)
+        self.is_alpha_mask = looks_like_alpha_mask([tuple(pixels[y, x, :3]) for x, y in points])
+        
+        if role is None:
+            role = 'icon' if self.size == ICON_SIZE else 'alpha' if self.is_alpha_mask else 'main'
+        self.role = role
+    
+    @classmethod
+    def load(cls, image_path, role=None):
+        """Decode an image file, keeping a role already known from a probe"""
+        with Image.open(image_path) as img:
+            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            mode = 'RGBA' if has_alpha else 'RGB'
+            pixels = np.asarray(img if img.mode == mode else img.convert(mode))
+        return cls(image_path, pixels, has_alpha, role)
+    
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+    
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+    
+    @property
+    def size(self):
+        return self.width, self.height
+    
+    def resize(self, width, height):
+        """Resample the pixels to a new size"""
+        img = Image.fromarray(self.pixels, 'RGBA' if self.pixels.shape[2] == 4 else 'RGB')
+        self.pixels = np.asarray(img.resize((width, height), Image.LANCZOS))
+    
+    def pad(self, width, height):
+        """Extend the pixels to a new size from the top-left, transparent black where there is alpha"""
+        padded = np.zeros((height, width, self.pixels.shape[2]), dtype=np.uint8)
+        padded[:self.height, :self.width] = self.pixels
+        self.pixels = padded
+    
+    def alpha(self):
+        """Get the (h, w) alpha channel, opaque when the source has none"""
+        if self.pixels.shape[2] == 4:
+            return self.pixels[:, :, 3]
+        return np.full((self.height, self.width), 255, dtype=np.uint8)
+    
+    def encoder_pixels(self, format_type):
+        """Get the pixels to encode in a format, dropping alpha where the format or role has no use for it"""
+        if format_type == 'BC1_UNORM' or self.is_alpha_mask:
+            return self.pixels[:, :, :3]
+        return self.pixels
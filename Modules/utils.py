@@ -1,5 +1,9 @@
 import os
 from PIL import Image
+from Modules.dds_module import sample_dds_pixels
+
+# Pixels checked by is_alpha_mask as (x, y) fractions of the size, centre first
+ALPHA_MASK_SAMPLES = [((1, 2), (1, 2)), ((1, 4), (1, 2)), ((3, 4), (1, 2)), ((1, 2), (1, 4)), ((1, 2), (3, 8))]
 
 def strip_quotes(s):
     """Remove surrounding quotes and whitespace"""
@@ -58,12 +62,45 @@ def previous_power_of_2(n):
     import math
     return 2 ** math.floor(math.log2(n))
 
+def alpha_mask_sample_points(w, h):
+    """Get the pixels is_alpha_mask looks at, all at or above the centre row"""
+    return [(w * xn // xd, h * yn // yd) for (xn, xd), (yn, yd) in ALPHA_MASK_SAMPLES]
+
+def looks_like_alpha_mask(samples):
+    """Check whether most sampled (r, g, b) pixels are the cyan/blue of an alpha mask"""
+    hits = sum(1 for r, g, b in samples if r < 50 and b > 200)
+    return hits * 2 > len(samples)
+
 def is_alpha_mask(image_path):
-    """Check if an image is an alpha mask by its color content"""
+    """Check if an image is an alpha mask by its color content around the centre
+    
+    Avoids a full decode: DDS only decodes the sampled blocks, JPEG decodes at 1/8
+    scale and PNG stops after the centre row. Most samples must be cyan/blue.
+    """
     try:
-        img = Image.open(image_path).convert('RGB')
-        w, h = img.size
-        r, g, b = img.getpixel((w // 2, h // 2))[:3]
-        return r < 50 and b > 200
+        pixels = None
+        if image_path.lower().endswith('.dds'):
+            pixels = sample_dds_pixels(image_path, alpha_mask_sample_points)
+        
+        if pixels is None:
+            with Image.open(image_path) as img:
+                w, h = img.size
+                points = alpha_mask_sample_points(w, h)
+                
+                if img.format == 'JPEG':
+                    img.draft('RGB', ((w + 7) // 8, (h + 7) // 8))
+                    sw, sh = img.size
+                    points = [(x * sw // w, y * sh // h) for x, y in points]
+                elif img.format == 'PNG' and len(img.tile) == 1 and not img.info.get('interlace'):
+                    # Rows are decoded top to bottom, so stop after the lowest sampled row
+                    decoder, _, offset, args = img.tile[0]
+                    rows = max(y for _, y in points) + 1
+                    img.tile = [(decoder, (0, 0, w, rows), offset, args)]
+                    img._size = (w, rows)
+                
+                rgb = img.convert('RGB')
+                pixels = [rgb.getpixel(p) for p in points]
+        
+        return looks_like_alpha_mask(pixels)
     except:
         return False
@@ -1,6 +1,7 @@
 from Modules.config import load_config, VERSION
 from Modules.utils import print_menu_options
 from Modules.decal_locator import DecalLocator
+import packer
 from Modules.menu import (
     alpha_mask_menu,
     regenerate_alpha_mask_menu,
@@ -9,12 +10,13 @@ from Modules.menu import (
     convert_images_to_dat_menu,
     decal_locator_menu,
     setup_directories_menu,
-    auto_convert_decal_menu
+    auto_convert_decal_menu,
+    preview_bundle_dats_menu
 )
 
 def main():
     config = load_config()
-    locator = DecalLocator(config['images_dir'], config['raw_dir'])
+    locator = DecalLocator(config['images_dir'], config['raw_dir'], config['index_format'])
     
     print(f"\n{'=' * 60}\n{'NFS:HPR DECAL MODDING TOOL':^60}\n{'@AkaSokuro':^60}\n{'=' * 60}")
     print(f"\nVersion: {VERSION}")
@@ -23,14 +25,17 @@ def main():
         print("\nNo index found. Building decal index...\n")
         locator.build_index()
     else:
-        print(f"\nDecal index loaded! {len(locator.texture_map)} decals indexed.\n")
+        print(f"\nDecal index loaded! {locator.count()} decals indexed.\n")
         
-    if len(locator.texture_map) <= 0:
+    if locator.count() <= 0:
         print("\nNOTICE:")
         print("No index is founded, make sure you have both textures and scripts in the same folder.")
         print("You can also configure custom directories in the setup menu.")
         print("Try rebuild decal index once you set it up.")
     
+    if config['watch_index']:
+        locator.start_watching()
+    
     menu_options = [
         "",
         "[ AUTOMATION ]",
@@ -47,8 +52,10 @@ def main():
         "",
         "[ TOOLS & UTILITIES ]",
         "[7] Decal Locator (Search & Find)",
-        "[8] Rebuild Decal Index",
+        "[8] Refresh Decal Index",
         "[9] Directory Setup",
+        "[10] Pack Decal Bundle (BIN)",
+        "[11] Preview & Verify Bundle DATs",
         "",
         "[0] Exit",
         ""
@@ -73,14 +80,24 @@ def main():
         elif choice == '7':
             decal_locator_menu(locator)
         elif choice == '8':
-            locator.build_index()
+            locator.refresh_index()
         elif choice == '9':
             setup_directories_menu(config)
-            locator = DecalLocator(config['images_dir'], config['raw_dir'])
+            watching = locator.watcher is not None
+            locator.stop_watching()
+            locator = DecalLocator(config['images_dir'], config['raw_dir'], config['index_format'])
+            if watching:
+                locator.load_index()
+                locator.start_watching()
+        elif choice == '10':
+            packer.main(locator)
+        elif choice == '11':
+            preview_bundle_dats_menu(locator)
         elif choice == '0':
+            locator.stop_watching()
             break
         else:
-            print("\nInvalid choice. Please enter 0-9.\n")
+            print("\nInvalid choice. Please enter 0-11.\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,29 +1,31 @@
 import os
-import json
 import struct
 import zlib
 import math
+from Modules.config import load_config
+from Modules.decal_locator import DecalLocator
 
-def load_index():
-    """Load the decal index"""
-    if not os.path.exists("decal_index.json"):
-        print("\nError: decal_index.json not found!")
+def load_index(locator=None):
+    """Get a DecalLocator with the decal index loaded, reusing one that already is"""
+    if locator is not None and locator.count():
+        return locator
+    
+    if locator is None:
+        config = load_config()
+        locator = DecalLocator(config['images_dir'], config['raw_dir'], config['index_format'])
+    
+    if not locator.load_index():
+        print("\nError: Decal index not found!")
         print("Building index now...")
         
         try:
-            from decal_tool import DecalLocator
-            locator = DecalLocator()
             locator.build_index()
-            
-            with open("decal_index.json", 'r') as f:
-                return json.load(f)
         except Exception as e:
             print(f"\nCould not build index: {e}")
             print("Please run the main NFS:HPR Decal Modding Tool first to build the index.")
             return None
     
-    with open("decal_index.json", 'r') as f:
-        return json.load(f)
+    return locator if locator.count() else None
 
 def find_bundle_by_name(bundle_name, raw_dir="Raw"):
     """Find bundle folder by name"""
@@ -32,12 +34,10 @@ def find_bundle_by_name(bundle_name, raw_dir="Raw"):
         return bundle_path
     return None
 
-def find_bundle_by_decal_id(decal_id, texture_map):
+def find_bundle_by_decal_id(decal_id, locator):
     """Find bundle by decal ID (e.g., 8A_EA_7D_70)"""
-    for image_name, info in texture_map.items():
-        if decal_id.upper() in info['base_name'].upper():
-            return info['bundle']
-    return None
+    info = locator.find_decal_id(decal_id)
+    return info['bundle'] if info else None
 
 def find_ids_file(bundle_folder):
     """Find IDs.BIN or IDs_*.BIN in bundle folder"""
@@ -365,16 +365,23 @@ def get_nibbles_for_type_hpr(type_id):
     }
     return nibble_map.get(type_id, [0x40000000, 0x0, 0x0, 0x0])
 
-def main():
+def main(locator=None):
+    """Run the packer, reusing the caller's loaded index when given one"""
+    standalone = locator is None
+    
+    def pause():
+        if standalone:
+            input("\nPress Enter to exit...")
+    
     print("\n" + "=" * 60)
     print("        NFS:HPR DECAL PACKER")
     print("=" * 60 + "\n")
     
     # Load index
     print("Loading decal index...")
-    texture_map = load_index()
-    if not texture_map:
-        input("\nPress Enter to exit...")
+    locator = load_index(locator)
+    if not locator:
+        pause()
         return
     
     # Get input
@@ -384,19 +391,19 @@ def main():
     
     # Find bundle
     if decal_input.startswith("TEX_") or len(decal_input.split('_')) >= 3:
-        bundle_folder = find_bundle_by_name(decal_input)
+        bundle_folder = find_bundle_by_name(decal_input, locator.raw_dir)
         if not bundle_folder:
-            bundle_name = find_bundle_by_decal_id(decal_input, texture_map)
+            bundle_name = find_bundle_by_decal_id(decal_input, locator)
             if bundle_name:
-                bundle_folder = find_bundle_by_name(bundle_name)
+                bundle_folder = find_bundle_by_name(bundle_name, locator.raw_dir)
     else:
-        bundle_name = find_bundle_by_decal_id(decal_input, texture_map)
+        bundle_name = find_bundle_by_decal_id(decal_input, locator)
         if bundle_name:
-            bundle_folder = find_bundle_by_name(bundle_name)
+            bundle_folder = find_bundle_by_name(bundle_name, locator.raw_dir)
     
     if not bundle_folder:
         print(f"\nError: Could not find bundle for '{decal_input}'")
-        input("\nPress Enter to exit...")
+        pause()
         return
     
     print(f"\nFound bundle: {os.path.basename(bundle_folder)}")
@@ -404,7 +411,7 @@ def main():
     confirm = input("\nProceed with packing? (y/n): ").strip().lower()
     if confirm != 'y':
         print("\nCancelled.")
-        input("\nPress Enter to exit...")
+        pause()
         return
     
     # Pack
@@ -415,7 +422,7 @@ def main():
         print("  PACKING FAILED!")
         print("=" * 60)
     
-    input("\nPress Enter to exit...")
+    pause()
 
 if __name__ == "__main__":
     try: